@@ -0,0 +1,154 @@
+"""
+Memoria por fila de los chunks de ingest_data: conversión directa (to_pandas + metadatos
+repetidos por fila) contra el chunk compacto de utils/compact_chunk.py.
+
+Para cada servicio × era de schema genera un chunk sintético (synthetic_tlc) y reporta:
+- bytes/fila de ambos DataFrames (frame_bytes) y del RecordBatch Arrow de origen
+- pico de memoria de la conversión medido con tracemalloc
+- que el chunk compacto, expandido como al serializar, tenga los mismos valores que el
+  directo y que los hashes de fila del modo merge no cambien
+
+Desde scheduler_data/ (requiere pyarrow, pandas):
+
+    python -m scheduler.benchmarks.chunk_memory
+    python -m scheduler.benchmarks.chunk_memory --rows 1000000 --untyped
+
+Sale con código 1 si algún chunk compacto no conserva los valores o los hashes.
+"""
+import argparse
+import sys
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+from scheduler.benchmarks.synthetic_tlc import synthetic_trips
+from scheduler.utils.compact_chunk import (
+    build_compact_plan, chunk_memory_report, compact_to_pandas, expand_constant_columns,
+    frame_bytes, set_constant_columns, wide_columns
+)
+
+
+# Mismos valores que add_ingest_metadata
+METADATA = {
+    '_run_id': '6f1c2a9e-8d4b-4c1e-9a53-0d7e2b1f4a60',
+    '_batch_run_id': '0b8e5d3a-2f71-4a96-b4c8-97e1d6a2c3f5',
+    '_ingest_ts': '2025-01-15 03:00:00',
+    '_source_file': 'yellow_tripdata_2025-01.parquet',
+    '_service_type': 'yellow',
+    '_data_year': 2025,
+    '_data_month': 1,
+}
+
+
+def table_columns_for(arrow_schema, typed):
+    """{COLUMNA: TIPO} de la tabla Bronze que crearía ensure_table_exists_dynamic"""
+    columns = {}
+    for field in arrow_schema:
+        if not typed:
+            columns[field.name.upper()] = 'TEXT'
+        elif pa.types.is_integer(field.type):
+            columns[field.name.upper()] = 'NUMBER'
+        elif pa.types.is_floating(field.type):
+            columns[field.name.upper()] = 'FLOAT'
+        elif pa.types.is_timestamp(field.type):
+            columns[field.name.upper()] = 'TIMESTAMP_NTZ'
+        else:
+            columns[field.name.upper()] = 'TEXT'
+    return columns
+
+
+def wide_chunk(batch):
+    chunk_df = batch.to_pandas()
+    for name, value in METADATA.items():
+        chunk_df[name] = value
+    return chunk_df
+
+
+def compact_chunk(batch, compact_plan):
+    chunk_df = compact_to_pandas(batch, compact_plan)
+    set_constant_columns(chunk_df, METADATA)
+    return chunk_df
+
+
+def traced_peak(fn, *args):
+    """(resultado, pico de bytes asignados durante fn)"""
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def row_hashes(chunk_df, columns):
+    return pd.util.hash_pandas_object(wide_columns(chunk_df, columns), index=False).values
+
+
+def run_scenario(service, year, rows, typed):
+    batch = synthetic_trips(service, year, 1, rows).combine_chunks().to_batches()[0]
+    compact_plan = build_compact_plan(batch.schema, table_columns_for(batch.schema, typed))
+
+    wide, wide_peak = traced_peak(wide_chunk, batch)
+    compact, compact_peak = traced_peak(compact_chunk, batch, compact_plan)
+    report = chunk_memory_report(batch, compact, len(METADATA))
+
+    source_columns = list(batch.schema.names)
+    mismatches = []
+    if not (row_hashes(compact, source_columns) == row_hashes(wide, source_columns)).all():
+        mismatches.append('hashes de fila distintos')
+
+    expand_constant_columns(compact)
+    for name in wide.columns:
+        # Mismo dtype que el directo: Int* con nulos -> float64, categorías -> object
+        expected, actual = wide[name], compact[name].astype(wide[name].dtype)
+        try:
+            pd.testing.assert_series_equal(expected, actual, check_names=False)
+        except AssertionError as e:
+            mismatches.append(f"{name}: {str(e).splitlines()[0]}")
+
+    return dict(
+        report,
+        wide_frame_bytes_per_row=round(frame_bytes(wide) / rows, 1),
+        wide_peak_mb=round(wide_peak / 1024 ** 2, 1),
+        compact_peak_mb=round(compact_peak / 1024 ** 2, 1),
+        dtypes={name: str(compact[name].dtype) for name in compact_plan if name in compact},
+        mismatches=mismatches,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bytes por fila de los chunks directos vs compactos')
+    parser.add_argument('--services', nargs='+', default=['yellow', 'green'])
+    parser.add_argument('--years', nargs='+', type=int, default=[2015, 2025])
+    parser.add_argument('--rows', type=int, default=250_000, help='Filas del chunk')
+    parser.add_argument('--untyped', action='store_true', help='Tabla Bronze VARCHAR (typed_bronze=False)')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar el dtype de cada columna compactada')
+    args = parser.parse_args(argv)
+
+    failed = []
+    print(f"{'escenario':<14} {'arrow':>8} {'directo':>8} {'compacto':>9} {'x':>6} "
+          f"{'pico directo':>13} {'pico compacto':>14}")
+    for service in args.services:
+        for year in args.years:
+            key = f"{service} {year}"
+            result = run_scenario(service, year, args.rows, not args.untyped)
+            print(f"{key:<14} {result['arrow_bytes_per_row']:>8} {result['wide_bytes_per_row']:>8} "
+                  f"{result['compact_bytes_per_row']:>9} {result['reduction']:>6} "
+                  f"{result['wide_peak_mb']:>10} MB {result['compact_peak_mb']:>11} MB")
+            if args.verbose:
+                print(f"    {result['dtypes']}")
+            for mismatch in result['mismatches']:
+                print(f"    {mismatch}")
+            if result['mismatches']:
+                failed.append(key)
+
+    print("\nbytes/fila medidos con frame_bytes; pico = tracemalloc durante la conversión")
+    if failed:
+        print(f"Chunks compactos con diferencias: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
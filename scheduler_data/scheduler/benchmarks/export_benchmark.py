@@ -0,0 +1,194 @@
+"""
+Benchmark offline de utils/bulk_exporter.py.
+
+Exporta DataFrames sintéticos (o generadores de ellos) a un warehouse DuckDB con la
+superficie de snowflake.connector/write_pandas y verifica el contenido de la tabla
+destino después de cada paso, en este orden sobre la misma tabla:
+
+1. replace sobre una tabla nueva (CREATE OR REPLACE ... COPY GRANTS)
+2. replace con las mismas columnas (INSERT OVERWRITE)
+3. replace con columnas distintas (la tabla se reconstruye)
+4. append
+5. upsert con claves repetidas entre particiones (gana la última fila de cada clave)
+6. append con write_pandas fallando después de cargar (el reintento no duplica filas)
+
+Desde scheduler_data/ (requiere pandas, duckdb):
+
+    python -m scheduler.benchmarks.export_benchmark
+    python -m scheduler.benchmarks.export_benchmark --rows 200000 --partition-rows 20000 --workers 8
+
+Sale con código 1 si algún paso deja la tabla distinta de lo esperado.
+"""
+import argparse
+import importlib
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from scheduler.benchmarks.fake_snowflake import FakeWarehouse
+from scheduler.benchmarks.ingest_benchmark import fake_runtime_modules
+
+
+EXPORTER_MODULE = 'scheduler.utils.bulk_exporter'
+TABLE_NAME = 'EXPORT_CHECK'
+KEY = 'TRIP_ID'
+
+
+def load_exporter(warehouse):
+    """bulk_exporter importado con el snowflake.connector falso"""
+    fakes = fake_runtime_modules(warehouse, tempfile.gettempdir(), {})
+    saved = {name: sys.modules.get(name) for name in list(fakes) + [EXPORTER_MODULE]}
+    sys.modules.update(fakes)
+    sys.modules.pop(EXPORTER_MODULE, None)
+    try:
+        return importlib.import_module(EXPORTER_MODULE)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def synthetic_frame(rows, start=0, seed=0, extra_column=False):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        KEY: np.arange(start, start + rows, dtype='int64'),
+        'FARE': rng.uniform(2.5, 80.0, rows).round(2),
+        'ZONE': rng.choice(['Manhattan', 'Queens', 'Brooklyn', 'Bronx'], rows),
+        'PICKUP': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 31 * 86400, rows), unit='s'),
+    })
+    if extra_column:
+        df = df.drop(columns=['ZONE']).assign(TIP=rng.uniform(0, 10, rows).round(2))
+    return df
+
+
+def in_frames(df, frames):
+    """El DataFrame como generador de `frames` bloques (lo que entrega un bloque en streaming)"""
+    for part in np.array_split(np.arange(len(df)), frames):
+        yield df.iloc[part[0]:part[-1] + 1] if len(part) else df.iloc[0:0]
+
+
+def table_state(warehouse):
+    columns = {row[0].upper() for row in warehouse.query(f"""
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = '{warehouse.schema}' AND TABLE_NAME = '{TABLE_NAME}'
+    """)}
+    rows, keys, fare = warehouse.query(
+        f"SELECT COUNT(*), COUNT(DISTINCT {KEY}), ROUND(SUM(FARE), 2) FROM {TABLE_NAME}"
+    )[0]
+    return {'columns': columns, 'rows': rows, 'keys': keys, 'fare': float(fare or 0)}
+
+
+def expected_state(df):
+    return {
+        'columns': set(df.columns), 'rows': len(df),
+        'keys': df[KEY].nunique(), 'fare': round(float(df['FARE'].sum()), 2),
+    }
+
+
+class FlakyWritePandas:
+    """write_pandas que carga la partición y luego falla en el primer intento de algunas"""
+
+    def __init__(self, write_pandas, part_column, every=3):
+        self.write_pandas = write_pandas
+        self.part_column = part_column
+        self.every = every
+        self.failed = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, df, table_name, **kwargs):
+        result = self.write_pandas(conn, df, table_name, **kwargs)
+        part = int(df[self.part_column].iloc[0])
+        with self._lock:
+            fail = part % self.every == 1 and part not in self.failed
+            self.failed.add(part)
+        if fail:
+            raise ConnectionError(f"conexión perdida después del COPY de la partición {part}")
+        return result
+
+
+def run_steps(exporter, warehouse, rows, partition_rows, workers, frames):
+    def export(data, mode, keys=None):
+        return exporter.export_frames(
+            in_frames(data, frames), TABLE_NAME, warehouse.database, warehouse.schema,
+            warehouse.connect, mode=mode, keys=keys, workers=workers, partition_rows=partition_rows,
+        )
+
+    results = []
+
+    def step(name, data, mode, expected, keys=None):
+        stats = export(data, mode, keys)
+        actual = table_state(warehouse)
+        mismatches = [f"{k}: esperado {expected[k]} obtenido {actual[k]}" for k in expected if expected[k] != actual[k]]
+        results.append((name, stats, mismatches))
+
+    first = synthetic_frame(rows, seed=1)
+    step('replace (tabla nueva)', first, 'replace', expected_state(first))
+
+    second = synthetic_frame(rows // 2, seed=2)
+    step('replace (mismas columnas)', second, 'replace', expected_state(second))
+
+    widened = synthetic_frame(rows, seed=3, extra_column=True)
+    step('replace (columnas distintas)', widened, 'replace', expected_state(widened))
+
+    appended = synthetic_frame(rows // 2, start=rows, seed=4, extra_column=True)
+    current = pd.concat([widened, appended], ignore_index=True)
+    step('append', appended, 'append', expected_state(current))
+
+    # Claves existentes y nuevas, cada una repetida en particiones distintas
+    updates = synthetic_frame(rows, start=rows, seed=5, extra_column=True)
+    updates[KEY] = updates[KEY] % rows + rows // 2
+    current = pd.concat([current, updates], ignore_index=True).drop_duplicates(KEY, keep='last')
+    step('upsert', updates, 'upsert', expected_state(current), keys=[KEY])
+
+    flaky = FlakyWritePandas(exporter.write_pandas, exporter.PART_COLUMN)
+    write_pandas, retry_delay = exporter.write_pandas, exporter.RETRY_DELAY
+    exporter.write_pandas, exporter.RETRY_DELAY = flaky, 0
+    try:
+        retried = synthetic_frame(rows // 2, start=3 * rows, seed=6, extra_column=True)
+        current = pd.concat([current, retried], ignore_index=True)
+        step('append con reintentos', retried, 'append', expected_state(current))
+    finally:
+        exporter.write_pandas, exporter.RETRY_DELAY = write_pandas, retry_delay
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de bulk_exporter contra un warehouse DuckDB')
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--partition-rows', type=int, default=7_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--frames', type=int, default=3, help='DataFrames del generador de entrada')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args(argv)
+
+    warehouse = FakeWarehouse(latency_ms=args.latency_ms)
+    try:
+        exporter = load_exporter(warehouse)
+        results = run_steps(exporter, warehouse, args.rows, args.partition_rows, args.workers, args.frames)
+    finally:
+        warehouse.close()
+
+    failed = []
+    for name, stats, mismatches in results:
+        status = 'OK' if not mismatches else 'DIFERENCIAS'
+        print(f"{name}: {status} | {stats['rows']:,} filas en {stats['partitions']} particiones | "
+              f"{stats['seconds']}s ({stats['rows_per_sec'] or 0:,} filas/s)")
+        for mismatch in mismatches:
+            print(f"    {mismatch}")
+        if mismatches:
+            failed.append(name)
+
+    if failed:
+        print(f"\nCon diferencias: {', '.join(failed)}")
+    else:
+        print("\nLa tabla destino coincide en todos los pasos")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import re
+import threading
+import time
+
+import duckdb
+import pyarrow as pa
+
+
+# Traducción mínima del dialecto Snowflake que emite ingest_data.py a DuckDB
+SQL_REWRITES = [
+    (re.compile(r'\bTIMESTAMP_NTZ\b', re.I), 'TIMESTAMP'),
+    # Silver emitido (ingest_data): los TIMESTAMP_TZ viajan como texto con offset
+    (re.compile(r"\bTO_TIMESTAMP_TZ\((\w+),\s*'YYYY-MM-DD HH24:MI:SS TZHTZM'\)", re.I),
+     r"strptime(\1, '%Y-%m-%d %H:%M:%S %z')"),
+    (re.compile(r'\bTIMESTAMP_TZ\b', re.I), 'TIMESTAMPTZ'),
+    (re.compile(r'\bNUMBER\(\s*\d+\s*,\s*0\s*\)', re.I), 'BIGINT'),
+    (re.compile(r'\bNUMBER\(\s*(\d+)\s*,\s*(\d+)\s*\)', re.I), r'DECIMAL(\1,\2)'),
+    (re.compile(r'\bNUMBER\b', re.I), 'BIGINT'),
+    (re.compile(r'\bCURRENT_TIMESTAMP\(\)', re.I), 'CURRENT_TIMESTAMP'),
+    (re.compile(r'\b\w+\.INFORMATION_SCHEMA\.', re.I), 'INFORMATION_SCHEMA.'),
+    # HASH de Snowflake es un entero con signo; el de DuckDB es UBIGINT y no entra en NUMBER(38,0)
+    (re.compile(r'\bHASH\(', re.I), 'SIGNED_HASH('),
+    # CREATE OR REPLACE TABLE ... COPY GRANTS (bulk_exporter): DuckDB no tiene grants
+    (re.compile(r'\s+COPY\s+GRANTS\b', re.I), ''),
+]
+# DuckDB no tiene CREATE TABLE ... LIKE: tabla vacía con las mismas columnas
+TEMP_TABLE_LIKE = re.compile(r'CREATE\s+TEMPORARY\s+TABLE\s+(\w+)\s+LIKE\s+([\w.]+)', re.I)
+# Las temporales de Snowflake viven en el esquema de la sesión (write_pandas las nombra con
+# DATABASE.SCHEMA); las de DuckDB en el catálogo temp: se crean en el esquema
+TEMP_TABLE = re.compile(r'CREATE\s+TEMPORARY\s+TABLE\s+(\w+)\s*\(', re.I)
+# INSERT OVERWRITE (replace de bulk_exporter): DELETE + INSERT en la transacción de la sesión
+INSERT_OVERWRITE = re.compile(r'^\s*INSERT\s+OVERWRITE\s+INTO\s+(?P<target>[\w.]+)(?P<rest>.+)$', re.I | re.S)
+# MERGE con a lo más un WHEN MATCHED ... UPDATE y un WHEN NOT MATCHED ... INSERT (lo que emiten
+# ingest_data y bulk_exporter). DuckDB < 1.4 no tiene MERGE y el de versiones nuevas no retorna
+# los contadores de Snowflake: se ejecuta como UPDATE ... FROM + INSERT ... WHERE NOT EXISTS
+MERGE_SQL = re.compile(
+    r'^\s*MERGE\s+INTO\s+(?P<target>[\w.]+)\s+(?P<target_alias>\w+)\s+'
+    r'USING\s+(?P<source>.+?)\s+(?P<source_alias>\w+)\s+ON\s+(?P<on>.+?)\s+'
+    r'(?:WHEN\s+MATCHED(?:\s+AND\s+(?P<matched>.+?))?\s+THEN\s+UPDATE\s+SET\s+(?P<update_set>.+?)\s+)?'
+    r'WHEN\s+NOT\s+MATCHED\s+THEN\s+INSERT\s*\((?P<columns>.+?)\)\s*VALUES\s*\((?P<values>.+)\)\s*$',
+    re.I | re.S
+)
+
+
+class FakeWarehouse:
+    """
+    Sustituto local de Snowflake sobre DuckDB para el benchmark de ingesta.
+
+    Expone connect() y write_pandas() con la firma de snowflake.connector, un esquema
+    DATABASE.SCHEMA y transacciones por sesión. `latency_ms` simula el round trip de
+    red de cada sentencia para que las optimizaciones que ahorran viajes se noten.
+    """
+
+    def __init__(self, database='NY_TAXI', schema='BRONZE', db_path=':memory:', latency_ms=0):
+        self.database = database.upper()
+        self.schema = schema.upper()
+        self.latency = latency_ms / 1000.0
+        self._root = duckdb.connect()
+        self._root.execute(f"ATTACH '{db_path}' AS {self.database}")
+        self._root.execute(f"CREATE SCHEMA IF NOT EXISTS {self.database}.{self.schema}")
+        # HASH(a, b) de Snowflake: INT64 con signo (el de DuckDB es UINT64)
+        self._root.execute(f"""
+            CREATE OR REPLACE MACRO {self.database}.{self.schema}.SIGNED_HASH(a, b) AS
+            (hash(a, b)::HUGEINT - 9223372036854775808)::BIGINT
+        """)
+        self._lock = threading.Lock()
+        self.metrics = {'connections': 0, 'round_trips': 0, 'rows_written': 0}
+
+    def connect(self, database=None, schema=None, **kwargs):
+        """Equivalente a snowflake.connector.connect (ignora credenciales)"""
+        with self._lock:
+            self.metrics['connections'] += 1
+        return FakeConnection(self, (database or self.database).upper(), (schema or self.schema).upper())
+
+    def round_trip(self, rows=0):
+        with self._lock:
+            self.metrics['round_trips'] += 1
+            self.metrics['rows_written'] += rows
+        if self.latency:
+            time.sleep(self.latency)
+
+    def query(self, sql):
+        """Consulta directa para verificar resultados del benchmark"""
+        session = self._root.cursor()
+        try:
+            session.execute(f"USE {self.database}.{self.schema}")
+            return session.execute(translate_sql(sql, self.database, self.schema)).fetchall()
+        finally:
+            session.close()
+
+    def close(self):
+        self._root.close()
+
+
+class FakeConnection:
+    """Una sesión: todos sus cursores comparten transacción, igual que en Snowflake"""
+
+    def __init__(self, warehouse, database, schema):
+        self.warehouse = warehouse
+        self.database = database
+        self.schema = schema
+        self.session = warehouse._root.cursor()
+        self.session.execute(f"USE {database}.{schema}")
+        self._closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.session.close()
+
+
+class FakeCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @property
+    def description(self):
+        return self.conn.session.description
+
+    def execute(self, sql, params=None):
+        self.conn.warehouse.round_trip()
+        sql = translate_sql(sql, self.conn.database, self.conn.schema)
+        merge = MERGE_SQL.match(sql)
+        if merge is not None:
+            self._merge(merge)
+            return self
+        overwrite = INSERT_OVERWRITE.match(sql)
+        if overwrite is not None:
+            self.conn.session.execute(f"DELETE FROM {overwrite['target']}")
+            self.conn.session.execute(f"INSERT INTO {overwrite['target']}{overwrite['rest']}")
+            return self
+        if params is None:
+            self.conn.session.execute(sql)
+        else:
+            self.conn.session.execute(sql, params)
+        return self
+
+    def _merge(self, merge):
+        """MERGE como UPDATE + INSERT en la transacción de la sesión; el resultado es la fila
+        (insertadas, actualizadas) que retorna Snowflake"""
+        session = self.conn.session
+        target, source = merge['target'], merge['source']
+        target_alias, source_alias = merge['target_alias'], merge['source_alias']
+        updated = 0
+        if merge['update_set']:
+            condition = merge['on'] + (f" AND {merge['matched']}" if merge['matched'] else '')
+            updated = session.execute(f"""
+                UPDATE {target} AS {target_alias} SET {merge['update_set']}
+                FROM {source} AS {source_alias} WHERE {condition}
+            """).fetchone()[0]
+        inserted = session.execute(f"""
+            INSERT INTO {target} ({merge['columns']})
+            SELECT {merge['values']} FROM {source} AS {source_alias}
+            WHERE NOT EXISTS (SELECT 1 FROM {target} AS {target_alias} WHERE {merge['on']})
+        """).fetchone()[0]
+        session.execute("SELECT ? AS inserted, ? AS updated", [inserted, updated])
+
+    def executemany(self, sql, seq_of_params):
+        self.conn.warehouse.round_trip()
+        self.conn.session.executemany(translate_sql(sql, self.conn.database, self.conn.schema), list(seq_of_params))
+        return self
+
+    def fetchone(self):
+        return self.conn.session.fetchone()
+
+    def fetchall(self):
+        return self.conn.session.fetchall()
+
+    def fetchmany(self, size=1):
+        return self.conn.session.fetchmany(size)
+
+    def fetch_arrow_batches(self):
+        """Como snowflake.connector: el resultado en tablas Arrow"""
+        for batch in self.conn.session.fetch_record_batch():
+            yield pa.Table.from_batches([batch])
+
+    def close(self):
+        # La sesión pertenece a la conexión; cerrar el cursor no la termina
+        pass
+
+
+def translate_sql(sql, database, schema):
+    sql = TEMP_TABLE_LIKE.sub(
+        lambda m: f"CREATE TABLE {database}.{schema}.{m.group(1)} AS SELECT * FROM {m.group(2)} LIMIT 0",
+        sql
+    )
+    sql = TEMP_TABLE.sub(lambda m: f"CREATE TABLE {database}.{schema}.{m.group(1)} (", sql)
+    for pattern, replacement in SQL_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def write_pandas(conn, df, table_name, database=None, schema=None, auto_create_table=False,
+                 overwrite=False, **kwargs):
+    """
+    Misma firma y retorno que snowflake.connector.pandas_tools.write_pandas:
+    (success, nchunks, nrows, output). Inserta por nombre de columna.
+    """
+    table_fqn = f"{(database or conn.database).upper()}.{(schema or conn.schema).upper()}.{table_name.upper()}"
+    conn.warehouse.round_trip(rows=len(df))
+
+    view = f"__write_pandas_{id(df)}"
+    conn.session.register(view, df)
+    try:
+        if overwrite:
+            conn.session.execute(f"DROP TABLE IF EXISTS {table_fqn}")
+        if auto_create_table or overwrite:
+            conn.session.execute(f"CREATE TABLE IF NOT EXISTS {table_fqn} AS SELECT * FROM {view} LIMIT 0")
+        conn.session.execute(f"INSERT INTO {table_fqn} BY NAME SELECT * FROM {view}")
+    finally:
+        conn.session.unregister(view)
+
+    return True, 1, len(df), [('LOADED', len(df))]
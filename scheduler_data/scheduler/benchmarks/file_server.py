@@ -0,0 +1,52 @@
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Handler estático sin log por request (HEAD entrega Content-Length y Last-Modified)"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalFileServer:
+    """
+    Servidor HTTP local que imita el layout de CloudFront (trip-data/, misc/).
+
+        with LocalFileServer(data_dir) as base_url:
+            os.environ['TLC_BASE_URL'] = base_url
+    """
+
+    def __init__(self, root_dir, host='127.0.0.1', port=0):
+        self.root_dir = root_dir
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        handler = functools.partial(QuietHandler, directory=self.root_dir)
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='tlc_file_server', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,456 @@
+"""
+Benchmark offline de data_loaders/ingest_data.py.
+
+Genera Parquet TLC sintéticos, los sirve por HTTP local y ejecuta load_data() contra
+un warehouse DuckDB con la superficie de snowflake.connector/write_pandas. Cada
+escenario (servicio × año × modo × chunk_size) corre en un subproceso para medir su
+RSS pico de forma aislada. En modo merge cada escenario recarga además los mismos meses
+(--merge-reloads) y verifica que el conteo de la tabla no cambie. Con --emit-silver cada
+escenario emite también el Silver (TAXI_ZONES sintética) y verifica que la tabla Silver
+tenga las filas que reportó cada mes.
+
+Desde scheduler_data/ (requiere pyarrow, pandas, duckdb, requests):
+
+    python -m scheduler.benchmarks.ingest_benchmark --chunk-sizes 100000 500000
+    python -m scheduler.benchmarks.ingest_benchmark --load-modes insert merge --merge-reloads 2
+    python -m scheduler.benchmarks.ingest_benchmark --emit-silver --chunk-sizes 100000
+    python -m scheduler.benchmarks.ingest_benchmark --update-baseline
+
+Sale con código 1 si algún escenario empeora respecto de baselines.json más allá de
+la tolerancia, si una recarga merge cambia el conteo o escribe filas, o si el Silver
+emitido no coincide con lo reportado.
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+from os import path
+
+
+BENCHMARK_DIR = path.dirname(path.abspath(__file__))
+SCHEDULER_DIR = path.dirname(BENCHMARK_DIR)
+INGEST_BLOCK = path.join(SCHEDULER_DIR, 'data_loaders', 'ingest_data.py')
+BASELINE_FILE = path.join(BENCHMARK_DIR, 'baselines.json')
+DEFAULT_DATA_DIR = path.join(tempfile.gettempdir(), 'tlc_synthetic')
+
+DEFAULT_CHUNK_SIZES = [100_000, 500_000, 1_000_000]
+THROUGHPUT_TOLERANCE = 0.20  # rows/s puede bajar hasta 20 % antes de fallar
+RSS_TOLERANCE = 0.25  # RSS pico puede subir hasta 25 %
+
+# Funciones del bloque que se cronometran, por etapa
+AUDIT_FUNCTIONS = [
+    'load_coverage_ledger', 'load_checkpoint_ledger', 'check_existing_data',
+    'clear_checkpoints', 'save_audit_coverage', 'register_gap',
+]
+LOAD_FUNCTIONS = ['load_chunks_into_table', 'load_chunks_via_stage', 'load_chunks_via_merge']
+# Módulos del repo que importan snowflake/mage_ai: se re-importan con el runtime falso
+RUNTIME_BOUND_MODULES = ['scheduler.utils.snowflake_connection']
+
+
+class StageTimer:
+    """Acumula segundos por etapa envolviendo funciones del módulo del bloque"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def _timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return _timed
+
+    def wrap_generator(self, stage, fn):
+        # El tiempo de cada next() incluye leer el row group y convertirlo
+        @functools.wraps(fn)
+        def _timed(*args, **kwargs):
+            iterator = fn(*args, **kwargs)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self.add(stage, time.perf_counter() - start)
+                    return
+                self.add(stage, time.perf_counter() - start)
+                yield item
+        return _timed
+
+    def instrument(self, block):
+        block.download_file_with_retry = self.wrap('download', block.download_file_with_retry)
+        block.iter_converted_chunks = self.wrap_generator('convert', block.iter_converted_chunks)
+        for name in LOAD_FUNCTIONS:
+            setattr(block, name, self.wrap('load', getattr(block, name)))
+        for name in AUDIT_FUNCTIONS:
+            setattr(block, name, self.wrap('audit', getattr(block, name)))
+
+    def split(self):
+        """Segundos acumulados (suma entre threads) de download/convert/upload/audit"""
+        # load_chunks_* consume el generador de conversión: upload = load - convert
+        return {
+            'download': round(self.seconds['download'], 3),
+            'convert': round(self.seconds['convert'], 3),
+            'upload': round(max(self.seconds['load'] - self.seconds['convert'], 0.0), 3),
+            'audit': round(self.seconds['audit'], 3),
+        }
+
+
+def fake_runtime_modules(warehouse, repo_dir, secrets):
+    """Módulos mage_ai/snowflake mínimos para ejecutar el bloque fuera de Mage"""
+    from scheduler.benchmarks.fake_snowflake import write_pandas
+
+    class ConfigFileLoader:
+        def __init__(self, *args, **kwargs):
+            self.config = {}
+
+    modules = {
+        'snowflake': {},
+        'snowflake.connector': {'connect': warehouse.connect},
+        'snowflake.connector.pandas_tools': {'write_pandas': write_pandas},
+        'mage_ai': {},
+        'mage_ai.settings': {},
+        'mage_ai.settings.repo': {'get_repo_path': lambda: repo_dir},
+        'mage_ai.io': {},
+        'mage_ai.io.config': {'ConfigFileLoader': ConfigFileLoader},
+        'mage_ai.io.snowflake': {'Snowflake': object},
+        'mage_ai.data_preparation': {},
+        'mage_ai.data_preparation.shared': {},
+        'mage_ai.data_preparation.shared.secrets': {'get_secret_value': secrets.__getitem__},
+        'mage_ai.data_preparation.decorators': {'data_loader': lambda f: f, 'test': lambda f: f},
+    }
+    built = {}
+    for name, attrs in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        built[name] = module
+    for name, module in built.items():
+        parent, _, child = name.rpartition('.')
+        if parent:
+            setattr(built[parent], child, module)
+    return built
+
+
+def load_ingest_block(warehouse, repo_dir, secrets):
+    """Ejecuta el código del bloque en un módulo aislado con el runtime falso"""
+    block = types.ModuleType('ingest_data_benchmark')
+    block.__file__ = INGEST_BLOCK
+    with open(INGEST_BLOCK) as f:
+        code = compile(f.read(), INGEST_BLOCK, 'exec')
+    # Solo se reemplazan los módulos falsos: lo importado por el bloque (pandas, pyarrow)
+    # queda registrado normalmente
+    fakes = fake_runtime_modules(warehouse, repo_dir, secrets)
+    saved = {name: sys.modules.get(name) for name in list(fakes) + RUNTIME_BOUND_MODULES}
+    sys.modules.update(fakes)
+    # Se vuelven a importar con los módulos falsos de este warehouse
+    for name in RUNTIME_BOUND_MODULES:
+        sys.modules.pop(name, None)
+    try:
+        exec(code, block.__dict__)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    return block
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(scenario, base_url, verbose=False):
+    """Corre un escenario en este proceso; retorna métricas"""
+    from scheduler.benchmarks.fake_snowflake import FakeWarehouse, write_pandas
+
+    os.environ['TLC_BASE_URL'] = base_url
+    repo_dir = tempfile.mkdtemp(prefix='ingest_bench_')
+    warehouse = FakeWarehouse(latency_ms=scenario.get('latency_ms', 0))
+    secrets = {'SNOWFLAKE_DATABASE': warehouse.database, 'SNOWFLAKE_SCHEMA': warehouse.schema}
+
+    emit_silver = scenario.get('block_kwargs', {}).get('emit_silver', False)
+    if emit_silver:
+        # Zonas para el join del Silver (load_zone_lookup lee TAXI_ZONES)
+        from scheduler.benchmarks.silver_conformance import synthetic_zones
+        write_pandas(warehouse.connect(), synthetic_zones().to_pandas(), 'TAXI_ZONES', auto_create_table=True)
+
+    block = load_ingest_block(warehouse, repo_dir, secrets)
+    timer = StageTimer()
+    timer.instrument(block)
+
+    kwargs = dict(
+        service=scenario['service'],
+        year=scenario['year'],
+        months=scenario['months'],
+        chunk_size=scenario['chunk_size'],
+        load_mode=scenario['load_mode'],
+        stage_backend='local',
+        force_reload=True,
+        max_retries=1,
+    )
+    kwargs.update(scenario.get('block_kwargs', {}))
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        results = block.load_data(**kwargs)
+    wall = time.perf_counter() - start
+    # Tiempos y RSS de la primera carga, sin las recargas
+    stage_seconds = timer.split()
+    peak_rss = peak_rss_mb()
+
+    table = block.get_table_name(scenario['service'])
+    rows_in_table = warehouse.query(f"SELECT COUNT(*) FROM {table}")[0][0]
+    silver = None
+    if emit_silver:
+        silver_table = f"{warehouse.database}.{block.SILVER_SCHEMA}.{block.SILVER_TABLE}"
+        silver = {
+            'rows': sum(m.get('silver_rows') or 0 for m in results['monthly_results']),
+            'rows_in_table': int(warehouse.query(
+                f"SELECT COUNT(*) FROM {silver_table} WHERE service_type = '{scenario['service']}'"
+            )[0][0]),
+        }
+
+    # Idempotencia del modo merge: recargar los mismos meses no cambia el conteo ni toca filas
+    reloads = []
+    for _ in range(scenario.get('reloads', 0)):
+        with output:
+            reload_results = block.load_data(**kwargs)
+        merged = [m.get('merge') or {} for m in reload_results['monthly_results']]
+        reloads.append({
+            'rows_in_table': int(warehouse.query(f"SELECT COUNT(*) FROM {table}")[0][0]),
+            'months_failed': reload_results['months_failed'],
+            'inserted': sum(m.get('inserted', 0) for m in merged),
+            'updated': sum(m.get('updated', 0) for m in merged),
+        })
+    warehouse.close()
+    shutil.rmtree(repo_dir, ignore_errors=True)
+
+    rows = results['total_rows_loaded']
+    return {
+        'rows': rows,
+        'rows_in_table': int(rows_in_table),
+        'months_failed': results['months_failed'],
+        'wall_seconds': round(wall, 3),
+        'rows_per_sec': round(rows / wall, 1) if wall else 0.0,
+        'peak_rss_mb': round(peak_rss, 1),
+        'stage_seconds': stage_seconds,
+        'warehouse': dict(warehouse.metrics),
+        'reloads': reloads,
+        'silver': silver,
+    }
+
+
+def run_isolated(scenario, base_url, verbose=False):
+    """Corre el escenario en un subproceso (RSS pico propio) y retorna sus métricas"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scenario_file = path.join(tmp, 'scenario.json')
+        result_file = path.join(tmp, 'result.json')
+        with open(scenario_file, 'w') as f:
+            json.dump(scenario, f)
+
+        command = [sys.executable, '-m', 'scheduler.benchmarks.ingest_benchmark',
+                   '--worker', scenario_file, result_file, '--base-url', base_url]
+        if verbose:
+            command.append('--verbose')
+        subprocess.run(command, cwd=path.dirname(SCHEDULER_DIR), check=True)
+
+        with open(result_file) as f:
+            return json.load(f)
+
+
+def reload_errors(metrics):
+    """Recargas que cambiaron el conteo de la tabla o escribieron filas (merge no idempotente)"""
+    errors = []
+    for i, reload in enumerate(metrics.get('reloads', []), start=1):
+        if reload['months_failed'] or reload['rows_in_table'] != metrics['rows_in_table']:
+            errors.append(f"recarga {i}: {reload['rows_in_table']:,} filas en tabla "
+                          f"(antes {metrics['rows_in_table']:,}), {reload['months_failed']} meses fallidos")
+        elif reload['inserted'] or reload['updated']:
+            errors.append(f"recarga {i}: {reload['inserted']:,} insertadas, {reload['updated']:,} actualizadas "
+                          f"sin cambios en el archivo")
+    return errors
+
+
+def silver_errors(metrics):
+    """Silver emitido que no coincide con las filas que reportaron los meses"""
+    silver = metrics.get('silver')
+    if silver is None:
+        return []
+    if not silver['rows'] or silver['rows'] != silver['rows_in_table']:
+        return [f"Silver: {silver['rows_in_table']:,} filas en tabla, {silver['rows']:,} reportadas"]
+    return []
+
+
+def scenario_key(scenario):
+    key = f"{scenario['service']}_{scenario['year']}_{scenario['load_mode']}_chunk{scenario['chunk_size']}"
+    if scenario.get('block_kwargs', {}).get('emit_silver'):
+        key += '_silver'
+    return key
+
+
+def compare_with_baseline(key, metrics, baseline, throughput_tolerance, rss_tolerance):
+    """Lista de regresiones del escenario (vacía si está dentro de tolerancia)"""
+    reference = baseline.get(key)
+    if reference is None:
+        return []
+    if reference.get('rows') != metrics['rows']:
+        print(f"  {key}: baseline con otro volumen ({reference.get('rows')} filas), no se compara")
+        return []
+
+    regressions = []
+    min_throughput = reference['rows_per_sec'] * (1 - throughput_tolerance)
+    if metrics['rows_per_sec'] < min_throughput:
+        regressions.append(
+            f"{key}: {metrics['rows_per_sec']:,.0f} filas/s < {min_throughput:,.0f} "
+            f"(baseline {reference['rows_per_sec']:,.0f})"
+        )
+    max_rss = reference['peak_rss_mb'] * (1 + rss_tolerance)
+    if metrics['peak_rss_mb'] > max_rss:
+        regressions.append(
+            f"{key}: RSS pico {metrics['peak_rss_mb']:,.0f} MB > {max_rss:,.0f} MB "
+            f"(baseline {reference['peak_rss_mb']:,.0f})"
+        )
+    return regressions
+
+
+def print_report(report):
+    header = f"{'escenario':<40} {'filas':>10} {'filas/s':>10} {'RSS MB':>8} {'desc':>7} {'conv':>7} {'subida':>7} {'audit':>7}"
+    print(header)
+    print('-' * len(header))
+    for key, metrics in report.items():
+        split = metrics['stage_seconds']
+        print(f"{key:<40} {metrics['rows']:>10,} {metrics['rows_per_sec']:>10,.0f} {metrics['peak_rss_mb']:>8,.0f} "
+              f"{split['download']:>7.2f} {split['convert']:>7.2f} {split['upload']:>7.2f} {split['audit']:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline de ingest_data.py')
+    parser.add_argument('--services', nargs='+', default=['yellow', 'green'])
+    parser.add_argument('--years', nargs='+', type=int, default=[2015, 2025])
+    parser.add_argument('--months', nargs='+', type=int, default=[1, 2])
+    parser.add_argument('--chunk-sizes', nargs='+', type=int, default=DEFAULT_CHUNK_SIZES)
+    parser.add_argument('--load-modes', nargs='+', default=['insert'])
+    parser.add_argument('--merge-reloads', type=int, default=1,
+                        help='Recargas de los mismos meses en modo merge (conteo sin cambios)')
+    parser.add_argument('--emit-silver', action='store_true',
+                        help='Emitir también el Silver (emit_silver) y verificar la tabla Silver')
+    parser.add_argument('--scale', type=float, default=0.01,
+                        help='Fracción del volumen real por mes (1.0 = tamaño TLC)')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='Latencia simulada por round trip al warehouse')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--throughput-tolerance', type=float, default=THROUGHPUT_TOLERANCE)
+    parser.add_argument('--rss-tolerance', type=float, default=RSS_TOLERANCE)
+    parser.add_argument('--output', help='Guardar el reporte completo en JSON')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar la salida del bloque')
+    parser.add_argument('--worker', nargs=2, metavar=('SCENARIO', 'RESULT'), help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        scenario_file, result_file = args.worker
+        with open(scenario_file) as f:
+            scenario = json.load(f)
+        with open(result_file, 'w') as f:
+            json.dump(run_scenario(scenario, args.base_url, verbose=args.verbose), f)
+        return 0
+
+    from scheduler.benchmarks.file_server import LocalFileServer
+    from scheduler.benchmarks.synthetic_tlc import generate_dataset
+
+    print(f"Generando datos sintéticos en {args.data_dir} (escala {args.scale})...")
+    generate_dataset(args.data_dir, services=args.services, years=args.years,
+                     months=args.months, scale=args.scale)
+
+    report = {}
+    with LocalFileServer(args.data_dir) as base_url:
+        for service in args.services:
+            for year in args.years:
+                for load_mode in args.load_modes:
+                    for chunk_size in args.chunk_sizes:
+                        scenario = {
+                            'service': service,
+                            'year': year,
+                            'months': args.months,
+                            'chunk_size': chunk_size,
+                            'load_mode': load_mode,
+                            'latency_ms': args.latency_ms,
+                            'reloads': args.merge_reloads if load_mode == 'merge' else 0,
+                            'block_kwargs': {'emit_silver': True} if args.emit_silver else {},
+                        }
+                        key = scenario_key(scenario)
+                        print(f"Ejecutando {key}...")
+                        report[key] = run_isolated(scenario, base_url, verbose=args.verbose)
+
+    print()
+    print_report(report)
+
+    failed = [k for k, m in report.items() if m['months_failed'] or m['rows'] != m['rows_in_table']]
+    for key in failed:
+        print(f"ERROR {key}: meses fallidos o conteo inconsistente ({report[key]})")
+    for key, metrics in report.items():
+        for error in reload_errors(metrics) + silver_errors(metrics):
+            print(f"ERROR {key}: {error}")
+            if key not in failed:
+                failed.append(key)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        for key, metrics in report.items():
+            baseline[key] = {k: metrics[k] for k in ('rows', 'rows_per_sec', 'peak_rss_mb', 'stage_seconds')}
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline actualizado: {args.baseline}")
+        return 1 if failed else 0
+
+    regressions = []
+    for key, metrics in report.items():
+        regressions.extend(compare_with_baseline(
+            key, metrics, baseline, args.throughput_tolerance, args.rss_tolerance
+        ))
+    if regressions:
+        print("\nREGRESIONES:")
+        for regression in regressions:
+            print(f"  {regression}")
+    elif baseline:
+        print("\nSin regresiones respecto del baseline")
+
+    return 1 if (regressions or failed) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
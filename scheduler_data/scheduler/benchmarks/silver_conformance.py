@@ -0,0 +1,277 @@
+"""
+Conformidad de utils/silver_transform.py contra los modelos dbt de Silver.
+
+Genera Bronze sintético (synthetic_tlc + filas borde: tarifas negativas, distancias en
+el límite, timestamps nulos o invertidos, payment_type fuera de rango, LocationID sin
+zona, fracciones de segundo) y taxi_zones con recargas. Luego:
+
+1. Renderiza stg_yellow, stg_green, stg_trips y stg_enriched con Jinja (macros dbt
+   reemplazadas por stubs de un full refresh) y los ejecuta en DuckDB con el dialecto
+   traducido (convert_timezone, DATEDIFF, FLOAT).
+2. Calcula las mismas filas con to_silver() chunk a chunk.
+3. Compara ambos resultados como multiconjuntos de filas (todas las columnas).
+4. Pasa las filas de to_silver por to_upload_frame (lo que sube ingest_data) y verifica
+   que los TIMESTAMP_TZ en texto vuelvan al mismo instante truncado a segundos.
+
+Desde scheduler_data/ (requiere pyarrow, pandas, duckdb, jinja2):
+
+    python -m scheduler.benchmarks.silver_conformance
+    python -m scheduler.benchmarks.silver_conformance --rows 200000 --chunk-size 50000
+
+Sale con código 1 si algún escenario no coincide. Los meses por defecto (enero y julio)
+evitan los cambios de horario: en la hora ambigua de noviembre Snowflake, DuckDB y
+to_silver pueden elegir distinto offset.
+"""
+import argparse
+import re
+import sys
+import time
+from os import path
+
+import duckdb
+import jinja2
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from scheduler.benchmarks.fake_snowflake import SQL_REWRITES
+from scheduler.benchmarks.synthetic_tlc import era_for, synthetic_trips
+from scheduler.utils.silver_transform import (
+    PICKUP_DROPOFF, SESSION_TIMEZONE, SILVER_COLUMNS, ZoneLookup, to_silver, to_upload_frame
+)
+
+
+BENCHMARK_DIR = path.dirname(path.abspath(__file__))
+MODELS_DIR = path.join(path.dirname(BENCHMARK_DIR), 'dbt', 'demo', 'models', 'staging')
+SILVER_MODELS = ['stg_yellow', 'stg_green', 'stg_trips', 'stg_enriched']
+BATCH_RUN_ID = 'conformance-run'
+
+# Columnas que los modelos leen de Bronze; las que el Parquet de la era no trae se
+# agregan nulas (en Snowflake las crea el ALTER de ingest_data)
+BRONZE_COLUMNS = {
+    'yellow': ['airport_fee', 'cbd_congestion_fee', 'congestion_surcharge'],
+    'green': ['cbd_congestion_fee', 'congestion_surcharge'],
+}
+
+# Snowflake -> DuckDB, además de los de fake_snowflake
+CONFORMANCE_REWRITES = [
+    # convert_timezone(tz, NTZ): el NTZ está en la zona de la sesión
+    (re.compile(r"convert_timezone\('[^']+',\s*(\w+)\)", re.I), rf"(\1 AT TIME ZONE '{SESSION_TIMEZONE}')"),
+    (re.compile(r'\bDATEDIFF\((\w+),', re.I), r"DATEDIFF('\1',"),
+    (re.compile(r'\bas float\)', re.I), 'as double)'),
+]
+
+
+def edge_case_rows(table, service, year, month):
+    """Copia las primeras filas de `table` con los valores borde que filtra o decodifica Silver"""
+    pickup, dropoff = PICKUP_DROPOFF[service]
+    df = table.slice(0, 16).to_pandas()
+    base = pd.Timestamp(year=year, month=month, day=15, hour=12)
+    df[pickup] = base
+    df[dropoff] = base + pd.Timedelta(minutes=10)
+
+    df.loc[0, 'fare_amount'] = -5.0                                  # tarifa negativa
+    df.loc[1, 'trip_distance'] = -0.1                                # distancia negativa
+    df.loc[2, 'trip_distance'] = 200.0                               # límite excluido
+    df.loc[3, 'trip_distance'] = 199.99                              # límite incluido
+    df.loc[4, pickup] = pd.NaT                                       # pickup nulo
+    df.loc[5, dropoff] = df.loc[5, pickup]                           # duración cero
+    df.loc[6, dropoff] = df.loc[6, pickup] - pd.Timedelta(minutes=1) # timestamps invertidos
+    df.loc[7, 'payment_type'] = 0                                    # Flex Fare trip
+    df.loc[8, 'payment_type'] = 6                                    # Voided trip
+    df.loc[9, 'payment_type'] = 7                                    # fuera del case -> NULL
+    df.loc[10, 'payment_type'] = None
+    df.loc[11, 'PULocationID'] = 999                                 # sin zona
+    df.loc[11, 'DOLocationID'] = 0
+    df.loc[12, 'PULocationID'] = 264                                 # zona 'Unknown' / NULL
+    df.loc[12, 'DOLocationID'] = 265
+    df.loc[13, pickup] = base + pd.Timedelta(milliseconds=500)       # fracciones de segundo
+    df.loc[13, dropoff] = base + pd.Timedelta(seconds=61, milliseconds=200)
+    df.loc[14, 'trip_distance'] = None                               # distancia nula
+    df.loc[15, 'fare_amount'] = 0.0                                  # tarifa cero (se conserva)
+    return pa.Table.from_pandas(df, schema=table.schema, preserve_index=False)
+
+
+def synthetic_bronze(service, year, month, rows):
+    """Bronze del mes: filas sintéticas + bordes + columnas de ingesta de ingest_data"""
+    trips = synthetic_trips(service, year, month, rows)
+    table = pa.concat_tables([trips, edge_case_rows(trips, service, year, month)])
+    present = {name.lower() for name in table.schema.names}
+    for name in BRONZE_COLUMNS[service]:
+        if name not in present:
+            table = table.append_column(name, pa.nulls(table.num_rows, pa.float64()))
+    return table
+
+
+def synthetic_zones():
+    """taxi_zones con 265 LocationID, 264/265 sin zona y una recarga que renombra 1-10"""
+    ids = np.arange(1, 266)
+    boroughs = np.array(['Manhattan', 'Queens', 'Brooklyn', 'Bronx', 'Staten Island', 'EWR'], dtype=object)
+    zones = pd.DataFrame({
+        'LocationID': ids,
+        'Borough': boroughs[ids % len(boroughs)],
+        'Zone': [f"Zone {i}" for i in ids],
+        'service_zone': 'Boro Zone',
+        '_ingest_ts': pd.Timestamp('2025-01-01'),
+    })
+    zones.loc[zones['LocationID'] == 264, ['Borough', 'Zone']] = ['Unknown', 'NV']
+    zones.loc[zones['LocationID'] == 265, ['Borough', 'Zone']] = [None, None]
+    reload = zones[zones['LocationID'] <= 10].copy()
+    reload['Zone'] = reload['Zone'] + ' (v2)'
+    reload['_ingest_ts'] = pd.Timestamp('2025-06-01')
+    return pa.Table.from_pandas(pd.concat([zones, reload]), preserve_index=False)
+
+
+def render_model(name):
+    """SQL del modelo como en un full refresh: sin particiones incrementales ni registered_at"""
+    with open(path.join(MODELS_DIR, f"{name}.sql")) as f:
+        template = jinja2.Environment().from_string(f.read())
+    sql = template.render(
+        config=lambda **kwargs: '',
+        var=lambda name, default=None: default,
+        is_incremental=lambda: False,
+        incremental_partitions=lambda services, upstream=None: {'partitions': [], 'registered': {}},
+        partition_predicate=lambda *args, **kwargs: '1 = 1',
+        partition_registered_at=lambda *args, **kwargs: 'null::timestamp_ntz',
+        source=lambda source_name, table_name: table_name,
+        ref=lambda model: model,
+    )
+    for pattern, replacement in SQL_REWRITES + CONFORMANCE_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def dbt_silver(bronze, zones):
+    """stg_enriched ejecutado en DuckDB sobre el Bronze sintético"""
+    con = duckdb.connect()
+    try:
+        con.execute("SET TimeZone = 'UTC'")
+        for service in ('yellow', 'green'):
+            con.register(f"{service}_tripdata", bronze[service])
+        con.register('taxi_zones', zones)
+        for model in SILVER_MODELS:
+            con.execute(f"CREATE VIEW {model} AS {render_model(model)}")
+        return con.execute("SELECT * FROM stg_enriched").fetch_arrow_table()
+    finally:
+        con.close()
+
+
+def engine_silver(bronze, zones, year, month, chunk_size):
+    """Las mismas filas con to_silver() chunk a chunk; retorna (tabla, segundos)"""
+    # Mismo criterio que load_zone_lookup: la última carga de cada LocationID
+    con = duckdb.connect()
+    con.register('taxi_zones', zones)
+    latest = con.execute("""
+        SELECT LocationID, Zone, Borough FROM taxi_zones
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY LocationID ORDER BY _ingest_ts DESC) = 1
+    """).fetch_arrow_table()
+    con.close()
+    lookup = ZoneLookup.from_arrow(latest)
+
+    start = time.perf_counter()
+    tables = []
+    for service in ('yellow', 'green'):
+        trips = bronze[service].drop(['_data_year', '_data_month', '_batch_run_id'])
+        for batch in trips.to_batches(max_chunksize=chunk_size):
+            tables.append(to_silver(batch, service, year, month, BATCH_RUN_ID, zones=lookup))
+    return pa.concat_tables(tables), time.perf_counter() - start
+
+
+def upload_round_trip(silver):
+    """
+    Diferencias entre las filas de to_silver y su versión de to_upload_frame leída como
+    TO_TIMESTAMP_TZ(..., 'YYYY-MM-DD HH24:MI:SS TZHTZM'): mismo instante, sin fracciones.
+    """
+    mismatches = []
+    upload = to_upload_frame(silver)
+    for name, sf_type in SILVER_COLUMNS:
+        if sf_type != 'TIMESTAMP_TZ':
+            continue
+        # Misma resolución en ambos lados: to_pandas y to_datetime pueden elegir unidades distintas
+        expected = pd.to_datetime(silver.column(name).to_pandas(), utc=True).dt.floor('s').astype('datetime64[ns, UTC]')
+        actual = pd.to_datetime(upload[name], format='%Y-%m-%d %H:%M:%S %z', utc=True).astype('datetime64[ns, UTC]')
+        try:
+            pd.testing.assert_series_equal(expected, actual, check_names=False)
+        except AssertionError as e:
+            mismatches.append(f"to_upload_frame {name}: {str(e).splitlines()[0]}")
+    return mismatches
+
+
+def normalized(table):
+    """DataFrame comparable: instantes en UTC, números como float, filas ordenadas"""
+    df = table.select([name for name, _ in SILVER_COLUMNS]).to_pandas()
+    for name, sf_type in SILVER_COLUMNS:
+        if sf_type == 'TIMESTAMP_TZ':
+            df[name] = pd.to_datetime(df[name], utc=True)
+        elif sf_type == 'TIMESTAMP_NTZ':
+            df[name] = pd.to_datetime(df[name])
+        elif sf_type == 'FLOAT' or sf_type.startswith('NUMBER'):
+            df[name] = df[name].astype('float64')
+        elif sf_type == 'VARCHAR':
+            df[name] = df[name].astype(object).where(df[name].notna(), None)
+    return df.sort_values(list(df.columns), na_position='first').reset_index(drop=True)
+
+
+def run_scenario(year, month, rows, chunk_size):
+    bronze = {}
+    for service in ('yellow', 'green'):
+        table = synthetic_bronze(service, year, month, rows)
+        for name, value in (('_data_year', year), ('_data_month', month)):
+            table = table.append_column(name, pa.array(np.full(table.num_rows, value, dtype='int64')))
+        bronze[service] = table.append_column(
+            '_batch_run_id', pa.array([BATCH_RUN_ID] * table.num_rows, type=pa.string())
+        )
+    zones = synthetic_zones()
+
+    expected = normalized(dbt_silver(bronze, zones))
+    engine, seconds = engine_silver(bronze, zones, year, month, chunk_size)
+    actual = normalized(engine)
+
+    result = {
+        'bronze_rows': sum(t.num_rows for t in bronze.values()),
+        'dbt_rows': len(expected),
+        'engine_rows': len(actual),
+        'engine_rows_per_sec': round(len(actual) / seconds) if seconds else None,
+        'mismatches': upload_round_trip(engine),
+    }
+    if len(expected) != len(actual):
+        result['mismatches'].append(f"filas: dbt={len(expected)} to_silver={len(actual)}")
+        return result
+    for name in expected.columns:
+        try:
+            pd.testing.assert_series_equal(expected[name], actual[name], check_dtype=False, check_names=False)
+        except AssertionError as e:
+            result['mismatches'].append(f"{name}: {str(e).splitlines()[0]}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Conformidad de silver_transform.py con los modelos dbt')
+    parser.add_argument('--years', nargs='+', type=int, default=[2015, 2025])
+    parser.add_argument('--months', nargs='+', type=int, default=[1, 7])
+    parser.add_argument('--rows', type=int, default=20_000, help='Filas sintéticas por servicio y mes')
+    parser.add_argument('--chunk-size', type=int, default=7_000)
+    args = parser.parse_args(argv)
+
+    failed = []
+    for year in args.years:
+        for month in args.months:
+            key = f"{year}-{month:02d} (era {era_for(year)})"
+            result = run_scenario(year, month, args.rows, args.chunk_size)
+            status = 'OK' if not result['mismatches'] else 'DIFERENCIAS'
+            print(f"{key}: {status} | bronze {result['bronze_rows']:,} | dbt {result['dbt_rows']:,} | "
+                  f"to_silver {result['engine_rows']:,} ({result['engine_rows_per_sec'] or 0:,} filas/s)")
+            for mismatch in result['mismatches']:
+                print(f"    {mismatch}")
+            if result['mismatches']:
+                failed.append(key)
+
+    if failed:
+        print(f"\nSin conformidad: {', '.join(failed)}")
+    else:
+        print("\nto_silver coincide con stg_enriched en todos los escenarios")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
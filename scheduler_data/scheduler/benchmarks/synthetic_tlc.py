@@ -0,0 +1,220 @@
+import calendar
+import os
+from os import path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Filas por mes de los archivos reales, por servicio y era (escala 1.0)
+ROWS_PER_MONTH = {
+    ('yellow', 2015): 12_500_000,
+    ('yellow', 2025): 3_500_000,
+    ('green', 2015): 1_600_000,
+    ('green', 2025): 50_000,
+}
+
+DEFAULT_ROW_GROUP_SIZE = 1_000_000
+NULL_RATE_2025 = 0.03  # passenger_count, RatecodeID, etc. vienen nulos en parte de 2025
+
+# Schemas Parquet publicados por la TLC en cada era
+ERA_SCHEMAS = {
+    ('yellow', 2015): pa.schema([
+        ('VendorID', pa.int64()),
+        ('tpep_pickup_datetime', pa.timestamp('us')),
+        ('tpep_dropoff_datetime', pa.timestamp('us')),
+        ('passenger_count', pa.float64()),
+        ('trip_distance', pa.float64()),
+        ('RatecodeID', pa.float64()),
+        ('store_and_fwd_flag', pa.string()),
+        ('PULocationID', pa.int64()),
+        ('DOLocationID', pa.int64()),
+        ('payment_type', pa.int64()),
+        ('fare_amount', pa.float64()),
+        ('extra', pa.float64()),
+        ('mta_tax', pa.float64()),
+        ('tip_amount', pa.float64()),
+        ('tolls_amount', pa.float64()),
+        ('improvement_surcharge', pa.float64()),
+        ('total_amount', pa.float64()),
+        ('congestion_surcharge', pa.float64()),
+        ('airport_fee', pa.float64()),
+    ]),
+    ('yellow', 2025): pa.schema([
+        ('VendorID', pa.int32()),
+        ('tpep_pickup_datetime', pa.timestamp('us')),
+        ('tpep_dropoff_datetime', pa.timestamp('us')),
+        ('passenger_count', pa.int64()),
+        ('trip_distance', pa.float64()),
+        ('RatecodeID', pa.int64()),
+        ('store_and_fwd_flag', pa.string()),
+        ('PULocationID', pa.int32()),
+        ('DOLocationID', pa.int32()),
+        ('payment_type', pa.int64()),
+        ('fare_amount', pa.float64()),
+        ('extra', pa.float64()),
+        ('mta_tax', pa.float64()),
+        ('tip_amount', pa.float64()),
+        ('tolls_amount', pa.float64()),
+        ('improvement_surcharge', pa.float64()),
+        ('total_amount', pa.float64()),
+        ('congestion_surcharge', pa.float64()),
+        ('Airport_fee', pa.float64()),
+        ('cbd_congestion_fee', pa.float64()),
+    ]),
+    ('green', 2015): pa.schema([
+        ('VendorID', pa.int64()),
+        ('lpep_pickup_datetime', pa.timestamp('us')),
+        ('lpep_dropoff_datetime', pa.timestamp('us')),
+        ('store_and_fwd_flag', pa.string()),
+        ('RatecodeID', pa.float64()),
+        ('PULocationID', pa.int64()),
+        ('DOLocationID', pa.int64()),
+        ('passenger_count', pa.float64()),
+        ('trip_distance', pa.float64()),
+        ('fare_amount', pa.float64()),
+        ('extra', pa.float64()),
+        ('mta_tax', pa.float64()),
+        ('tip_amount', pa.float64()),
+        ('tolls_amount', pa.float64()),
+        ('ehail_fee', pa.float64()),
+        ('improvement_surcharge', pa.float64()),
+        ('total_amount', pa.float64()),
+        ('payment_type', pa.float64()),
+        ('trip_type', pa.float64()),
+        ('congestion_surcharge', pa.float64()),
+    ]),
+    ('green', 2025): pa.schema([
+        ('VendorID', pa.int32()),
+        ('lpep_pickup_datetime', pa.timestamp('us')),
+        ('lpep_dropoff_datetime', pa.timestamp('us')),
+        ('store_and_fwd_flag', pa.string()),
+        ('RatecodeID', pa.int64()),
+        ('PULocationID', pa.int32()),
+        ('DOLocationID', pa.int32()),
+        ('passenger_count', pa.int64()),
+        ('trip_distance', pa.float64()),
+        ('fare_amount', pa.float64()),
+        ('extra', pa.float64()),
+        ('mta_tax', pa.float64()),
+        ('tip_amount', pa.float64()),
+        ('tolls_amount', pa.float64()),
+        ('ehail_fee', pa.float64()),
+        ('improvement_surcharge', pa.float64()),
+        ('total_amount', pa.float64()),
+        ('payment_type', pa.int64()),
+        ('trip_type', pa.int64()),
+        ('congestion_surcharge', pa.float64()),
+        ('cbd_congestion_fee', pa.float64()),
+    ]),
+}
+
+
+def era_for(year):
+    """Era de schema del año: hasta 2024 se usa el layout 2015, desde 2025 el nuevo"""
+    return 2025 if year >= 2025 else 2015
+
+
+def rows_for(service, year, scale=1.0):
+    return max(int(ROWS_PER_MONTH[(service, era_for(year))] * scale), 1)
+
+
+def synthetic_trips(service, year, month, rows, seed=None):
+    """Tabla Arrow con viajes sintéticos del mes, con el schema TLC de la era del año"""
+    era = era_for(year)
+    schema = ERA_SCHEMAS[(service, era)]
+    rng = np.random.default_rng(seed if seed is not None else year * 100 + month)
+
+    start = np.datetime64(f"{year:04d}-{month:02d}-01T00:00:00", 's')
+    seconds_in_month = calendar.monthrange(year, month)[1] * 86400
+    pickup = start + rng.integers(0, seconds_in_month, rows).astype('timedelta64[s]')
+    duration = rng.gamma(2.0, 450.0, rows).astype('int64') + 60
+    dropoff = pickup + duration.astype('timedelta64[s]')
+
+    distance = np.round(rng.gamma(1.5, 2.0, rows), 2)
+    fare = np.round(3.0 + distance * 2.5 + duration / 60 * 0.5, 2)
+    extra = rng.choice([0.0, 0.5, 1.0], rows)
+    mta_tax = np.full(rows, 0.5)
+    tip = np.round(fare * rng.choice([0.0, 0.15, 0.2, 0.25], rows, p=[0.35, 0.25, 0.25, 0.15]), 2)
+    tolls = np.where(rng.random(rows) < 0.05, 6.94, 0.0)
+    improvement = np.full(rows, 1.0 if era == 2025 else 0.3)
+    congestion = np.full(rows, 2.5) if era == 2025 else None
+    airport = rng.choice([0.0, 1.75], rows, p=[0.9, 0.1]) if era == 2025 else None
+    cbd = np.full(rows, 0.75) if era == 2025 else None
+    total = fare + extra + mta_tax + tip + tolls + improvement
+    for fee in (congestion, airport, cbd):
+        if fee is not None:
+            total = total + fee
+
+    values = {
+        'vendorid': rng.choice([1, 2], rows),
+        'pickup_datetime': pickup,
+        'dropoff_datetime': dropoff,
+        'passenger_count': rng.choice([1, 2, 3, 4, 5, 6], rows, p=[0.7, 0.14, 0.05, 0.03, 0.05, 0.03]),
+        'trip_distance': distance,
+        'ratecodeid': rng.choice([1, 2, 3, 4, 5], rows, p=[0.95, 0.02, 0.01, 0.01, 0.01]),
+        'store_and_fwd_flag': rng.choice(['N', 'Y'], rows, p=[0.99, 0.01]),
+        'pulocationid': rng.integers(1, 266, rows),
+        'dolocationid': rng.integers(1, 266, rows),
+        'payment_type': rng.choice([1, 2, 3, 4], rows, p=[0.7, 0.27, 0.02, 0.01]),
+        'fare_amount': fare,
+        'extra': extra,
+        'mta_tax': mta_tax,
+        'tip_amount': tip,
+        'tolls_amount': tolls,
+        'improvement_surcharge': improvement,
+        'total_amount': np.round(total, 2),
+        'congestion_surcharge': congestion,
+        'airport_fee': airport,
+        'cbd_congestion_fee': cbd,
+        'ehail_fee': None,
+        'trip_type': rng.choice([1, 2], rows, p=[0.97, 0.03]),
+    }
+    nullable = {'passenger_count', 'ratecodeid', 'store_and_fwd_flag', 'congestion_surcharge', 'airport_fee'}
+    null_mask = rng.random(rows) < NULL_RATE_2025 if era == 2025 else None
+
+    arrays = []
+    for field in schema:
+        key = field.name.lower()
+        if key.endswith('pickup_datetime') or key.endswith('dropoff_datetime'):
+            key = key.split('_', 1)[1]
+        data = values[key]
+        if data is None:
+            arrays.append(pa.nulls(rows, type=field.type))
+            continue
+        mask = null_mask if (null_mask is not None and key in nullable) else None
+        arrays.append(pa.array(data, mask=mask).cast(field.type))
+
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_month(service, year, month, dest_dir, rows=None, scale=1.0,
+                row_group_size=DEFAULT_ROW_GROUP_SIZE, seed=None):
+    """
+    Escribe <dest_dir>/trip-data/<service>_tripdata_YYYY-MM.parquet con el mismo nombre
+    y layout que CloudFront. Retorna la ruta del archivo.
+    """
+    rows = rows or rows_for(service, year, scale)
+    target_dir = path.join(dest_dir, 'trip-data')
+    os.makedirs(target_dir, exist_ok=True)
+    target = path.join(target_dir, f"{service}_tripdata_{year:04d}-{month:02d}.parquet")
+
+    table = synthetic_trips(service, year, month, rows, seed=seed)
+    pq.write_table(table, target, row_group_size=min(row_group_size, rows), compression='snappy')
+    return target
+
+
+def generate_dataset(dest_dir, services=('yellow', 'green'), years=(2015, 2025), months=(1,),
+                     scale=0.01, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """Genera los archivos faltantes de la grilla servicio × año × mes; retorna {(s, a, m): filas}"""
+    generated = {}
+    for service in services:
+        for year in years:
+            for month in months:
+                rows = rows_for(service, year, scale)
+                target = path.join(dest_dir, 'trip-data', f"{service}_tripdata_{year:04d}-{month:02d}.parquet")
+                if not path.exists(target) or pq.ParquetFile(target).metadata.num_rows != rows:
+                    write_month(service, year, month, dest_dir, rows=rows, row_group_size=row_group_size)
+                generated[(service, year, month)] = rows
+    return generated
@@ -0,0 +1,30 @@
+
+from scheduler.data_loaders.plan_backfill import save_backfill_report
+from scheduler.utils.backfill_planner import consolidate_report
+
+if 'data_exporter' not in globals():
+    from mage_ai.data_preparation.decorators import data_exporter
+
+
+@data_exporter
+def export_backfill_report(results, *args, **kwargs):
+    """
+    Consolida las salidas de los bloques dinámicos de ingest_data (reduce_output) en un
+    solo reporte de backfill y lo guarda en <repo>/.ingest_metrics/backfill_<ts>.json.
+    """
+    if isinstance(results, dict):
+        results = [results]
+    entries = []
+    for result in results or []:
+        if not isinstance(result, dict):
+            continue
+        entries.append({
+            'unit': {'service': result.get('service'), 'year': result.get('year')},
+            'id': f"{result.get('service')}_{result.get('year')}",
+            'result': result,
+        })
+    report = consolidate_report(entries)
+    report['report_path'] = save_backfill_report(report, kwargs.get('metrics_dir'))
+    print(f"Backfill: {report['units']} unidades, {report['months_successful']} meses cargados, "
+          f"{report['months_failed']} fallidos, {report['rows_loaded']:,} filas")
+    return report
@@ -1,32 +1,39 @@
-from mage_ai.settings.repo import get_repo_path
-from mage_ai.io.config import ConfigFileLoader
-from mage_ai.io.snowflake import Snowflake
-from pandas import DataFrame
-from os import path
+from mage_ai.data_preparation.shared.secrets import get_secret_value
+from scheduler.utils.bulk_exporter import (
+    DEFAULT_PARTITION_ROWS, DEFAULT_WORKERS, EXPORT_MODE_REPLACE, export_frames
+)
+from scheduler.utils.snowflake_connection import get_snowflake_connection
 
 if 'data_exporter' not in globals():
     from mage_ai.data_preparation.decorators import data_exporter
 
 
 @data_exporter
-def export_data_to_snowflake(df: DataFrame, **kwargs) -> None:
+def export_data_to_snowflake(df, **kwargs):
     """
-    Template for exporting data to a Snowflake warehouse.
-    Specify your configuration settings in 'io_config.yaml'.
+    Exporta a Snowflake con el exportador compartido (utils/bulk_exporter.py).
+    `df` puede ser un DataFrame o un generador de DataFrames (bloques que hacen streaming).
 
-    Docs: https://docs.mage.ai/design/data-loading#snowflake
+    Parámetros:
+    - table_name: Tabla destino (obligatorio)
+    - database / schema: Destino (default: secrets SNOWFLAKE_DATABASE / SNOWFLAKE_SCHEMA)
+    - export_mode: 'append', 'replace' o 'upsert' (default: 'replace')
+    - keys: Columnas clave para 'upsert'
+    - export_workers: Conexiones subiendo particiones en paralelo (default: 4)
+    - partition_rows: Filas por partición (default: 250000)
+    Retorna el reporte de throughput del run.
     """
-    table_name = 'your_table_name'
-    database = 'your_database_name'
-    schema = 'your_schema_name'
-    config_path = path.join(get_repo_path(), 'io_config.yaml')
-    config_profile = 'default'
+    table_name = kwargs.get('table_name')
+    if not table_name:
+        raise Exception("export_data_to_snowflake requiere 'table_name'")
+    database = kwargs.get('database') or get_secret_value('SNOWFLAKE_DATABASE')
+    schema = kwargs.get('schema') or get_secret_value('SNOWFLAKE_SCHEMA')
 
-    with Snowflake.with_config(ConfigFileLoader(config_path, config_profile)) as loader:
-        loader.export(
-            df,
-            table_name,
-            database,
-            schema,
-            if_exists='replace',  # Specify resolution policy if table already exists
-        )
+    return export_frames(
+        df, table_name, database, schema,
+        lambda: get_snowflake_connection(database, schema),
+        mode=kwargs.get('export_mode', EXPORT_MODE_REPLACE),
+        keys=kwargs.get('keys'),
+        workers=int(kwargs.get('export_workers', DEFAULT_WORKERS)),
+        partition_rows=int(kwargs.get('partition_rows', DEFAULT_PARTITION_ROWS)),
+    )
@@ -3,13 +3,42 @@ import requests
 from datetime import datetime
 import uuid
 from mage_ai.settings.repo import get_repo_path
-from mage_ai.io.config import ConfigFileLoader
 from mage_ai.io.snowflake import Snowflake
 from os import path
-import snowflake.connector
+import os
+import functools
+import contextvars
+from contextlib import contextmanager
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import shutil
+import tempfile
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from scheduler.utils.download_cache import DownloadCache, DEFAULT_MAX_BYTES
+from scheduler.utils.connection_pool import ConnectionPool, DEFAULT_POOL_SIZE
+from scheduler.utils.snowflake_connection import get_snowflake_connection
+from scheduler.utils.stage_backends import LocalStage, SnowflakeStage
+from scheduler.utils.chunk_sizer import (
+    AdaptiveChunkSizer, METADATA_COLUMNS, MIN_CHUNK_ROWS, READ_BATCH_ROWS, adaptive_batches,
+    estimate_bytes_per_row
+)
+from scheduler.utils.compact_chunk import (
+    build_compact_plan, chunk_memory_report, compact_to_pandas, expand_constant_columns,
+    set_constant_columns, wide_columns
+)
+from scheduler.utils.ingest_metrics import IngestMetrics, NullMetrics, RunProfiler, peak_rss_bytes
+from scheduler.utils.query_cache import invalidate_query_cache
+from scheduler.utils.arrow_fetch import cursor_to_arrow
+from scheduler.utils.ingest_profiles import LeanReader, PROFILE_FULL, PROFILE_LEAN
+from scheduler.utils.silver_transform import SILVER_COLUMNS, ZoneLookup, to_silver, to_upload_frame
 from snowflake.connector.pandas_tools import write_pandas
 from mage_ai.data_preparation.shared.secrets import get_secret_value
 import gc
+import hashlib
 import time
 
 
@@ -22,6 +51,57 @@ MAX_RETRIES = 3
 RETRY_DELAY = 5  # segundos
 BACKOFF_MULTIPLIER = 2  # delay exponencial
 
+# Origen de los archivos TLC (sobrescribible, p.ej. servidor local del benchmark)
+TLC_BASE_URL = os.getenv('TLC_BASE_URL', 'https://d37ci6vzurychx.cloudfront.net').rstrip('/')
+
+# Descarga en streaming
+DOWNLOAD_BLOCK_SIZE = 8 * 1024 * 1024  # bytes por bloque escrito a disco
+DOWNLOAD_CACHE_DIR = '.download_cache'  # relativo al repo de Mage
+
+# Sesiones Snowflake reutilizables, una por (database, schema)
+SNOWFLAKE_POOLS = {}
+SNOWFLAKE_POOLS_LOCK = threading.Lock()
+ACTIVE_RUNS = 0  # load_data en curso en el proceso (cola de plan_backfill); los pools se cierran con el último
+# Espera máxima por una conexión del pool: un pool agotado falla en vez de colgar el run
+POOL_ACQUIRE_TIMEOUT = 600  # segundos
+
+# Modos de carga a Bronze
+LOAD_MODE_INSERT = 'insert'  # tabla temporal + INSERT ... SELECT por chunk
+LOAD_MODE_STAGE_COPY = 'stage_copy'  # Parquet por chunk a un stage + COPY INTO atómico por mes
+LOAD_MODE_MERGE = 'merge'  # staging del mes + MERGE por hash de fila (solo escribe lo que cambió)
+LOCAL_STAGE_DIR = '.ingest_stage'  # relativo al repo de Mage (stage_backend='local')
+
+# Clave natural de fct_trips en columnas Bronze (+ service_type, constante por tabla)
+NATURAL_KEY_COLUMNS = {
+    'yellow': ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'PULocationID', 'DOLocationID', 'total_amount'],
+    'green': ['lpep_pickup_datetime', 'lpep_dropoff_datetime', 'PULocationID', 'DOLocationID', 'total_amount'],
+}
+# _key_hash: clave natural, _row_hash: contenido de la fila, _row_key: clave + ordinal entre duplicados
+MERGE_HASH_COLUMNS = ['_key_hash', '_row_hash', '_row_key']
+
+# Formatos de texto para columnas temporales en Bronze
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+# Columnas conocidas de cada tabla Bronze {FQN: {COLUMNA: TIPO}}, evita releer INFORMATION_SCHEMA
+TABLE_COLUMNS_CACHE = {}
+TABLE_COLUMNS_LOCK = threading.Lock()
+
+# Ledger de chunks confirmados para reanudar meses interrumpidos
+CHECKPOINT_TABLE = 'INGEST_CHECKPOINTS'
+
+# Silver emitido en la misma pasada que Bronze (emit_silver), leído por stg_enriched
+SILVER_SCHEMA = 'SILVER'
+SILVER_TABLE = 'TRIPS_ENRICHED'
+
+# Columnas agregadas a AUDIT_COVERAGE después de su versión original (ALTER en tablas antiguas)
+AUDIT_ADDED_COLUMNS = {'_BATCH_RUN_ID': 'VARCHAR', 'ROWS_REJECTED': 'NUMBER', 'INGEST_PROFILE': 'VARCHAR'}
+
+# Métricas por etapa del run activo (JSON lines + archivo Prometheus). ContextVar: cada
+# load_data de la cola de plan_backfill corre en su thread y ve solo sus métricas
+METRICS_DIR = '.ingest_metrics'  # relativo al repo de Mage
+INGEST_METRICS = contextvars.ContextVar('ingest_metrics', default=NullMetrics())
+
 
 @data_loader
 def load_data(*args, **kwargs):
@@ -33,10 +113,56 @@ def load_data(*args, **kwargs):
     - service: 'yellow', 'green', 'taxi_zones', etc.
     - year: Año a procesar
     - months: Lista de meses [1,2,3] o None para todos
-    - chunk_size: Filas por chunk (default: 1000000)
+    - chunk_size: Filas por chunk / batch de lectura Parquet (default: 1000000)
     - force_reload: Sobrescribir datos existentes (default: False)
     - max_retries: Número máximo de reintentos (default: 3)
+    - use_download_cache: Reutilizar archivos TLC ya descargados (default: True)
+    - cache_dir: Directorio del cache (default: <repo>/.download_cache)
+    - cache_max_gb: Presupuesto de disco del cache, evicción LRU (default: 20)
+    - parallel_months: Meses procesados en paralelo (default: 1 = secuencial)
+    - max_inflight_rows: Tope de filas en memoria entre todos los workers
+      (default: chunk_size * parallel_months)
+    - pool_size: Conexiones Snowflake reutilizables (default: max(4, 2 * parallel_months),
+      3 por mes con emit_silver)
+    - load_mode: 'insert' (tabla temporal por chunk), 'stage_copy' o 'merge' (MERGE por hash
+      de fila: inserta filas nuevas, actualiza las cambiadas y no toca las idénticas; usar con
+      force_reload para re-procesar meses ya cargados) (default: 'insert')
+    - merge_delete_missing: En modo 'merge', borrar las filas del mes que ya no están en el
+      archivo (default: False)
+    - stage_backend: 'snowflake' (stage interno) o 'local' (filesystem) para stage_copy
+    - stage_dir: Directorio del stage local (default: <repo>/.ingest_stage)
+    - copy_files_per_batch: Archivos por COPY INTO, 0 = uno solo por mes (default: 0)
+    - typed_bronze: Crear tablas nuevas con tipos del Parquet en vez de VARCHAR (default: True)
+    - checkpoints: Confirmar cada chunk en INGEST_CHECKPOINTS y reanudar meses
+      interrumpidos desde el primer chunk pendiente (default: True, modo 'insert')
+    - prefetch_depth: Meses descargados por adelantado mientras se exporta el actual,
+      solo en modo secuencial (default: 0 = sin prefetch)
+    - metrics: Registrar tiempos/bytes/filas por etapa en JSON lines y Prometheus (default: True)
+    - metrics_dir: Directorio de métricas (default: <repo>/.ingest_metrics)
+    - profile: 'cprofile', 'tracemalloc' o 'both' para capturar un perfil del run (default: None)
+    - memory_budget_mb: Activa chunks adaptativos con este presupuesto de memoria por chunk,
+      repartido entre los meses en paralelo (default: None = chunk_size fijo)
+    - target_chunk_seconds: Latencia objetivo por chunk en modo adaptativo; sin ella el
+      tamaño sube mientras mejoren las filas/s medidas (default: None)
+    - min_chunk_size / max_chunk_size: Límites del modo adaptativo (default: 50000 / sin tope)
+    - query_cache_dir: Cache de consultas de análisis a invalidar cuando se carga un mes
+      (default: variable de entorno QUERY_CACHE_DIR)
+    - ingest_profile: 'full' (todas las columnas y filas del archivo) o 'lean' (solo las
+      columnas que usa Silver y sin las filas que Silver descarta; proyección y filtro se
+      empujan al lector Parquet y las filas rechazadas quedan en AUDIT_COVERAGE) (default: 'full')
+    - emit_silver: Calcular también las filas de stg_enriched de cada chunk (Arrow/NumPy) y
+      publicarlas por mes en SILVER.TRIPS_ENRICHED, para que dbt no vuelva a leer Bronze
+      (default: False)
+    - silver_schema: Esquema de la tabla Silver emitida (default: 'SILVER')
+    - compact_chunks: Chunks en memoria con enteros reducidos, texto repetido como categoría
+      y los metadatos de ingesta guardados una vez por chunk hasta serializarlo; el resultado
+      de cada mes trae los bytes/fila medidos (default: True)
     """
+    global ACTIVE_RUNS
+    
+    # Unidad de trabajo de plan_backfill (bloque dinámico): tiene prioridad sobre kwargs
+    if args and isinstance(args[0], dict) and 'service' in args[0]:
+        kwargs = dict(kwargs, **{k: v for k, v in args[0].items() if v is not None})
 
     print(f"DEBUG kwargs completos: {kwargs}")
     print(f"DEBUG year en kwargs: {'year' in kwargs}")
@@ -50,85 +176,442 @@ def load_data(*args, **kwargs):
     chunk_size = int(kwargs.get('chunk_size', 1000000))
     force_reload = kwargs.get('force_reload', False)
     max_retries = int(kwargs.get('max_retries', MAX_RETRIES))
+    parallel_months = max(int(kwargs.get('parallel_months', 1)), 1)
+    load_mode = kwargs.get('load_mode', LOAD_MODE_INSERT)
+    if load_mode not in (LOAD_MODE_INSERT, LOAD_MODE_STAGE_COPY, LOAD_MODE_MERGE):
+        raise ValueError(f"load_mode no soportado: {load_mode}")
+    ingest_profile = kwargs.get('ingest_profile') or PROFILE_FULL
+    if ingest_profile not in (PROFILE_FULL, PROFILE_LEAN):
+        raise ValueError(f"ingest_profile no soportado: {ingest_profile}")
+    max_inflight_rows = int(kwargs.get('max_inflight_rows') or chunk_size * parallel_months)
+    # Cada mes usa una conexión de exportación + una para helpers (auditoría, conteos),
+    # y con emit_silver otra más para el staging Silver
+    emit_silver = kwargs.get('emit_silver', False) and service in ['yellow', 'green']
+    connections_per_month = 3 if emit_silver else 2
+    pool_size = int(kwargs.get('pool_size') or max(DEFAULT_POOL_SIZE, connections_per_month * parallel_months))
+    get_connection_pool(database, schema, max_size=pool_size)
+    with SNOWFLAKE_POOLS_LOCK:
+        ACTIVE_RUNS += 1
+    # Desde aquí el run cuenta en ACTIVE_RUNS: pools, métricas y profiler se liberan
+    # también si un mes o un helper lanza una excepción
+    pool_closed = False
+    profiler = None
+    metrics_token = None
+    try:
+    
+        copy_files_per_batch = int(kwargs.get('copy_files_per_batch', 0))
+        typed_bronze = kwargs.get('typed_bronze', True)
+        use_checkpoints = kwargs.get('checkpoints', True)
+        prefetch_depth = int(kwargs.get('prefetch_depth', 0))
+        # Cache de resultados de análisis (utils/query_cache.py) a invalidar al cerrar cada mes
+        query_cache_dir = kwargs.get('query_cache_dir') or os.getenv('QUERY_CACHE_DIR')
+    
+        adaptive = None
+        if kwargs.get('memory_budget_mb'):
+            target_seconds = kwargs.get('target_chunk_seconds')
+            adaptive = {
+                'memory_budget_bytes': float(kwargs['memory_budget_mb']) * 1024 ** 2 / parallel_months,
+                'target_seconds': float(target_seconds) if target_seconds else None,
+                'min_rows': int(kwargs.get('min_chunk_size') or MIN_CHUNK_ROWS),
+                'max_rows': int(kwargs['max_chunk_size']) if kwargs.get('max_chunk_size') else None
+            }
+        stage_backend = None
+        if load_mode == LOAD_MODE_STAGE_COPY:
+            if kwargs.get('stage_backend', 'snowflake') == 'local':
+                stage_backend = LocalStage(kwargs.get('stage_dir') or path.join(get_repo_path(), LOCAL_STAGE_DIR))
+            else:
+                stage_backend = SnowflakeStage(database, schema)
+    
+        compact_chunks = kwargs.get('compact_chunks', True)
     
-    # Normalizar months a lista de enteros
-    if months is None:
-        months = list(range(1, 13))
-    elif isinstance(months, int):
-        months = [months]
-    elif isinstance(months, str):
-        months = [int(m.strip()) for m in months.strip('[]').split(',')]
-    elif isinstance(months, list):
-        months = [int(m) for m in months]
-    
-    batch_run_id = str(uuid.uuid4())
-    
-    execution_date = kwargs.get('execution_date')
-    if execution_date:
-        if isinstance(execution_date, datetime):
-            batch_timestamp = execution_date.strftime('%Y-%m-%d %H:%M:%S')
+        silver = None
+        if emit_silver:
+            silver = {
+                'schema': kwargs.get('silver_schema') or SILVER_SCHEMA,
+                'zones': load_zone_lookup(database, schema)
+            }
+    
+        download_cache = None
+        if kwargs.get('use_download_cache', True):
+            cache_max_gb = kwargs.get('cache_max_gb')
+            download_cache = DownloadCache(
+                kwargs.get('cache_dir') or path.join(get_repo_path(), DOWNLOAD_CACHE_DIR),
+                max_bytes=float(cache_max_gb) * 1024 ** 3 if cache_max_gb else DEFAULT_MAX_BYTES
+            )
+    
+        # Normalizar months a lista de enteros. taxi_zones es una tabla estática:
+        # se carga una sola vez aunque se pidan varios meses
+        if service == 'taxi_zones':
+            months = [1]
+        elif months is None:
+            months = list(range(1, 13))
+        elif isinstance(months, int):
+            months = [months]
+        elif isinstance(months, str):
+            months = [int(m.strip()) for m in months.strip('[]').split(',')]
+        elif isinstance(months, list):
+            months = [int(m) for m in months]
+    
+        batch_run_id = str(uuid.uuid4())
+    
+        execution_date = kwargs.get('execution_date')
+        if execution_date:
+            if isinstance(execution_date, datetime):
+                batch_timestamp = execution_date.strftime('%Y-%m-%d %H:%M:%S')
+            else:
+                batch_timestamp = str(execution_date)
         else:
-            batch_timestamp = str(execution_date)
-    else:
-        batch_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    print(f"=" * 80)
-    print(f"BACKFILL STREAMING CON REINTENTOS - {service.upper()} {year}")
-    print(f"Meses: {months}, Chunk size: {chunk_size:,}, Max reintentos: {max_retries}")
-    print(f"Batch ID: {batch_run_id[:8]}")
-    print(f"=" * 80)
-    
-    results = {
-        'batch_run_id': batch_run_id,
-        'service': service,
-        'year': year,
-        'batch_timestamp': batch_timestamp,
-        'months_attempted': len(months),
-        'months_successful': 0,
-        'months_skipped': 0,
-        'months_failed': 0,
-        'months_gap': 0,
-        'total_rows_loaded': 0,
-        'monthly_results': []
-    }
+            batch_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    for month in months:
-        print(f"\n[{month:02d}] Procesando {service} {year}-{month:02d}")
-        
-        month_result = process_month_streaming(
+        metrics_dir = kwargs.get('metrics_dir') or path.join(get_repo_path(), METRICS_DIR)
+        metrics_prefix = path.join(metrics_dir, f"ingest_{service}_{year}_{batch_run_id[:8]}")
+        if kwargs.get('metrics', True):
+            metrics_token = INGEST_METRICS.set(IngestMetrics(
+                batch_run_id, labels={'service': service, 'year': year},
+                log_path=f"{metrics_prefix}.jsonl"
+            ))
+        else:
+            metrics_token = INGEST_METRICS.set(NullMetrics())
+        profiler = RunProfiler(kwargs['profile'], metrics_prefix).start() if kwargs.get('profile') else None
+    
+        print(f"=" * 80)
+        print(f"BACKFILL STREAMING CON REINTENTOS - {service.upper()} {year}")
+        if adaptive:
+            print(f"Meses: {months}, Chunk size: adaptativo ({adaptive['memory_budget_bytes'] / 1024 ** 2:,.0f} MB "
+                  f"por mes), Max reintentos: {max_retries}")
+        else:
+            print(f"Meses: {months}, Chunk size: {chunk_size:,}, Max reintentos: {max_retries}")
+        print(f"Batch ID: {batch_run_id[:8]}")
+        print(f"=" * 80)
+    
+        results = {
+            'batch_run_id': batch_run_id,
+            'service': service,
+            'year': year,
+            'batch_timestamp': batch_timestamp,
+            'months_attempted': len(months),
+            'months_successful': 0,
+            'months_skipped': 0,
+            'months_failed': 0,
+            'months_gap': 0,
+            'total_rows_loaded': 0,
+            'monthly_results': []
+        }
+    
+        # Cobertura existente de todo el rango en una sola consulta agrupada
+        coverage = load_coverage_ledger(database, schema, service, [(year, m) for m in months])
+        checkpoints = None
+        if use_checkpoints:
+            checkpoints = load_checkpoint_ledger(database, schema, service, [(year, m) for m in months])
+    
+        month_kwargs = dict(
             service=service,
             year=year,
-            month=month,
             database=database,
             schema=schema,
-            chunk_size=chunk_size,
+            # En modo adaptativo el lector entrega lotes pequeños que el sizer re-agrupa
+            chunk_size=min(READ_BATCH_ROWS, chunk_size) if adaptive else chunk_size,
             force_reload=force_reload,
             batch_run_id=batch_run_id,
             batch_timestamp=batch_timestamp,
-            max_retries=max_retries
+            max_retries=max_retries,
+            download_cache=download_cache,
+            load_mode=load_mode,
+            stage_backend=stage_backend,
+            copy_files_per_batch=copy_files_per_batch,
+            typed_bronze=typed_bronze,
+            merge_delete_missing=bool(kwargs.get('merge_delete_missing', False)),
+            ingest_profile=ingest_profile,
+            compact_chunks=compact_chunks,
+            silver=silver,
+            coverage=coverage,
+            checkpoints=checkpoints,
+            adaptive=adaptive,
+            query_cache_dir=query_cache_dir
         )
-        
-        results['monthly_results'].append(month_result)
-        
-        if month_result['success']:
-            results['months_successful'] += 1
-            results['total_rows_loaded'] += month_result.get('rows_loaded', 0)
-        elif month_result.get('skipped'):
-            results['months_skipped'] += 1
-        elif month_result.get('gap'):
-            results['months_gap'] += 1
+    
+        if parallel_months > 1 and len(months) > 1:
+            month_results = process_months_parallel(
+                months, month_kwargs, parallel_months, max_inflight_rows
+            )
+            for month_result in month_results:
+                accumulate_month_result(results, month_result)
+        elif prefetch_depth > 0 and len(months) > 1:
+            results['prefetch'] = process_months_pipelined(
+                months, month_kwargs, prefetch_depth, results
+            )
         else:
-            results['months_failed'] += 1
-        
-        gc.collect()
+            for month in months:
+                print(f"\n[{month:02d}] Procesando {service} {year}-{month:02d}")
+            
+                month_result = process_month_streaming(month=month, **month_kwargs)
+                accumulate_month_result(results, month_result)
+            
+                gc.collect()
+    
+        print(f"\n{'=' * 80}")
+        print(f"RESUMEN: Exitosos={results['months_successful']}, Saltados={results['months_skipped']}, "
+              f"Brechas={results['months_gap']}, Fallidos={results['months_failed']}")
+        print(f"Total filas: {results['total_rows_loaded']:,}")
+        results['connection_pool'] = close_connection_pools()
+        pool_closed = True
+        print(f"Pool Snowflake: {results['connection_pool']}")
+        if download_cache is not None:
+            results['download_cache'] = dict(download_cache.stats)
+            print(f"Cache descargas: {download_cache.stats}")
+        if profiler is not None:
+            results['profile'] = profiler.stop()
+            profiler = None
+            print(f"Profiling: {results['profile']}")
+    
+        # Meses para los modelos dbt incrementales (var touched_months); sin la variable
+        # dbt los deduce de AUDIT_COVERAGE
+        results['touched_partitions'] = [
+            f"{service}:{m['year']:04d}-{m['month']:02d}"
+            for m in results['monthly_results']
+            if m.get('success') and not m.get('skipped') and service in ['yellow', 'green']
+        ]
+        results['dbt_vars'] = json.dumps({'touched_months': results['touched_partitions']})
+        if results['touched_partitions']:
+            print(f"dbt --vars '{results['dbt_vars']}'")
+    
+        results['timings'] = INGEST_METRICS.get().summary()
+        INGEST_METRICS.get().write_prometheus(
+            path.join(metrics_dir, f"ingest_{service}_{year}.prom"),
+            gauges={
+                'rows_loaded': results['total_rows_loaded'],
+                'months_successful': results['months_successful'],
+                'months_failed': results['months_failed'],
+                'months_gap': results['months_gap'],
+            }
+        )
+        if results['timings']:
+            print(f"Métricas: {metrics_prefix}.jsonl, {path.join(metrics_dir, f'ingest_{service}_{year}.prom')}")
+        print(f"{'=' * 80}")
+    
+        return results
+    finally:
+        if not pool_closed:
+            close_connection_pools()
+        if profiler is not None:
+            profiler.stop()
+        if metrics_token is not None:
+            INGEST_METRICS.get().close()
+            INGEST_METRICS.reset(metrics_token)
+
+
+def accumulate_month_result(results, month_result):
+    """Agrega el resultado de un mes a los contadores del batch"""
+    results['monthly_results'].append(month_result)
+    
+    if month_result['success']:
+        results['months_successful'] += 1
+        results['total_rows_loaded'] += month_result.get('rows_loaded', 0)
+    elif month_result.get('skipped'):
+        results['months_skipped'] += 1
+    elif month_result.get('gap'):
+        results['months_gap'] += 1
+    else:
+        results['months_failed'] += 1
+
+
+class AdmissionController:
+    """
+    Limita las filas en memoria entre todos los meses en paralelo.
+    Cada worker reserva filas antes de decodificar un chunk y las libera al exportarlo.
+    """
+    
+    def __init__(self, max_inflight_rows):
+        self.max_inflight_rows = max_inflight_rows
+        self.inflight_rows = 0
+        self.peak_inflight_rows = 0
+        self.wait_seconds = 0.0
+        self._cond = threading.Condition()
+    
+    def acquire(self, rows):
+        start = time.time()
+        with self._cond:
+            # Si nada está en vuelo se admite aunque exceda el tope (evita deadlock)
+            while self.inflight_rows > 0 and self.inflight_rows + rows > self.max_inflight_rows:
+                self._cond.wait()
+            self.inflight_rows += rows
+            self.peak_inflight_rows = max(self.peak_inflight_rows, self.inflight_rows)
+            self.wait_seconds += time.time() - start
+    
+    def release(self, rows):
+        with self._cond:
+            self.inflight_rows -= rows
+            self._cond.notify_all()
+
+
+def admitted_chunks(chunks, admission, rows_per_chunk):
+    """Envuelve el generador de chunks: reserva filas antes de leer, libera al siguiente paso"""
+    while True:
+        admission.acquire(rows_per_chunk)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            admission.release(rows_per_chunk)
+            return
+        except Exception:
+            admission.release(rows_per_chunk)
+            raise
+        try:
+            yield chunk
+        finally:
+            # El consumidor exportó el chunk (o abandonó el generador)
+            admission.release(rows_per_chunk)
+
+
+def process_months_parallel(months, month_kwargs, workers, max_inflight_rows):
+    """
+    Procesa varios meses a la vez con un pool de threads acotado.
+    Retorna los resultados en el mismo orden que `months` (igual que el modo secuencial).
+    """
+    admission = AdmissionController(max_inflight_rows)
+    workers = min(workers, len(months))
+    print(f"\nModo paralelo: {workers} workers, máximo {max_inflight_rows:,} filas en vuelo")
+    
+    def _run(month):
+        print(f"\n[{month:02d}] Procesando {month_kwargs['service']} {month_kwargs['year']}-{month:02d}")
+        try:
+            return process_month_streaming(month=month, admission=admission, **month_kwargs)
+        finally:
+            gc.collect()
+    
+    # Cada mes corre en una copia del contexto del run (sus métricas); un Context no se
+    # puede usar desde dos threads a la vez, por eso una copia por mes
+    contexts = [contextvars.copy_context() for _ in months]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest_month') as executor:
+        month_results = list(executor.map(lambda context, month: context.run(_run, month), contexts, months))
+    
+    print(f"Admisión: pico {admission.peak_inflight_rows:,} filas en vuelo, "
+          f"espera total {admission.wait_seconds:.1f}s")
+    return month_results
+
+
+class MonthPrefetcher:
+    """
+    Productor en background: descarga y abre los meses siguientes en una cola acotada
+    (prefetch_depth) mientras el consumidor exporta el mes actual.
+    """
+    
+    def __init__(self, months, fetch_fn, depth, should_fetch=None):
+        self.months = list(months)
+        self.fetch_fn = fetch_fn
+        self.should_fetch = should_fetch
+        self.queue = queue.Queue(maxsize=max(int(depth), 1))
+        self._stop = threading.Event()
+        # El productor registra sus descargas en las métricas del run que lo creó
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run,), name='ingest_prefetch', daemon=True
+        )
+        self._occupancy = []
+        self.metrics = {
+            'depth': self.queue.maxsize,
+            'months_prefetched': 0,
+            'fetch_seconds': 0.0,
+            'producer_blocked_seconds': 0.0,  # cola llena: la subida es el cuello de botella
+            'consumer_wait_seconds': 0.0,  # cola vacía: la descarga es el cuello de botella
+        }
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def _run(self):
+        for month in self.months:
+            if self._stop.is_set():
+                return
+            item = {'month': month}
+            if self.should_fetch is None or self.should_fetch(month):
+                start = time.time()
+                try:
+                    item['source'] = self.fetch_fn(month)
+                    self.metrics['months_prefetched'] += 1
+                except Exception as e:
+                    item['error'] = e
+                self.metrics['fetch_seconds'] += time.time() - start
+            
+            start = time.time()
+            self.queue.put(item)
+            self.metrics['producer_blocked_seconds'] += time.time() - start
+    
+    def get(self):
+        """Siguiente mes preparado, en el mismo orden que `months`"""
+        self._occupancy.append(self.queue.qsize())
+        start = time.time()
+        item = self.queue.get()
+        self.metrics['consumer_wait_seconds'] += time.time() - start
+        return item
+    
+    def close(self):
+        """Detiene el productor y limpia los archivos de meses no consumidos"""
+        self._stop.set()
+        while self._thread.is_alive() or not self.queue.empty():
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item.get('source'):
+                shutil.rmtree(item['source']['work_dir'], ignore_errors=True)
+        self._thread.join()
+    
+    def snapshot(self):
+        metrics = dict(self.metrics)
+        if self._occupancy:
+            metrics['queue_occupancy_avg'] = sum(self._occupancy) / len(self._occupancy)
+            metrics['queue_occupancy_max'] = max(self._occupancy)
+        return metrics
+
+
+def process_months_pipelined(months, month_kwargs, depth, results):
+    """
+    Modo productor/consumidor: mientras se exporta el mes N, MonthPrefetcher descarga
+    los meses N+1..N+depth. Acumula en `results` igual que el modo secuencial.
+    """
+    service, year = month_kwargs['service'], month_kwargs['year']
+    
+    def _fetch(month):
+        return fetch_month_source(
+            service, year, month, month_kwargs['chunk_size'],
+            month_kwargs['max_retries'], month_kwargs['download_cache'],
+            month_kwargs['ingest_profile']
+        )
+    
+    def _should_fetch(month):
+        return not month_known_loaded(
+            service, year, month, month_kwargs['force_reload'],
+            month_kwargs['coverage'], month_kwargs['checkpoints']
+        )
     
-    print(f"\n{'=' * 80}")
-    print(f"RESUMEN: Exitosos={results['months_successful']}, Saltados={results['months_skipped']}, "
-          f"Brechas={results['months_gap']}, Fallidos={results['months_failed']}")
-    print(f"Total filas: {results['total_rows_loaded']:,}")
-    print(f"{'=' * 80}")
+    print(f"\nModo pipeline: prefetch de hasta {depth} meses")
+    prefetcher = MonthPrefetcher(months, _fetch, depth, should_fetch=_should_fetch).start()
+    try:
+        for month in months:
+            item = prefetcher.get()
+            print(f"\n[{month:02d}] Procesando {service} {year}-{month:02d} (cola: {prefetcher.queue.qsize()})")
+            
+            prefetched = item if ('source' in item or 'error' in item) else None
+            month_result = process_month_streaming(month=month, prefetched=prefetched, **month_kwargs)
+            accumulate_month_result(results, month_result)
+            
+            gc.collect()
+    finally:
+        prefetcher.close()
     
-    return results
+    metrics = prefetcher.snapshot()
+    print(f"Prefetch: {metrics}")
+    return metrics
+
+
+def month_known_loaded(service, year, month, force_reload, coverage, checkpoints):
+    """True si el ledger ya sabe que el mes se va a saltar (no hace falta descargarlo)"""
+    if force_reload or service == 'taxi_zones' or coverage is None:
+        return False
+    if checkpoints and (year, month) in checkpoints:
+        return False
+    return coverage.get((year, month), 0) > 0
 
 
 def retry_with_backoff(func, *args, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY, **kwargs):
@@ -141,38 +624,257 @@ def retry_with_backoff(func, *args, max_retries=MAX_RETRIES, retry_delay=RETRY_D
                 raise
             
             wait_time = retry_delay * (BACKOFF_MULTIPLIER ** attempt)
+            op = getattr(func, '__name__', None)
+            INGEST_METRICS.get().record('retry', 0.0, op=op, error=type(e).__name__, attempt=attempt + 1)
             print(f"    Intento {attempt + 1}/{max_retries} falló: {e}")
             print(f"    Reintentando en {wait_time}s...")
-            time.sleep(wait_time)
+            with INGEST_METRICS.get().stage('backoff_sleep', op=op):
+                time.sleep(wait_time)
     
     raise Exception(f"Falló después de {max_retries} intentos")
 
 
-def download_file_with_retry(url, service, max_retries=MAX_RETRIES):
-    """Descarga archivo con reintentos"""
+def download_file_with_retry(url, dest_path, max_retries=MAX_RETRIES, download_cache=None):
+    """
+    Descarga archivo a disco en bloques (una sola vez) con reintentos.
+    Con download_cache retorna la ruta del archivo cacheado y dest_path no se usa; el
+    objeto queda fijado en el cache mientras exista el directorio de dest_path.
+    """
+    if download_cache is not None:
+        return retry_with_backoff(
+            download_cache.fetch, url, holder=path.dirname(path.abspath(dest_path)), max_retries=max_retries
+        )
+    
     def _download():
-        response = requests.get(url, timeout=300)
-        response.raise_for_status()
-        
-        if service == 'taxi_zones':
-            return pd.read_csv(url)
-        else:
-            return pd.read_parquet(url)
+        tmp_path = f"{dest_path}.part"
+        with requests.get(url, stream=True, timeout=300) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for block in response.iter_content(chunk_size=DOWNLOAD_BLOCK_SIZE):
+                    f.write(block)
+        os.replace(tmp_path, dest_path)
+        return dest_path
     
     return retry_with_backoff(_download, max_retries=max_retries)
 
 
+def get_source_url(service, year, month):
+    """Retorna (url, filename) del archivo TLC del período"""
+    if service == 'taxi_zones':
+        return f"{TLC_BASE_URL}/misc/taxi_zone_lookup.csv", "taxi_zone_lookup.csv"
+    
+    base_url = f"{TLC_BASE_URL}/trip-data"
+    filename = f"{service}_tripdata_{year:04d}-{month:02d}.parquet"
+    return f"{base_url}/{filename}", filename
+
+
+def fetch_month_source(service, year, month, chunk_size, max_retries, download_cache=None,
+                       ingest_profile=PROFILE_FULL):
+    """
+    Descarga el archivo del mes y abre su lector sin decodificar filas.
+    Con el perfil 'lean' el lector es un LeanReader (source['lean_reader']).
+    El consumidor es responsable de borrar source['work_dir'].
+    """
+    url, filename = get_source_url(service, year, month)
+    work_dir = tempfile.mkdtemp(prefix='tlc_ingest_')
+    # El prefetch corre en otro thread: el scope atribuye la descarga a su mes
+    with INGEST_METRICS.get().month_scope(month):
+        try:
+            with INGEST_METRICS.get().stage('download') as span:
+                local_path = download_file_with_retry(
+                    url, path.join(work_dir, filename), max_retries=max_retries,
+                    download_cache=download_cache
+                )
+                span['bytes'] = path.getsize(local_path)
+            lean_reader = None
+            with INGEST_METRICS.get().stage('parse', op='open') as span:
+                if ingest_profile == PROFILE_LEAN and service in ['yellow', 'green']:
+                    lean_reader = LeanReader(local_path, service, chunk_size)
+                    total_rows, source_schema, batches = (
+                        lean_reader.total_rows, lean_reader.schema, lean_reader.batches()
+                    )
+                else:
+                    total_rows, source_schema, batches = open_source_reader(local_path, service, chunk_size)
+                span['rows'] = total_rows
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+    
+    return {
+        'url': url,
+        'filename': filename,
+        'work_dir': work_dir,
+        'local_path': local_path,
+        'total_rows': total_rows,
+        'source_schema': source_schema,
+        'batches': batches,
+        'lean_reader': lean_reader
+    }
+
+
+def open_source_reader(local_path, service, chunk_size):
+    """
+    Abre el archivo descargado sin materializar el mes completo.
+    Retorna (total_rows, schema Arrow, generador de RecordBatches de hasta chunk_size filas)
+    """
+    if service == 'taxi_zones':
+        table = pa.Table.from_pandas(pd.read_csv(local_path), preserve_index=False)
+        return table.num_rows, table.schema, iter(table.to_batches(max_chunksize=chunk_size))
+    
+    parquet_file = pq.ParquetFile(local_path)
+    # iter_batches lee row group por row group: memoria ~ un chunk
+    batches = parquet_file.iter_batches(batch_size=chunk_size)
+    return parquet_file.metadata.num_rows, parquet_file.schema_arrow, batches
+
+
+def convert_chunks(batches, source_schema, table_columns, skip_chunks=(), compact_chunks=True,
+                   memory_report=None):
+    """Planes de conversión (y compactación) del mes sobre la tabla destino + iter_converted_chunks"""
+    conversion_plan = build_conversion_plan(source_schema, table_columns)
+    compact_plan = None
+    if compact_chunks:
+        compact_plan = build_compact_plan(source_schema, table_columns, conversion_plan)
+    return iter_converted_chunks(batches, conversion_plan, skip_chunks, compact_plan, memory_report)
+
+
+def iter_converted_chunks(batches, conversion_plan, skip_chunks=(), compact_plan=None, memory_report=None):
+    """
+    Convierte cada RecordBatch según el plan del mes; entrega (número de chunk, DataFrame).
+    Los chunks en skip_chunks (ya confirmados) se saltan sin convertirlos.
+    Con `compact_plan` el DataFrame es compacto (utils/compact_chunk.py) y el primer chunk
+    se mide contra la conversión directa en `memory_report`.
+    """
+    batches = iter(batches)
+    chunk_num = 0
+    while True:
+        # parse: leer y decodificar el siguiente row group del Parquet
+        start = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            return
+        chunk_num += 1
+        INGEST_METRICS.get().record('parse', time.perf_counter() - start, rows=batch.num_rows,
+                              nbytes=batch.nbytes, op='read_batch')
+        if chunk_num in skip_chunks:
+            continue
+        
+        with INGEST_METRICS.get().stage('convert') as span:
+            converted = apply_conversion_plan(batch, conversion_plan)
+            if compact_plan is None:
+                chunk_df = converted.to_pandas()
+            else:
+                chunk_df = compact_to_pandas(converted, compact_plan)
+            span['rows'] = len(chunk_df)
+        if memory_report is not None and compact_plan is not None and not memory_report:
+            memory_report.update(chunk_memory_report(converted, chunk_df, METADATA_COLUMNS))
+        del batch, converted
+        yield chunk_num, chunk_df
+
+
+def build_conversion_plan(arrow_schema, table_columns=None):
+    """
+    Retorna {columna: formato} para las columnas temporales del schema Parquet que
+    deben viajar como texto. Si la columna destino ya es TIMESTAMP/DATE se envía nativa.
+    """
+    table_columns = table_columns or {}
+    plan = {}
+    for field in arrow_schema:
+        target_type = table_columns.get(field.name.upper(), '')
+        if pa.types.is_timestamp(field.type) and not target_type.startswith('TIMESTAMP'):
+            plan[field.name] = TIMESTAMP_FORMAT
+        elif pa.types.is_date(field.type) and target_type != 'DATE':
+            plan[field.name] = DATE_FORMAT
+    return plan
+
+
+def apply_conversion_plan(batch, conversion_plan):
+    """Aplica el plan sobre un RecordBatch (o pa.Table) con kernels vectorizados de Arrow"""
+    if not conversion_plan:
+        return batch
+    
+    arrays = []
+    for name, column in zip(batch.schema.names, batch.columns):
+        fmt = conversion_plan.get(name)
+        if fmt is None:
+            arrays.append(column)
+            continue
+        if pa.types.is_timestamp(column.type):
+            # Truncar a segundos: strftime de Arrow imprime fracciones con %S en us/ns
+            column = column.cast(pa.timestamp('s', tz=column.type.tz), safe=False)
+        arrays.append(pc.strftime(column, format=fmt))
+    # Los chunks adaptativos llegan como pa.Table (lotes re-agrupados sin copiar)
+    if isinstance(batch, pa.Table):
+        return pa.Table.from_arrays(arrays, names=batch.schema.names)
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def with_month_metrics(process_month):
+    """Atribuye los eventos del mes a su scope y adjunta el desglose por etapa al resultado"""
+    @functools.wraps(process_month)
+    def _process(*args, **kwargs):
+        month = kwargs['month']
+        start = time.perf_counter()
+        with INGEST_METRICS.get().month_scope(month):
+            result = process_month(*args, **kwargs)
+        
+        stages = INGEST_METRICS.get().month_breakdown(month)
+        if stages:
+            result['timings'] = {
+                'wall_seconds': round(time.perf_counter() - start, 3),
+                # ru_maxrss es el pico del proceso, no del mes (los meses paralelos lo comparten)
+                'process_peak_rss_mb': round(peak_rss_bytes() / 1024 ** 2, 1),
+                'stages': stages
+            }
+            print(json.dumps({
+                'event': 'month_timings',
+                'service': kwargs.get('service'),
+                'year': kwargs.get('year'),
+                'month': month,
+                'wall_seconds': result['timings']['wall_seconds'],
+                'process_peak_rss_mb': result['timings']['process_peak_rss_mb'],
+                'stage_seconds': {name: c['seconds'] for name, c in stages.items()}
+            }))
+        return result
+    return _process
+
+
+@with_month_metrics
 def process_month_streaming(service, year, month, database, schema, chunk_size, 
-                           force_reload, batch_run_id, batch_timestamp, max_retries):
-    """Procesa un mes con streaming y reintentos"""
+                           force_reload, batch_run_id, batch_timestamp, max_retries,
+                           download_cache=None, admission=None, load_mode=LOAD_MODE_INSERT,
+                           stage_backend=None, copy_files_per_batch=0, typed_bronze=True,
+                           coverage=None, checkpoints=None, prefetched=None, adaptive=None,
+                           merge_delete_missing=False, ingest_profile=PROFILE_FULL, silver=None,
+                           compact_chunks=True, query_cache_dir=None):
+    """
+    Procesa un mes con streaming y reintentos.
+    `prefetched` es el item de MonthPrefetcher ({'source': ...} o {'error': ...}) si el
+    archivo ya se descargó en background.
+    `adaptive` son los parámetros de AdaptiveChunkSizer; en ese modo `chunk_size` es solo
+    la granularidad de lectura.
+    `silver` ({'schema', 'zones'}) activa la emisión de Silver: cada lote se transforma
+    a medida que pasa hacia el loader y el mes se publica después de cargar Bronze.
+    `compact_chunks` usa chunks compactos (utils/compact_chunk.py) y mide sus bytes/fila.
+    `query_cache_dir` es el cache de consultas de análisis a invalidar al cerrar el mes.
+    """
     run_id = str(uuid.uuid4())
     
     try:
+        # Filas ya cargadas según el ledger (None = ledger no disponible, consultar)
+        existing_count = coverage.get((year, month), 0) if coverage is not None else None
+        # Run interrumpido del mes: sus filas parciales no cuentan como "ya existe"
+        checkpoint_state = checkpoints.get((year, month)) if checkpoints else None
+        
         # Verificar datos existentes
-        if not force_reload and service != 'taxi_zones':
-            existing_data = check_existing_data(database, schema, service, year, month)
+        if not force_reload and service != 'taxi_zones' and checkpoint_state is None:
+            if existing_count is None:
+                existing_data = check_existing_data(database, schema, service, year, month)
+            else:
+                existing_data = {'count': existing_count} if existing_count > 0 else None
             if existing_data:
                 print(f"    Saltando: {existing_data['count']:,} registros ya existen")
+                if prefetched and prefetched.get('source'):
+                    shutil.rmtree(prefetched['source']['work_dir'], ignore_errors=True)
                 return {
                     'success': False,
                     'skipped': True,
@@ -181,119 +883,144 @@ def process_month_streaming(service, year, month, database, schema, chunk_size,
                     'existing_count': existing_data['count']
                 }
         
-        # Descargar archivo con reintentos
-        if service == 'taxi_zones':
-            url = "https://d37ci6vzurychx.cloudfront.net/misc/taxi_zone_lookup.csv"
-            filename = "taxi_zone_lookup.csv"
-        else:
-            base_url = "https://d37ci6vzurychx.cloudfront.net/trip-data"
-            filename = f"{service}_tripdata_{year:04d}-{month:02d}.parquet"
-            url = f"{base_url}/{filename}"
-        
+        # Descargar archivo con reintentos (o tomar el del prefetch)
         try:
-            df = download_file_with_retry(url, service, max_retries=max_retries)
-            print(f"    Descargado: {len(df):,} filas, {len(df.columns)} columnas")
+            if prefetched is not None:
+                if prefetched.get('error') is not None:
+                    raise prefetched['error']
+                source = prefetched['source']
+            else:
+                source = fetch_month_source(service, year, month, chunk_size, max_retries, download_cache,
+                                            ingest_profile)
         except Exception as e:
             print(f"    Brecha: archivo no existe después de {max_retries} intentos")
             register_gap(database, schema, service, year, month)
             return {'success': False, 'gap': True, 'year': year, 'month': month}
         
-        total_rows = len(df)
-        total_chunks = (total_rows + chunk_size - 1) // chunk_size
-        
-        # Preparar conexión y tabla con reintentos
-        conn = retry_with_backoff(
-            get_snowflake_connection, 
-            database.upper(), 
-            schema.upper(),
-            max_retries=max_retries
-        )
-        
-        table_name = get_table_name(service)
-        
-        # Crear tabla con columnas dinámicas
-        if service in ['yellow', 'green']:
-            ensure_table_exists_dynamic(conn, table_name, database, schema, df.columns, service)
-        elif service == 'taxi_zones':
-            ensure_table_exists_static(conn, table_name, database, schema, 'taxi_zones')
-        
-        # DELETE datos existentes del período
-        if service != 'taxi_zones':
-            cursor = conn.cursor()
-            try:
-                existing = check_existing_data(database, schema, service, year, month)
-                if existing and existing['count'] > 0:
-                    print(f"    Eliminando {existing['count']:,} registros existentes...")
-                    retry_with_backoff(
-                        cursor.execute,
-                        f"""DELETE FROM {database.upper()}.{schema.upper()}.{table_name.upper()}
-                            WHERE _data_year = {year} AND _data_month = {month}""",
-                        max_retries=max_retries
-                    )
-            finally:
-                cursor.close()
-        else:
-            cursor = conn.cursor()
-            try:
-                retry_with_backoff(
-                    cursor.execute,
-                    f"TRUNCATE TABLE {database.upper()}.{schema.upper()}.{table_name.upper()}",
-                    max_retries=max_retries
-                )
-            finally:
-                cursor.close()
-        
-        print(f"    Procesando y exportando en {total_chunks} chunks...")
-        total_rows_inserted = 0
+        filename = source['filename']
+        local_path = source['local_path']
+        work_dir = source['work_dir']
+        total_rows = source['total_rows']
+        source_schema = source['source_schema']
+        batches = source['batches']
+        lean_reader = source['lean_reader']
+        del source
+        print(f"    Descargado: {total_rows:,} filas, {len(source_schema.names)} columnas")
+        if lean_reader is not None:
+            print(f"    Perfil lean: {lean_reader.row_groups_read}/{lean_reader.row_groups} row groups a leer, "
+                  f"filtro {' AND '.join(lean_reader.predicates)}")
         
-        # Procesar y exportar cada chunk con reintentos
-        for chunk_num in range(total_chunks):
-            start_idx = chunk_num * chunk_size
-            end_idx = min((chunk_num + 1) * chunk_size, total_rows)
-            
-            chunk_df = df.iloc[start_idx:end_idx].copy()
-            
-            # Agregar metadatos
-            chunk_df['_run_id'] = run_id
-            chunk_df['_batch_run_id'] = batch_run_id
-            chunk_df['_ingest_ts'] = batch_timestamp
-            chunk_df['_source_file'] = filename
-            chunk_df['_service_type'] = service
+        try:
+            chunk_sizer = None
+            if adaptive and service in ['yellow', 'green']:
+                chunk_sizer = build_chunk_sizer(local_path, source_schema, adaptive, compact_chunks)
+                print(f"    Chunks adaptativos: ~{chunk_sizer.bytes_per_row:,.0f} bytes/fila, "
+                      f"inicio {chunk_sizer.current:,} filas, techo {chunk_sizer.max_rows:,}")
+                batches = adaptive_batches(batches, chunk_sizer)
             
-            if service != 'taxi_zones':
-                chunk_df['_data_year'] = year
-                chunk_df['_data_month'] = month
+            initial_chunk_rows = chunk_sizer.current if chunk_sizer else chunk_size
+            total_chunks = max((total_rows + initial_chunk_rows - 1) // initial_chunk_rows, 1)
             
-            # EXPORTAR con reintentos
-            success = retry_with_backoff(
-                export_chunk_streaming,
-                chunk_df, service, database, schema, table_name, conn,
-                max_retries=max_retries
-            )
+            checkpoint = None
+            resume_state = None
+            # Los límites de chunk adaptativos no se repiten entre runs: sin reanudación
+            if checkpoints is not None and chunk_sizer is None and load_mode == LOAD_MODE_INSERT and service in ['yellow', 'green']:
+                checkpoint = {
+                    # El perfil cambia los límites de chunk: forma parte de la huella
+                    'fingerprint': source_fingerprint(local_path, download_cache)
+                                   + (f":{PROFILE_LEAN}" if lean_reader is not None else ''),
+                    'chunk_size': chunk_size
+                }
+                # Solo se reanuda si el archivo y los límites de chunk son idénticos
+                if (checkpoint_state
+                        and checkpoint_state['fingerprint'] == checkpoint['fingerprint']
+                        and checkpoint_state['chunk_size'] == chunk_size):
+                    resume_state = checkpoint_state
+                    run_id = resume_state['run_id']
+                    print(f"    Reanudando run {run_id[:8]}: {len(resume_state['chunks'])} chunks "
+                          f"({resume_state['rows']:,} filas) ya confirmados")
             
-            if not success:
-                conn.close()
-                del df
-                gc.collect()
-                raise Exception(f"Error exportando chunk {chunk_num + 1}")
+            if admission is not None and chunk_sizer is None:
+                batches = admitted_chunks(batches, admission, chunk_size)
             
-            total_rows_inserted += len(chunk_df)
-            del chunk_df
+            # Preparar conexión (del pool) y tabla con reintentos
+            pool = get_connection_pool(database, schema)
+            silver_staging = None
+            conn = retry_with_backoff(pool.acquire, max_retries=max_retries)
+            conn_failed = True
+            merge_stats = None
+            memory_report = {} if compact_chunks else None
+            try:
+                if silver is not None:
+                    silver_staging = open_silver_staging(pool, database, schema, silver['schema'], max_retries)
+                    # Valor propio del Silver: stg_enriched lo reemplaza por el watermark del run dbt
+                    batches = tap_silver(batches, silver_staging, service, year, month, database, schema,
+                                         batch_run_id, silver['zones'], datetime.now())
+                if load_mode == LOAD_MODE_MERGE and service in ['yellow', 'green']:
+                    total_rows_inserted, merge_stats = load_chunks_via_merge(
+                        conn, batches, service, year, month, database, schema, source_schema,
+                        filename, run_id, batch_run_id, batch_timestamp, max_retries,
+                        typed_bronze, merge_delete_missing, chunk_sizer, compact_chunks, memory_report
+                    )
+                elif load_mode == LOAD_MODE_STAGE_COPY:
+                    total_rows_inserted = load_chunks_via_stage(
+                        conn, batches, service, year, month, database, schema, source_schema,
+                        filename, run_id, batch_run_id, batch_timestamp, max_retries,
+                        stage_backend, work_dir, copy_files_per_batch, typed_bronze, chunk_sizer,
+                        compact_chunks, memory_report
+                    )
+                else:
+                    total_rows_inserted = load_chunks_into_table(
+                        conn, batches, service, year, month, database, schema, source_schema,
+                        filename, run_id, batch_run_id, batch_timestamp, total_chunks, max_retries,
+                        typed_bronze, existing_count, checkpoint, resume_state, chunk_sizer,
+                        compact_chunks, memory_report
+                    )
+                conn_failed = False
+            finally:
+                # Una conexión que falló a mitad de carga no vuelve al pool
+                pool.release(conn, discard=conn_failed)
+                if silver_staging is not None and conn_failed:
+                    close_silver_staging(pool, silver_staging, failed=True)
             
-            if (chunk_num + 1) % 5 == 0:
-                gc.collect()
+            if silver_staging is not None:
+                # Bronze ya quedó confirmado: Silver del mes se reemplaza en una transacción
+                silver_failed = True
+                try:
+                    publish_silver_month(silver_staging, database, silver['schema'], service, year, month)
+                    silver_failed = False
+                finally:
+                    close_silver_staging(pool, silver_staging, failed=silver_failed)
+                print(f"    Silver: {silver_staging['rows']:,} filas en {silver['schema'].upper()}.{SILVER_TABLE}")
             
-            if (chunk_num + 1) % 10 == 0 or (chunk_num + 1) == total_chunks:
-                print(f"      Chunk {chunk_num + 1}/{total_chunks}: {total_rows_inserted:,} filas exportadas")
-        
-        del df
-        gc.collect()
-        conn.close()
+            del batches
+            gc.collect()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
         
         print(f"    OK: {total_rows_inserted:,} filas")
+        if memory_report:
+            print(f"    Memoria por fila: {memory_report['wide_bytes_per_row']:,} -> "
+                  f"{memory_report['compact_bytes_per_row']:,} bytes ({memory_report['reduction']}x)")
+        read_profile = lean_reader.stats() if lean_reader is not None else None
+        if read_profile is not None:
+            print(f"    Rechazadas en lectura: {read_profile['rows_rejected']:,} filas")
         
+        # Siempre, también con checkpoints=False: checkpoints viejos de un run interrumpido
+        # harían que el próximo run con checkpoints "reanude" sobre un mes ya recargado
         if service in ['yellow', 'green']:
-            save_audit_coverage(database, schema, service, year, month)
+            clear_checkpoints(database, schema, service, year, month)
+        
+        if service in ['yellow', 'green']:
+            # Conteo desde los contadores del exportador: sin re-escanear la tabla
+            save_audit_coverage(
+                database, schema, service, year, month, total_rows_inserted, batch_run_id,
+                rows_rejected=read_profile['rows_rejected'] if read_profile else None,
+                ingest_profile=ingest_profile
+            )
+            invalidated = invalidate_query_cache(query_cache_dir)
+            if invalidated:
+                print(f"    Cache de consultas: {invalidated} resultados invalidados")
         
         return {
             'success': True,
@@ -301,7 +1028,13 @@ def process_month_streaming(service, year, month, database, schema, chunk_size,
             'month': month,
             'run_id': run_id,
             'batch_run_id': batch_run_id,
-            'rows_loaded': total_rows_inserted
+            'rows_loaded': total_rows_inserted,
+            'resumed': resume_state is not None,
+            'adaptive_chunks': chunk_sizer.snapshot() if chunk_sizer else None,
+            'merge': merge_stats,
+            'read_profile': read_profile,
+            'chunk_memory': memory_report or None,
+            'silver_rows': silver_staging['rows'] if silver_staging is not None else None
         }
             
     except Exception as e:
@@ -309,48 +1042,599 @@ def process_month_streaming(service, year, month, database, schema, chunk_size,
         return {'success': False, 'year': year, 'month': month, 'error': str(e)}
 
 
-def export_chunk_streaming(chunk_df, service, database, schema, table_name, conn):
-    """Exporta un chunk individual - lanza excepción para reintentos"""
-    cursor = None
+def load_chunks_into_table(conn, batches, service, year, month, database, schema, source_schema,
+                           filename, run_id, batch_run_id, batch_timestamp, total_chunks, max_retries,
+                           typed_bronze=True, existing_count=None, checkpoint=None, resume_state=None,
+                           chunk_sizer=None, compact_chunks=True, memory_report=None):
+    """
+    Prepara la tabla destino del mes y exporta los chunks; retorna filas insertadas.
+    Con `checkpoint` cada chunk se confirma junto con su fila en INGEST_CHECKPOINTS;
+    con `resume_state` se omiten el DELETE y los chunks ya confirmados.
+    Con `chunk_sizer` cada subida medida ajusta el tamaño del chunk siguiente.
+    """
+    table_name, table_columns = ensure_target_table(conn, service, database, schema, source_schema, typed_bronze)
+    committed_chunks = resume_state['chunks'] if resume_state else set()
+    chunks = convert_chunks(batches, source_schema, table_columns, committed_chunks, compact_chunks, memory_report)
+    
+    if checkpoint is not None:
+        ensure_checkpoint_table_exists(conn, database, schema)
+    
+    # DELETE datos existentes del período (no al reanudar: las filas confirmadas se conservan)
+    if resume_state is not None:
+        print(f"    Sin DELETE: se conservan las {resume_state['rows']:,} filas ya confirmadas")
+    elif service != 'taxi_zones':
+        # El mes se recarga desde cero: ningún checkpoint previo (de otro archivo/chunk_size o
+        # de un run interrumpido) sigue siendo válido, use este run checkpoints o no
+        clear_checkpoints(database, schema, service, year, month, conn=conn)
+        cursor = conn.cursor()
+        try:
+            if existing_count is None:
+                existing = check_existing_data(database, schema, service, year, month, conn=conn)
+            else:
+                existing = {'count': existing_count}
+            if existing and existing['count'] > 0:
+                print(f"    Eliminando {existing['count']:,} registros existentes...")
+                retry_with_backoff(
+                    warehouse_execute,
+                    cursor,
+                    f"""DELETE FROM {database.upper()}.{schema.upper()}.{table_name.upper()}
+                        WHERE _data_year = {year} AND _data_month = {month}""",
+                    'delete_period',
+                    max_retries=max_retries
+                )
+        finally:
+            cursor.close()
+    else:
+        cursor = conn.cursor()
+        try:
+            retry_with_backoff(
+                warehouse_execute,
+                cursor,
+                f"TRUNCATE TABLE {database.upper()}.{schema.upper()}.{table_name.upper()}",
+                'truncate',
+                max_retries=max_retries
+            )
+        finally:
+            cursor.close()
+    
+    print(f"    Procesando y exportando en ~{total_chunks} chunks (row groups en streaming)...")
+    total_rows_inserted = resume_state['rows'] if resume_state else 0
+    chunk_num = 0
+    
+    # Leer y exportar cada chunk con reintentos; solo un chunk vive en memoria
+    for chunk_num, chunk_df in chunks:
+        add_ingest_metadata(chunk_df, service, year, month, filename, run_id, batch_run_id, batch_timestamp,
+                            compact_chunks)
+        
+        checkpoint_row = None
+        if checkpoint is not None:
+            checkpoint_row = dict(
+                checkpoint, service_type=service, year=year, month=month,
+                run_id=run_id, chunk_index=chunk_num, rows=len(chunk_df)
+            )
+        
+        # EXPORTAR con reintentos
+        upload_start = time.perf_counter()
+        success = retry_with_backoff(
+            export_chunk_streaming,
+            chunk_df, service, database, schema, table_name, conn,
+            checkpoint_row=checkpoint_row,
+            max_retries=max_retries
+        )
+        
+        if not success:
+            raise Exception(f"Error exportando chunk {chunk_num}")
+        
+        if chunk_sizer is not None:
+            resize_after_upload(chunk_sizer, len(chunk_df), time.perf_counter() - upload_start)
+        
+        total_rows_inserted += len(chunk_df)
+        del chunk_df
+        
+        if chunk_num % 5 == 0:
+            gc.collect()
+        
+        if chunk_num % 10 == 0:
+            print(f"      Chunk {chunk_num}/~{total_chunks}: {total_rows_inserted:,} filas exportadas")
+    
+    print(f"      Chunk {chunk_num}/{chunk_num}: {total_rows_inserted:,} filas exportadas")
+    
+    return total_rows_inserted
+
+
+def load_chunks_via_stage(conn, batches, service, year, month, database, schema, source_schema,
+                          filename, run_id, batch_run_id, batch_timestamp, max_retries,
+                          stage_backend, work_dir, copy_files_per_batch=0, typed_bronze=True,
+                          chunk_sizer=None, compact_chunks=True, memory_report=None):
+    """
+    Escribe cada chunk como Parquet comprimido en un stage del mes y lo carga con
+    COPY INTO dentro de una sola transacción (DELETE del período + COPY + COMMIT).
+    """
+    table_name, table_columns = ensure_target_table(conn, service, database, schema, source_schema, typed_bronze)
+    chunks = convert_chunks(batches, source_schema, table_columns, (), compact_chunks, memory_report)
+    table_fqn = f"{database.upper()}.{schema.upper()}.{table_name.upper()}"
+    if service == 'taxi_zones':
+        prefix = f"{table_name.lower()}/{run_id}"
+    else:
+        prefix = f"{table_name.lower()}/{year:04d}_{month:02d}/{run_id}"
+    
+    retry_with_backoff(stage_backend.prepare, conn, max_retries=max_retries)
+    
+    staged_files = []
+    total_rows_staged = 0
     try:
-        # Convertir timestamps
-        for col in chunk_df.columns:
-            if pd.api.types.is_datetime64_any_dtype(chunk_df[col]):
-                chunk_df[col] = chunk_df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
-            elif chunk_df[col].dtype == 'object' and len(chunk_df) > 0:
-                first_val = chunk_df[col].iloc[0]
-                if isinstance(first_val, datetime):
-                    chunk_df[col] = chunk_df[col].apply(
-                        lambda x: x.strftime('%Y-%m-%d %H:%M:%S') if isinstance(x, datetime) else str(x)
-                    )
+        for chunk_num, chunk_df in chunks:
+            add_ingest_metadata(chunk_df, service, year, month, filename, run_id, batch_run_id, batch_timestamp,
+                                compact_chunks)
+            prepare_chunk_for_upload(chunk_df)
+            
+            local_file = path.join(work_dir, f"chunk_{chunk_num:05d}.parquet")
+            chunk_rows = len(chunk_df)
+            upload_start = time.perf_counter()
+            with INGEST_METRICS.get().stage('stage_write') as span:
+                chunk_df.to_parquet(local_file, compression='snappy', index=False,
+                                    coerce_timestamps='us', allow_truncated_timestamps=True)
+                span['rows'] = len(chunk_df)
+                span['bytes'] = path.getsize(local_file)
+            total_rows_staged += len(chunk_df)
+            del chunk_df
+            
+            with INGEST_METRICS.get().stage('warehouse', op='put') as span:
+                span['bytes'] = path.getsize(local_file)
+                retry_with_backoff(stage_backend.put, conn, local_file, prefix, max_retries=max_retries)
+            os.remove(local_file)
+            if chunk_sizer is not None:
+                resize_after_upload(chunk_sizer, chunk_rows, time.perf_counter() - upload_start)
+            staged_files.append(path.basename(local_file))
+            
+            if chunk_num % 10 == 0:
+                print(f"      Chunk {chunk_num}: {total_rows_staged:,} filas en stage")
         
-        if '_ingest_ts' in chunk_df.columns:
-            chunk_df['_ingest_ts'] = chunk_df['_ingest_ts'].astype(str)
+        print(f"    {len(staged_files)} archivos en stage ({total_rows_staged:,} filas), ejecutando COPY INTO...")
         
+        # Commit atómico del mes: nunca queda un mes a medio cargar
         cursor = conn.cursor()
-        temp_table = f"TMP_{uuid.uuid4().hex[:8]}".upper()
+        try:
+            warehouse_execute(cursor, "BEGIN", 'begin')
+            if service == 'taxi_zones':
+                warehouse_execute(cursor, f"DELETE FROM {table_fqn}", 'delete_period')
+            else:
+                warehouse_execute(
+                    cursor, f"DELETE FROM {table_fqn} WHERE _data_year = {year} AND _data_month = {month}",
+                    'delete_period'
+                )
+            
+            rows_loaded = 0
+            batch_size = copy_files_per_batch or len(staged_files) or 1
+            for i in range(0, len(staged_files), batch_size):
+                with INGEST_METRICS.get().stage('warehouse', op='copy_into') as span:
+                    span['rows'] = stage_backend.copy_into(conn, table_fqn, prefix, staged_files[i:i + batch_size])
+                rows_loaded += span['rows']
+            
+            if rows_loaded != total_rows_staged:
+                raise Exception(f"COPY cargó {rows_loaded:,} filas, se esperaban {total_rows_staged:,}")
+            
+            warehouse_execute(cursor, "COMMIT", 'commit')
+        except Exception:
+            warehouse_execute(cursor, "ROLLBACK", 'rollback')
+            raise
+        finally:
+            cursor.close()
+    finally:
+        try:
+            stage_backend.cleanup(conn, prefix)
+        except Exception as e:
+            print(f"    Aviso: no se pudo limpiar el stage {prefix}: {e}")
+    
+    return rows_loaded
+
+
+def load_chunks_via_merge(conn, batches, service, year, month, database, schema, source_schema,
+                          filename, run_id, batch_run_id, batch_timestamp, max_retries,
+                          typed_bronze=True, delete_missing=False, chunk_sizer=None, compact_chunks=True,
+                          memory_report=None):
+    """
+    Carga el mes completo a una tabla staging y lo aplica con un MERGE por hash:
+    inserta filas nuevas, actualiza las que cambiaron de contenido y deja intactas las
+    idénticas (conservan su _run_id). Con delete_missing borra las que ya no vienen.
+    Retorna (filas del mes, {inserted, updated, deleted, legacy_replaced}).
+    """
+    table_name, table_columns = ensure_target_table(conn, service, database, schema, source_schema, typed_bronze)
+    table_columns = ensure_merge_columns(conn, database, schema, table_name, table_columns)
+    chunks = convert_chunks(batches, source_schema, table_columns, (), compact_chunks, memory_report)
+    schema_fqn = f"{database.upper()}.{schema.upper()}"
+    table_fqn = f"{schema_fqn}.{table_name.upper()}"
+    staging_table = f"MRG_{uuid.uuid4().hex[:8]}".upper()
+    source_table = f"{staging_table}_SRC"
+    period = f"_data_year = {year} AND _data_month = {month}"
+    
+    cursor = conn.cursor()
+    try:
+        warehouse_execute(cursor, f"CREATE TEMPORARY TABLE {staging_table} LIKE {table_fqn}", 'create_temp')
+        
+        total_rows_staged = 0
+        for chunk_num, chunk_df in chunks:
+            add_ingest_metadata(chunk_df, service, year, month, filename, run_id, batch_run_id, batch_timestamp,
+                                compact_chunks)
+            with INGEST_METRICS.get().stage('hash') as span:
+                add_row_hashes(chunk_df, service)
+                span['rows'] = len(chunk_df)
+            prepare_chunk_for_upload(chunk_df)
+            
+            chunk_rows = len(chunk_df)
+            upload_start = time.perf_counter()
+            with INGEST_METRICS.get().stage('warehouse', op='write_pandas') as span:
+                success, _, nrows, _ = retry_with_backoff(
+                    write_pandas, conn=conn, df=chunk_df, table_name=staging_table,
+                    database=database.upper(), schema=schema.upper(),
+                    quote_identifiers=False, use_logical_type=True,
+                    max_retries=max_retries
+                )
+                span['rows'] = nrows
+            if not success:
+                raise Exception(f"write_pandas falló en el chunk {chunk_num}")
+            del chunk_df
+            if chunk_sizer is not None:
+                resize_after_upload(chunk_sizer, chunk_rows, time.perf_counter() - upload_start)
+            total_rows_staged += chunk_rows
+            
+            if chunk_num % 10 == 0:
+                print(f"      Chunk {chunk_num}: {total_rows_staged:,} filas en staging")
+        
+        # _row_key = hash(clave natural, ordinal entre filas con la misma clave). El ordinal se
+        # ordena por contenido, así no depende del orden de las filas en el archivo.
+        # (DDL fuera de la transacción: en Snowflake un CREATE hace commit implícito)
+        warehouse_execute(cursor, f"""
+            CREATE TEMPORARY TABLE {source_table} AS
+            SELECT * REPLACE (
+                HASH(_key_hash, ROW_NUMBER() OVER (PARTITION BY _key_hash ORDER BY _row_hash)) AS _row_key
+            )
+            FROM {staging_table}
+        """, 'merge_source', rows=total_rows_staged)
+        
+        columns = list(table_columns)
+        update_set = ",\n                    ".join(
+            f"{c} = src.{c}" for c in columns if c not in ('_ROW_KEY', '_DATA_YEAR', '_DATA_MONTH')
+        )
+        column_list = ", ".join(columns)
+        values_list = ", ".join(f"src.{c}" for c in columns)
+        
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'legacy_replaced': 0}
+        warehouse_execute(cursor, "BEGIN", 'begin')
+        try:
+            # Filas cargadas sin hash (modo insert): el primer MERGE del mes las reemplaza
+            warehouse_execute(cursor, f"DELETE FROM {table_fqn} WHERE {period} AND _row_key IS NULL",
+                              'delete_legacy')
+            stats['legacy_replaced'] = int(cursor.fetchone()[0] or 0)
+            
+            warehouse_execute(cursor, f"""
+                MERGE INTO {table_fqn} t
+                USING {source_table} src
+                ON t._data_year = {year} AND t._data_month = {month} AND t._row_key = src._row_key
+                WHEN MATCHED AND t._row_hash <> src._row_hash THEN UPDATE SET
+                    {update_set}
+                WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({values_list})
+            """, 'merge', rows=total_rows_staged)
+            inserted, updated = cursor.fetchone()[:2]
+            stats['inserted'], stats['updated'] = int(inserted or 0), int(updated or 0)
+            
+            if delete_missing:
+                warehouse_execute(cursor, f"""
+                    DELETE FROM {table_fqn}
+                    WHERE {period} AND _row_key NOT IN (SELECT _row_key FROM {source_table})
+                """, 'delete_missing')
+                stats['deleted'] = int(cursor.fetchone()[0] or 0)
+            
+            warehouse_execute(cursor, "COMMIT", 'commit')
+        except Exception:
+            warehouse_execute(cursor, "ROLLBACK", 'rollback')
+            raise
         
-        cursor.execute(f"DROP TABLE IF EXISTS {database.upper()}.{schema.upper()}.{temp_table}")
+        print(f"    MERGE: {stats['inserted']:,} insertadas, {stats['updated']:,} actualizadas, "
+              f"{stats['deleted']:,} eliminadas, {total_rows_staged - stats['inserted'] - stats['updated']:,} sin cambios"
+              + (f" ({stats['legacy_replaced']:,} filas sin hash reemplazadas)" if stats['legacy_replaced'] else ""))
+        return total_rows_staged, stats
+    finally:
+        for temp_table in (source_table, staging_table):
+            try:
+                warehouse_execute(cursor, f"DROP TABLE IF EXISTS {schema_fqn}.{temp_table}", 'drop_temp')
+            except Exception as e:
+                print(f"    Aviso: no se pudo eliminar {temp_table}: {e}")
+        cursor.close()
+
+
+def load_zone_lookup(database, schema):
+    """ZoneLookup de TAXI_ZONES (última carga de cada LocationID); None si la tabla no existe"""
+    with get_connection_pool(database, schema).connection() as conn:
+        if not get_table_columns(conn, database, schema, 'TAXI_ZONES'):
+            print("Aviso: TAXI_ZONES no existe, el Silver emitido no tendrá zonas (cargar taxi_zones primero)")
+            return None
+        cursor = conn.cursor()
+        try:
+            warehouse_execute(cursor, f"""
+                SELECT LocationID, Zone, Borough
+                FROM {database.upper()}.{schema.upper()}.TAXI_ZONES
+                WHERE LocationID IS NOT NULL
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY LocationID ORDER BY _ingest_ts DESC) = 1
+            """, 'zone_lookup')
+            table = cursor_to_arrow(cursor)
+        finally:
+            cursor.close()
+    print(f"Zonas para Silver: {table.num_rows} LocationID")
+    return ZoneLookup.from_arrow(table)
+
+
+def ensure_silver_table_exists(conn, database, silver_schema):
+    cursor = conn.cursor()
+    try:
+        columns = ", ".join(f"{name} {sf_type}" for name, sf_type in SILVER_COLUMNS)
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {database.upper()}.{silver_schema.upper()}")
         cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {database.upper()}.{silver_schema.upper()}.{SILVER_TABLE} ({columns})
+        """)
+    finally:
+        cursor.close()
+
+
+def open_silver_staging(pool, database, schema, silver_schema, max_retries):
+    """
+    Conexión propia del mes + tabla temporal donde se acumulan los chunks Silver.
+    Los TIMESTAMP_TZ se reciben como texto con offset (ver to_upload_frame).
+    """
+    conn = retry_with_backoff(pool.acquire, max_retries=max_retries)
+    try:
+        ensure_silver_table_exists(conn, database, silver_schema)
+        temp_table = f"SLV_{uuid.uuid4().hex[:8]}".upper()
+        columns = ", ".join(
+            f"{name} {'VARCHAR' if sf_type == 'TIMESTAMP_TZ' else sf_type}" for name, sf_type in SILVER_COLUMNS
+        )
+        cursor = conn.cursor()
+        try:
+            warehouse_execute(cursor, f"CREATE TEMPORARY TABLE {temp_table} ({columns})", 'create_temp')
+        finally:
+            cursor.close()
+    except Exception:
+        pool.release(conn, discard=True)
+        raise
+    return {'conn': conn, 'temp_table': temp_table, 'rows': 0, 'max_retries': max_retries}
+
+
+def tap_silver(batches, staging, service, year, month, database, schema, batch_run_id, zones, registered_at):
+    """
+    Deja pasar los lotes Bronze sin tocarlos y, en el camino, sube su versión Silver
+    (to_silver, vectorizado) a la tabla temporal del mes.
+    """
+    for batch in batches:
+        with INGEST_METRICS.get().stage('silver', op='transform') as span:
+            silver_df = to_upload_frame(to_silver(
+                batch, service, year, month, batch_run_id, zones=zones, registered_at=registered_at
+            ))
+            span['rows'] = len(silver_df)
+        if len(silver_df):
+            with INGEST_METRICS.get().stage('warehouse', op='silver_write') as span:
+                success, _, nrows, _ = retry_with_backoff(
+                    write_pandas, conn=staging['conn'], df=silver_df, table_name=staging['temp_table'],
+                    database=database.upper(), schema=schema.upper(),
+                    quote_identifiers=False, use_logical_type=True,
+                    max_retries=staging['max_retries']
+                )
+                span['rows'] = nrows
+            if not success:
+                raise Exception("write_pandas falló en el Silver emitido")
+            staging['rows'] += len(silver_df)
+        del silver_df
+        yield batch
+
+
+def publish_silver_month(staging, database, silver_schema, service, year, month):
+    """Reemplaza la partición (servicio, año, mes) de la tabla Silver con el staging del mes"""
+    target = f"{database.upper()}.{silver_schema.upper()}.{SILVER_TABLE}"
+    names = [name for name, _ in SILVER_COLUMNS]
+    values = ", ".join(
+        f"TO_TIMESTAMP_TZ({name}, 'YYYY-MM-DD HH24:MI:SS TZHTZM')" if sf_type == 'TIMESTAMP_TZ' else name
+        for name, sf_type in SILVER_COLUMNS
+    )
+    cursor = staging['conn'].cursor()
+    try:
+        warehouse_execute(cursor, "BEGIN", 'begin')
+        try:
+            warehouse_execute(cursor, f"""
+                DELETE FROM {target}
+                WHERE service_type = '{service}' AND _data_year = {year} AND _data_month = {month}
+            """, 'silver_delete')
+            warehouse_execute(cursor, f"""
+                INSERT INTO {target} ({", ".join(names)})
+                SELECT {values} FROM {staging['temp_table']}
+            """, 'silver_insert', rows=staging['rows'])
+            warehouse_execute(cursor, "COMMIT", 'commit')
+        except Exception:
+            warehouse_execute(cursor, "ROLLBACK", 'rollback')
+            raise
+    finally:
+        cursor.close()
+
+
+def close_silver_staging(pool, staging, failed=False):
+    """Borra la tabla temporal y devuelve la conexión (descartada si el mes falló)"""
+    if staging.get('conn') is None:
+        return
+    try:
+        cursor = staging['conn'].cursor()
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging['temp_table']}")
+        finally:
+            cursor.close()
+    except Exception:
+        failed = True
+    pool.release(staging['conn'], discard=failed)
+    staging['conn'] = None
+
+
+def ensure_merge_columns(conn, database, schema, table_name, table_columns):
+    """Agrega las columnas de hash del modo merge a la tabla Bronze si faltan"""
+    missing = [c for c in MERGE_HASH_COLUMNS if c.upper() not in table_columns]
+    if not missing:
+        return table_columns
+    
+    cursor = conn.cursor()
+    try:
+        for column in missing:
+            cursor.execute(f"""
+                ALTER TABLE {database.upper()}.{schema.upper()}.{table_name.upper()}
+                ADD COLUMN IF NOT EXISTS {column} NUMBER(38,0)
+            """)
+    finally:
+        cursor.close()
+    return get_table_columns(conn, database, schema, table_name, refresh=True)
+
+
+def add_row_hashes(chunk_df, service):
+    """
+    Hash vectorizado por fila (pd.util.hash_pandas_object, semilla fija: estable entre runs):
+    _key_hash sobre la clave natural de fct_trips y _row_hash sobre todas las columnas
+    del archivo (ordenadas por nombre, así el orden de columnas no cambia el hash).
+    Se calcula sobre los dtypes originales: un chunk compacto hashea igual que uno sin compactar.
+    """
+    source_columns = sorted((c for c in chunk_df.columns if not c.startswith('_')), key=str.lower)
+    by_name = {c.lower(): c for c in source_columns}
+    key_columns = [by_name[c.lower()] for c in NATURAL_KEY_COLUMNS[service] if c.lower() in by_name]
+    if not key_columns:
+        raise Exception(f"El archivo no tiene columnas de la clave natural de {service}")
+    
+    chunk_df['_key_hash'] = pd.util.hash_pandas_object(
+        wide_columns(chunk_df, key_columns), index=False
+    ).values.view('int64')
+    chunk_df['_row_hash'] = pd.util.hash_pandas_object(
+        wide_columns(chunk_df, source_columns), index=False
+    ).values.view('int64')
+
+
+def build_chunk_sizer(local_path, source_schema, adaptive, compact=False):
+    """AdaptiveChunkSizer del mes con bytes/fila estimados de la metadata del Parquet"""
+    metadata = pq.ParquetFile(local_path).metadata
+    # Plan sin tabla destino = todas las temporales como texto: estimación conservadora
+    text_columns = set(build_conversion_plan(source_schema))
+    return AdaptiveChunkSizer(
+        estimate_bytes_per_row(metadata, source_schema, text_columns, compact=compact),
+        adaptive['memory_budget_bytes'],
+        target_seconds=adaptive.get('target_seconds'),
+        min_rows=adaptive.get('min_rows', MIN_CHUNK_ROWS),
+        max_rows=adaptive.get('max_rows')
+    )
+
+
+def resize_after_upload(chunk_sizer, rows, seconds):
+    """Alimenta al sizer con la subida medida e informa cambios de tamaño"""
+    previous = chunk_sizer.current
+    current = chunk_sizer.observe(rows, seconds)
+    if current != previous:
+        INGEST_METRICS.get().record('chunk_resize', 0.0, rows=current, op='grow' if current > previous else 'shrink')
+        print(f"      Chunk adaptativo: {previous:,} -> {current:,} filas "
+              f"({rows / seconds:,.0f} filas/s medidas)")
+
+
+def ensure_target_table(conn, service, database, schema, source_schema, typed_bronze=True):
+    """Crea/evoluciona la tabla Bronze del servicio; retorna (nombre, {COLUMNA: TIPO})"""
+    table_name = get_table_name(service)
+    
+    # Crear tabla con columnas dinámicas
+    if service in ['yellow', 'green']:
+        table_columns = ensure_table_exists_dynamic(
+            conn, table_name, database, schema, source_schema, service, typed=typed_bronze
+        )
+    else:
+        ensure_table_exists_static(conn, table_name, database, schema, 'taxi_zones')
+        table_columns = get_table_columns(conn, database, schema, table_name)
+    
+    return table_name, table_columns
+
+
+def add_ingest_metadata(chunk_df, service, year, month, filename, run_id, batch_run_id, batch_timestamp,
+                        compact=False):
+    """
+    Agrega las columnas de metadatos de ingesta al chunk. Con `compact` los valores (iguales
+    en todo el chunk) se guardan una vez y prepare_chunk_for_upload los expande al serializar.
+    """
+    metadata = {
+        '_run_id': run_id,
+        '_batch_run_id': batch_run_id,
+        '_ingest_ts': batch_timestamp,
+        '_source_file': filename,
+        '_service_type': service,
+    }
+    if service != 'taxi_zones':
+        metadata['_data_year'] = year
+        metadata['_data_month'] = month
+    
+    if compact:
+        set_constant_columns(chunk_df, metadata)
+        return
+    for name, value in metadata.items():
+        chunk_df[name] = value
+
+
+def prepare_chunk_for_upload(chunk_df):
+    """
+    Respaldo para fuentes sin plan de conversión (CSV): las columnas Parquet ya
+    llegan convertidas por apply_conversion_plan, aquí solo se revisa el dtype.
+    También expande los metadatos constantes de un chunk compacto (idempotente: se
+    llama de nuevo en cada reintento).
+    """
+    expand_constant_columns(chunk_df)
+    for col in chunk_df.columns:
+        if pd.api.types.is_datetime64_any_dtype(chunk_df[col]):
+            chunk_df[col] = chunk_df[col].dt.strftime(TIMESTAMP_FORMAT)
+
+
+def export_chunk_streaming(chunk_df, service, database, schema, table_name, conn, checkpoint_row=None):
+    """
+    Exporta un chunk individual - lanza excepción para reintentos.
+    El INSERT y la fila de checkpoint se confirman en la misma transacción.
+    """
+    cursor = None
+    try:
+        prepare_chunk_for_upload(chunk_df)
+        
+        cursor = conn.cursor()
+        temp_table = f"TMP_{uuid.uuid4().hex[:8]}".upper()
+        
+        warehouse_execute(cursor, f"DROP TABLE IF EXISTS {database.upper()}.{schema.upper()}.{temp_table}", 'drop_temp')
+        warehouse_execute(cursor, f"""
             CREATE TEMPORARY TABLE {temp_table} 
             LIKE {database.upper()}.{schema.upper()}.{table_name.upper()}
-        """)
+        """, 'create_temp')
         
-        success, nchunks, nrows, _ = write_pandas(
-            conn=conn, df=chunk_df, table_name=temp_table,
-            database=database.upper(), schema=schema.upper(),
-            quote_identifiers=False
-        )
+        with INGEST_METRICS.get().stage('warehouse', op='write_pandas') as span:
+            success, nchunks, nrows, _ = write_pandas(
+                conn=conn, df=chunk_df, table_name=temp_table,
+                database=database.upper(), schema=schema.upper(),
+                quote_identifiers=False, use_logical_type=True
+            )
+            span['rows'] = nrows
+            span['bytes'] = int(chunk_df.memory_usage(index=False).sum())
         
         if not success:
             raise Exception("write_pandas falló")
         
-        cursor.execute(f"""
-            INSERT INTO {database.upper()}.{schema.upper()}.{table_name.upper()}
-            SELECT * FROM {database.upper()}.{schema.upper()}.{temp_table}
-        """)
+        warehouse_execute(cursor, "BEGIN", 'begin')
+        try:
+            warehouse_execute(cursor, f"""
+                INSERT INTO {database.upper()}.{schema.upper()}.{table_name.upper()}
+                SELECT * FROM {database.upper()}.{schema.upper()}.{temp_table}
+            """, 'insert_select', rows=len(chunk_df))
+            if checkpoint_row is not None:
+                with INGEST_METRICS.get().stage('warehouse', op='checkpoint'):
+                    record_checkpoint(cursor, database, schema, checkpoint_row)
+            warehouse_execute(cursor, "COMMIT", 'commit')
+        except Exception:
+            warehouse_execute(cursor, "ROLLBACK", 'rollback')
+            raise
         
-        cursor.execute(f"DROP TABLE IF EXISTS {database.upper()}.{schema.upper()}.{temp_table}")
+        # Tras el COMMIT el chunk ya está cargado: un fallo aquí no debe reintentar el INSERT
+        try:
+            warehouse_execute(cursor, f"DROP TABLE IF EXISTS {database.upper()}.{schema.upper()}.{temp_table}", 'drop_temp')
+        except Exception as e:
+            print(f"      Aviso: no se pudo eliminar {temp_table}: {e}")
         cursor.close()
         
         return True
@@ -361,19 +1645,31 @@ def export_chunk_streaming(chunk_df, service, database, schema, table_name, conn
         raise Exception(f"Error en chunk export: {e}")
 
 
-def ensure_table_exists_dynamic(conn, table_name, database, schema, original_columns, service):
-    """Crea tabla con todas las columnas originales del Parquet + metadatos"""
+def warehouse_execute(cursor, sql, op, rows=0):
+    """cursor.execute cronometrado como un round trip al warehouse"""
+    with INGEST_METRICS.get().stage('warehouse', op=op) as span:
+        span['rows'] = rows
+        return cursor.execute(sql)
+
+
+def ensure_table_exists_dynamic(conn, table_name, database, schema, source_schema, service, typed=True):
+    """
+    Crea tabla con todas las columnas originales del Parquet + metadatos. Si la tabla ya
+    existe y el mes trae columnas nuevas (p.ej. cbd_congestion_fee en 2025) las agrega
+    con ALTER TABLE. Retorna {COLUMNA: TIPO} de la tabla.
+    """
+    table_fqn = f"{database.upper()}.{schema.upper()}.{table_name.upper()}"
+    table_columns = get_table_columns(conn, database, schema, table_name)
+    
+    def _column_type(field):
+        return snowflake_type_for(field.type) if typed else 'VARCHAR'
+    
     cursor = conn.cursor()
     try:
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_SCHEMA = '{schema.upper()}' AND TABLE_NAME = '{table_name.upper()}'
-        """)
-        
-        if cursor.fetchone()[0] == 0:
+        if not table_columns:
             columns_def = []
-            for col in original_columns:
-                columns_def.append(f"{col} VARCHAR")
+            for field in source_schema:
+                columns_def.append(f"{field.name} {_column_type(field)}")
             
             metadata_cols = [
                 "_run_id VARCHAR",
@@ -389,13 +1685,65 @@ def ensure_table_exists_dynamic(conn, table_name, database, schema, original_col
             columns_and_types = ",\n                ".join(all_columns)
             
             cursor.execute(f"""
-                CREATE TABLE {database.upper()}.{schema.upper()}.{table_name.upper()} (
+                CREATE TABLE IF NOT EXISTS {table_fqn} (
                     {columns_and_types}
                 )
             """)
-            print(f"    Tabla {table_name} creada con {len(original_columns)} columnas + 7 metadatos")
+            print(f"    Tabla {table_name} creada con {len(source_schema.names)} columnas + 7 metadatos")
+        else:
+            # Drift de schema: columnas del Parquet que la tabla todavía no tiene
+            new_fields = [f for f in source_schema if f.name.upper() not in table_columns]
+            for field in new_fields:
+                cursor.execute(
+                    f"ALTER TABLE {table_fqn} ADD COLUMN IF NOT EXISTS {field.name} {_column_type(field)}"
+                )
+                print(f"    Schema drift: columna {field.name} ({_column_type(field)}) agregada a {table_name}")
+            if not new_fields:
+                return table_columns
+    finally:
+        cursor.close()
+    
+    return get_table_columns(conn, database, schema, table_name, refresh=True)
+
+
+def snowflake_type_for(arrow_type):
+    """Tipo Snowflake equivalente a un tipo Arrow del Parquet TLC"""
+    if pa.types.is_integer(arrow_type):
+        return 'NUMBER(38,0)'
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return 'FLOAT'
+    if pa.types.is_timestamp(arrow_type):
+        return 'TIMESTAMP_NTZ'
+    if pa.types.is_date(arrow_type):
+        return 'DATE'
+    if pa.types.is_boolean(arrow_type):
+        return 'BOOLEAN'
+    return 'VARCHAR'
+
+
+def get_table_columns(conn, database, schema, table_name, refresh=False):
+    """{COLUMNA: TIPO} de la tabla (vacío si no existe), cacheado por tabla"""
+    table_fqn = f"{database.upper()}.{schema.upper()}.{table_name.upper()}"
+    with TABLE_COLUMNS_LOCK:
+        if not refresh and TABLE_COLUMNS_CACHE.get(table_fqn):
+            return TABLE_COLUMNS_CACHE[table_fqn]
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT COLUMN_NAME, DATA_TYPE FROM {database.upper()}.INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = '{schema.upper()}' AND TABLE_NAME = '{table_name.upper()}'
+        """)
+        columns = {name.upper(): data_type.upper() for name, data_type in cursor.fetchall()}
     finally:
         cursor.close()
+    
+    with TABLE_COLUMNS_LOCK:
+        if columns:
+            TABLE_COLUMNS_CACHE[table_fqn] = columns
+        else:
+            TABLE_COLUMNS_CACHE.pop(table_fqn, None)
+    return columns
 
 
 def ensure_table_exists_static(conn, table_name, database, schema, table_type):
@@ -434,47 +1782,123 @@ def get_table_name(service):
     return 'TAXI_ZONES' if service == 'taxi_zones' else f"{service}_tripdata".upper()
 
 
-def get_snowflake_connection(database, schema):
-    config_path = path.join(get_repo_path(), 'io_config.yaml')
-    config_loader = ConfigFileLoader(config_path, 'default')
-    config = config_loader.config
+def get_connection_pool(database, schema, max_size=None):
+    """Pool de sesiones Snowflake compartido por meses y helpers del bloque"""
+    key = (database.upper(), schema.upper())
+    with SNOWFLAKE_POOLS_LOCK:
+        pool = SNOWFLAKE_POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                lambda: get_snowflake_connection(*key),
+                max_size=max_size or DEFAULT_POOL_SIZE,
+                acquire_timeout=POOL_ACQUIRE_TIMEOUT
+            )
+            SNOWFLAKE_POOLS[key] = pool
+        elif max_size:
+            pool.max_size = max(pool.max_size, max_size)
+        return pool
+
+
+@contextmanager
+def helper_connection(database, schema, conn=None):
+    """
+    Conexión para un helper: la que el mes ya tiene tomada si se pasa `conn` (así un mes
+    nunca espera una segunda conexión del pool mientras retiene la primera), o una del pool.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with get_connection_pool(database, schema).connection() as pooled:
+        yield pooled
+
+
+def close_connection_pools():
+    """
+    Termina el run actual y retorna las métricas de cada pool. Las sesiones solo se
+    cierran si no queda otro load_data activo en el proceso.
+    """
+    global ACTIVE_RUNS
+    with SNOWFLAKE_POOLS_LOCK:
+        ACTIVE_RUNS = max(ACTIVE_RUNS - 1, 0)
+        last_run = ACTIVE_RUNS == 0
+        pools = dict(SNOWFLAKE_POOLS)
+        if last_run:
+            SNOWFLAKE_POOLS.clear()
     
-    return snowflake.connector.connect(
-        account=config.get('SNOWFLAKE_ACCOUNT'),
-        user=config.get('SNOWFLAKE_USER'),
-        password=config.get('SNOWFLAKE_PASSWORD'),
-        warehouse=config.get('SNOWFLAKE_WAREHOUSE'),
-        database=database,
-        schema=schema,
-        insecure_mode=True
-    )
+    metrics = {}
+    for (database, schema), pool in pools.items():
+        metrics[f"{database}.{schema}"] = pool.snapshot()
+        if last_run:
+            pool.close_all()
+    return metrics
 
 
-def check_existing_data(database, schema, service, year, month):
+def load_coverage_ledger(database, schema, service, periods):
+    """
+    Ledger de cobertura: {(año, mes): filas} de los períodos pedidos que ya existen en
+    Bronze, en una sola consulta agrupada. Retorna None si no se pudo consultar (cada
+    mes vuelve a usar check_existing_data).
+    """
+    if service == 'taxi_zones' or not periods:
+        return {}
+    
     try:
-        conn = get_snowflake_connection(database, schema)
-        table_name = get_table_name(service)
-        cursor = conn.cursor()
-        
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_SCHEMA = '{schema.upper()}' AND TABLE_NAME = '{table_name.upper()}'
-        """)
-        
-        if cursor.fetchone()[0] == 0:
-            cursor.close()
-            conn.close()
-            return None
-        
-        cursor.execute(f"""
-            SELECT COUNT(*) as cnt
-            FROM {database}.{schema}.{table_name}
-            WHERE _data_year = {year} AND _data_month = {month}
-        """)
+        with get_connection_pool(database, schema).connection() as conn:
+            table_name = get_table_name(service)
+            if not get_table_columns(conn, database, schema, table_name):
+                return {}
+            
+            years = ", ".join(str(y) for y in sorted({y for y, _ in periods}))
+            cursor = conn.cursor()
+            try:
+                warehouse_execute(cursor, f"""
+                    SELECT _data_year, _data_month, COUNT(*) as cnt
+                    FROM {database.upper()}.{schema.upper()}.{table_name.upper()}
+                    WHERE _data_year IN ({years})
+                    GROUP BY 1, 2
+                """, 'coverage_ledger')
+                # Resultado en Arrow: sin tuplas de Python por fila
+                table = cursor_to_arrow(cursor)
+            finally:
+                cursor.close()
         
-        count = cursor.fetchone()[0]
-        cursor.close()
-        conn.close()
+        wanted = set(periods)
+        ledger = {}
+        rows = zip(*(column.to_pylist() for column in table.columns)) if table.num_columns else []
+        for data_year, data_month, count in rows:
+            key = (int(data_year), int(data_month))
+            if key in wanted:
+                ledger[key] = int(count)
+        print(f"Cobertura existente: {len(ledger)} de {len(wanted)} meses ya tienen datos")
+        return ledger
+    except Exception as e:
+        print(f"Aviso: no se pudo leer la cobertura en bloque ({e}), se verificará mes a mes")
+        return None
+
+
+def check_existing_data(database, schema, service, year, month, conn=None):
+    try:
+        with helper_connection(database, schema, conn) as conn:
+            table_name = get_table_name(service)
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+                    WHERE TABLE_SCHEMA = '{schema.upper()}' AND TABLE_NAME = '{table_name.upper()}'
+                """)
+                
+                if cursor.fetchone()[0] == 0:
+                    return None
+                
+                cursor.execute(f"""
+                    SELECT COUNT(*) as cnt
+                    FROM {database}.{schema}.{table_name}
+                    WHERE _data_year = {year} AND _data_month = {month}
+                """)
+                
+                count = cursor.fetchone()[0]
+            finally:
+                cursor.close()
         
         return {'count': int(count)} if count > 0 else None
     except:
@@ -482,28 +1906,189 @@ def check_existing_data(database, schema, service, year, month):
 
 
 def ensure_audit_table_exists(conn, database, schema):
+    """
+    Crea AUDIT_COVERAGE si no existe y agrega las columnas nuevas a tablas antiguas.
+    Los modelos dbt incrementales leen esta tabla para saber qué meses reprocesar.
+    """
+    columns = get_table_columns(conn, database, schema, 'AUDIT_COVERAGE')
+    missing = [c for c in AUDIT_ADDED_COLUMNS if c not in columns]
+    if columns and not missing:
+        return
+    
     cursor = conn.cursor()
     try:
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_SCHEMA = '{schema.upper()}' AND TABLE_NAME = 'AUDIT_COVERAGE'
-        """)
-        
-        if cursor.fetchone()[0] == 0:
+        if not columns:
             cursor.execute(f"""
-                CREATE TABLE {database.upper()}.{schema.upper()}.AUDIT_COVERAGE (
+                CREATE TABLE IF NOT EXISTS {database.upper()}.{schema.upper()}.AUDIT_COVERAGE (
                     service_type VARCHAR,
                     _data_year NUMBER,
                     _data_month NUMBER,
                     row_count NUMBER,
                     gap BOOLEAN,
-                    registered_at TIMESTAMP
+                    registered_at TIMESTAMP,
+                    _batch_run_id VARCHAR,
+                    rows_rejected NUMBER,
+                    ingest_profile VARCHAR
                 )
             """)
+        else:
+            for column in missing:
+                cursor.execute(f"""
+                    ALTER TABLE {database.upper()}.{schema.upper()}.AUDIT_COVERAGE
+                    ADD COLUMN IF NOT EXISTS {column} {AUDIT_ADDED_COLUMNS[column]}
+                """)
+    finally:
+        cursor.close()
+    get_table_columns(conn, database, schema, 'AUDIT_COVERAGE', refresh=True)
+
+
+def ensure_checkpoint_table_exists(conn, database, schema):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {database.upper()}.{schema.upper()}.{CHECKPOINT_TABLE} (
+                service_type VARCHAR,
+                _data_year NUMBER,
+                _data_month NUMBER,
+                _run_id VARCHAR,
+                chunk_index NUMBER,
+                chunk_size NUMBER,
+                row_count NUMBER,
+                source_fingerprint VARCHAR,
+                committed_at TIMESTAMP
+            )
+        """)
     finally:
         cursor.close()
 
 
+def record_checkpoint(cursor, database, schema, checkpoint_row):
+    """Inserta la fila de checkpoint de un chunk (dentro de la transacción del chunk)"""
+    cursor.execute(f"""
+        INSERT INTO {database.upper()}.{schema.upper()}.{CHECKPOINT_TABLE}
+            (service_type, _data_year, _data_month, _run_id, chunk_index, chunk_size,
+             row_count, source_fingerprint, committed_at)
+        SELECT '{checkpoint_row['service_type']}', {checkpoint_row['year']}, {checkpoint_row['month']},
+               '{checkpoint_row['run_id']}', {checkpoint_row['chunk_index']}, {checkpoint_row['chunk_size']},
+               {checkpoint_row['rows']}, '{checkpoint_row['fingerprint']}', CURRENT_TIMESTAMP()
+    """)
+
+
+def load_checkpoint_ledger(database, schema, service, periods):
+    """
+    Runs interrumpidos por mes: {(año, mes): {run_id, fingerprint, chunk_size, chunks, rows}}.
+    Un mes terminado borra sus checkpoints, así que toda fila aquí es un run incompleto.
+    """
+    if service not in ['yellow', 'green'] or not periods:
+        return {}
+    
+    try:
+        with get_connection_pool(database, schema).connection() as conn:
+            if not get_table_columns(conn, database, schema, CHECKPOINT_TABLE):
+                return {}
+            
+            years = ", ".join(str(y) for y in sorted({y for y, _ in periods}))
+            cursor = conn.cursor()
+            try:
+                warehouse_execute(cursor, f"""
+                    SELECT _data_year, _data_month, _run_id, source_fingerprint, chunk_size,
+                           chunk_index, row_count, committed_at
+                    FROM {database.upper()}.{schema.upper()}.{CHECKPOINT_TABLE}
+                    WHERE service_type = '{service}' AND _data_year IN ({years})
+                    ORDER BY committed_at
+                """, 'checkpoint_ledger')
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+    except Exception as e:
+        print(f"Aviso: no se pudo leer {CHECKPOINT_TABLE} ({e}), no se reanudarán meses")
+        return {}
+    
+    wanted = set(periods)
+    ledger = {}
+    for data_year, data_month, run_id, fingerprint, chunk_size, chunk_index, row_count, _ in rows:
+        key = (int(data_year), int(data_month))
+        if key not in wanted:
+            continue
+        state = ledger.get(key)
+        # Ordenado por committed_at: si hubiera varios runs gana el más reciente
+        if state is None or state['run_id'] != run_id:
+            state = ledger[key] = {
+                'run_id': run_id,
+                'fingerprint': fingerprint,
+                'chunk_size': int(chunk_size),
+                'chunks': set(),
+                'rows': 0
+            }
+        state['chunks'].add(int(chunk_index))
+        state['rows'] += int(row_count)
+    
+    if ledger:
+        print(f"Checkpoints: {len(ledger)} meses interrumpidos se reanudarán")
+    return ledger
+
+
+def clear_checkpoints(database, schema, service, year, month, conn=None):
+    try:
+        with helper_connection(database, schema, conn) as conn:
+            if not get_table_columns(conn, database, schema, CHECKPOINT_TABLE):
+                return
+            cursor = conn.cursor()
+            try:
+                warehouse_execute(cursor, f"""
+                    DELETE FROM {database.upper()}.{schema.upper()}.{CHECKPOINT_TABLE}
+                    WHERE service_type = '{service}' AND _data_year = {year} AND _data_month = {month}
+                """, 'clear_checkpoints')
+            finally:
+                cursor.close()
+    except:
+        pass
+
+
+def source_fingerprint(local_path, download_cache=None):
+    """sha256 del archivo fuente (en el cache el nombre del objeto ya es su sha256)"""
+    if download_cache is not None and path.dirname(local_path) == download_cache.objects_dir:
+        return path.basename(local_path)
+    
+    hasher = hashlib.sha256()
+    with open(local_path, 'rb') as f:
+        for block in iter(lambda: f.read(DOWNLOAD_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def load_known_gaps(database, schema, services, years):
+    """
+    {(service, año, mes)} cuya última entrada en AUDIT_COVERAGE es una brecha
+    (archivo no publicado), para que el planner no los vuelva a intentar.
+    """
+    services = [s for s in services if s in ['yellow', 'green']]
+    if not services or not years:
+        return set()
+    
+    try:
+        with get_connection_pool(database, schema).connection() as conn:
+            if not get_table_columns(conn, database, schema, 'AUDIT_COVERAGE'):
+                return set()
+            cursor = conn.cursor()
+            try:
+                warehouse_execute(cursor, f"""
+                    SELECT service_type, _data_year, _data_month
+                    FROM {database.upper()}.{schema.upper()}.AUDIT_COVERAGE
+                    WHERE service_type IN ({", ".join(f"'{s}'" for s in services)})
+                      AND _data_year IN ({", ".join(str(int(y)) for y in years)})
+                    QUALIFY ROW_NUMBER() OVER (
+                        PARTITION BY service_type, _data_year, _data_month ORDER BY registered_at DESC
+                    ) = 1 AND gap
+                """, 'known_gaps')
+                return {(service, int(y), int(m)) for service, y, m in cursor.fetchall()}
+            finally:
+                cursor.close()
+    except Exception as e:
+        print(f"Aviso: no se pudieron leer las brechas conocidas ({e})")
+        return set()
+
+
 def register_gap(database, schema, service, year, month):
     try:
         gap_df = pd.DataFrame([{
@@ -515,38 +2100,41 @@ def register_gap(database, schema, service, year, month):
             'registered_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }])
         
-        conn = get_snowflake_connection(database, schema)
-        try:
+        with get_connection_pool(database, schema).connection() as conn, \
+                INGEST_METRICS.get().stage('audit', op='register_gap'):
             ensure_audit_table_exists(conn, database, schema)
             write_pandas(conn=conn, df=gap_df, table_name='AUDIT_COVERAGE',
                         database=database.upper(), schema=schema.upper(),
                         auto_create_table=False, quote_identifiers=False)
-        finally:
-            conn.close()
     except:
         pass
 
 
-def save_audit_coverage(database, schema, service, year, month):
+def save_audit_coverage(database, schema, service, year, month, row_count, batch_run_id=None,
+                        rows_rejected=None, ingest_profile=None):
+    """
+    Registra la cobertura del mes con el conteo que ya tiene el exportador.
+    rows_rejected son las filas que el perfil 'lean' descartó al leer el archivo.
+    registered_at se toma al escribir la fila: el watermark de incremental_partitions
+    (registered_at > max(_audit_registered_at)) necesita que crezca en orden de escritura.
+    """
     try:
-        conn = get_snowflake_connection(database, schema)
-        ensure_audit_table_exists(conn, database, schema)
-        
-        query = f"""
-        SELECT {year} as _data_year, {month} as _data_month,
-               COUNT(*) as row_count, '{service}' as service_type,
-               FALSE as gap, CURRENT_TIMESTAMP() as registered_at
-        FROM {database}.{schema}.{get_table_name(service)}
-        WHERE _data_year = {year} AND _data_month = {month}
-        """
-        
-        result = pd.read_sql(query, conn)
-        
-        if len(result) > 0:
-            write_pandas(conn=conn, df=result, table_name='AUDIT_COVERAGE',
+        with get_connection_pool(database, schema).connection() as conn, \
+                INGEST_METRICS.get().stage('audit', op='coverage'):
+            ensure_audit_table_exists(conn, database, schema)
+            audit_df = pd.DataFrame([{
+                'service_type': service,
+                '_data_year': year,
+                '_data_month': month,
+                'row_count': int(row_count),
+                'gap': False,
+                'registered_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'),
+                '_batch_run_id': batch_run_id,
+                'rows_rejected': rows_rejected,
+                'ingest_profile': ingest_profile or PROFILE_FULL
+            }])
+            write_pandas(conn=conn, df=audit_df, table_name='AUDIT_COVERAGE',
                         database=database.upper(), schema=schema.upper(),
                         auto_create_table=False, quote_identifiers=False)
-        
-        conn.close()
     except:
-        pass
\ No newline at end of file
+        pass
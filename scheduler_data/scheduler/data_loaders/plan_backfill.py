@@ -0,0 +1,153 @@
+import requests
+from datetime import datetime
+from os import path
+import os
+import json
+import time
+from mage_ai.settings.repo import get_repo_path
+from mage_ai.data_preparation.shared.secrets import get_secret_value
+from scheduler.data_loaders.ingest_data import (
+    METRICS_DIR, close_connection_pools, get_source_url, load_checkpoint_ledger, load_coverage_ledger,
+    load_data, load_known_gaps
+)
+from scheduler.utils.backfill_planner import (
+    MONTHLY_SERVICES, SIZE_PROBE_WORKERS, consolidate_report, expand_grid, pack_units, plan_work,
+    probe_sizes, run_work_queue, unit_id
+)
+
+if 'data_loader' not in globals():
+    from mage_ai.data_preparation.decorators import data_loader
+if 'test' not in globals():
+    from mage_ai.data_preparation.decorators import test
+
+
+PLAN_MODE_DYNAMIC = 'dynamic'  # una unidad por bloque hijo de ingest_data (Mage)
+PLAN_MODE_QUEUE = 'queue'  # cola acotada en este proceso
+
+# kwargs propios del planner; el resto se pasa a cada unidad de ingest_data
+PLANNER_KWARGS = {
+    'services', 'years', 'months', 'priority', 'months_per_unit', 'retry_gaps', 'mode',
+    'max_workers', 'service_limits', 'probe_sizes', 'probe_workers',
+}
+
+
+@data_loader
+def plan_backfill(*args, **kwargs):
+    """
+    Planifica un backfill sobre la grilla servicio x año x mes y lo reparte en unidades
+    de trabajo para ingest_data.
+
+    Parámetros:
+    - services: Lista de servicios (default: ['yellow', 'green'])
+    - years: Lista de años (obligatorio)
+    - months: Meses a considerar (default: 1-12; los meses futuros se descartan)
+    - priority: 'size' (meses más pesados primero), 'chronological' o 'recent' (default: 'size')
+    - months_per_unit: Meses por unidad de trabajo (default: 12 = un año por unidad)
+    - retry_gaps: Volver a intentar meses registrados como brecha (default: False)
+    - force_reload: Incluir meses ya cargados (default: False)
+    - mode: 'dynamic' (retorna las unidades para un ingest_data dinámico) o 'queue'
+      (las ejecuta acá con una cola acotada) (default: 'dynamic')
+    - max_workers: Unidades en paralelo en modo 'queue' (default: 2)
+    - service_limits: Tope de unidades en vuelo por servicio, p.ej. {'yellow': 2} (default: 1)
+    - probe_sizes: Consultar el tamaño de cada archivo con HEAD para priority='size' (default: True)
+    El resto de kwargs (chunk_size, load_mode, parallel_months, ...) se pasa a ingest_data.
+    """
+    started_at = time.time()
+    services = kwargs.get('services') or list(MONTHLY_SERVICES)
+    years = kwargs.get('years')
+    if not years:
+        raise Exception("plan_backfill requiere 'years'")
+    years = [int(y) for y in years]
+    priority = kwargs.get('priority', 'size')
+    mode = kwargs.get('mode', PLAN_MODE_DYNAMIC)
+
+    database = get_secret_value('SNOWFLAKE_DATABASE')
+    schema = get_secret_value('SNOWFLAKE_SCHEMA')
+
+    items = expand_grid(services, years, kwargs.get('months'))
+    print(f"Grilla: {len(items)} items ({', '.join(services)} x {years})")
+
+    # Cobertura y brechas en una consulta por servicio: los meses ya cargados ni siquiera
+    # llegan a ingest_data
+    # Los meses con checkpoints abiertos tienen filas pero quedaron a medias: van igual
+    coverage = {}
+    interrupted = set()
+    if not kwargs.get('force_reload', False):
+        for service in services:
+            periods = [(i['year'], i['month']) for i in items if i['service'] == service]
+            ledger = load_coverage_ledger(database, schema, service, periods) or {}
+            coverage.update({(service, y, m): rows for (y, m), rows in ledger.items()})
+            checkpoints = load_checkpoint_ledger(database, schema, service, periods)
+            interrupted.update((service, y, m) for y, m in checkpoints)
+    gaps = load_known_gaps(database, schema, services, years)
+
+    pending, dropped = plan_work(
+        items, coverage, gaps,
+        retry_gaps=kwargs.get('retry_gaps', False),
+        force_reload=kwargs.get('force_reload', False),
+        interrupted=interrupted,
+    )
+    if interrupted:
+        print(f"Meses interrumpidos a reanudar: {len(interrupted)}")
+    print(f"Pendientes: {len(pending)} | ya cargados: {len(dropped['done'])} | brechas conocidas: {len(dropped['gap'])}")
+
+    if priority == 'size' and kwargs.get('probe_sizes', True):
+        probe_sizes(pending, head_content_length, workers=int(kwargs.get('probe_workers', SIZE_PROBE_WORKERS)))
+
+    units = pack_units(
+        pending,
+        priority=priority,
+        months_per_unit=int(kwargs.get('months_per_unit', 12)),
+        service_order=['taxi_zones'],
+    )
+    for unit in units:
+        size = f"{unit['est_bytes'] / 1024 ** 2:,.0f} MB" if unit['est_bytes'] else 'tamaño desconocido'
+        print(f"  {unit_id(unit)}: {len(unit['months'] or [])} meses, {size}")
+
+    if mode == PLAN_MODE_DYNAMIC:
+        close_connection_pools()
+        return [units, [{'block_uuid': unit_id(unit)} for unit in units]]
+    if mode != PLAN_MODE_QUEUE:
+        raise Exception(f"mode debe ser '{PLAN_MODE_DYNAMIC}' o '{PLAN_MODE_QUEUE}': {mode}")
+
+    max_workers = max(int(kwargs.get('max_workers', 2)), 1)
+    unit_kwargs = {k: v for k, v in kwargs.items() if k not in PLANNER_KWARGS}
+
+    entries = run_work_queue(
+        units,
+        lambda unit: load_data(unit, **unit_kwargs),
+        max_workers=max_workers,
+        service_limits=kwargs.get('service_limits'),
+    )
+    report = consolidate_report(entries, dropped, started_at)
+    report['report_path'] = save_backfill_report(report, kwargs.get('metrics_dir'))
+    print(f"Backfill: {report['units']} unidades, {report['units_failed']} fallidas, "
+          f"{report['rows_loaded']:,} filas en {report['wall_seconds']}s")
+    return report
+
+
+def head_content_length(item):
+    """Tamaño del archivo TLC según HEAD (None si el servidor no lo informa)"""
+    if item['year'] is None:
+        return None
+    url, _ = get_source_url(item['service'], item['year'], item['month'])
+    response = requests.head(url, allow_redirects=True, timeout=10)
+    if response.status_code != 200:
+        return None
+    length = response.headers.get('Content-Length')
+    return int(length) if length else None
+
+
+def save_backfill_report(report, metrics_dir=None):
+    metrics_dir = metrics_dir or path.join(get_repo_path(), METRICS_DIR)
+    os.makedirs(metrics_dir, exist_ok=True)
+    report_path = path.join(metrics_dir, f"backfill_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Reporte de backfill: {report_path}")
+    return report_path
+
+
+@test
+def test_output(output, *args) -> None:
+    assert output is not None, 'The output is undefined'
@@ -0,0 +1,141 @@
+{#
+    Particiones (service_type, _data_year, _data_month) que un modelo incremental debe
+    reprocesar, resueltas en tiempo de ejecución:
+
+    - var('touched_months'): meses a reprocesar pasados a mano,
+      p.ej. --vars '{"touched_months": ["yellow:2015-01", "green:2015-01"]}'
+    - sin la variable: las particiones cuyo registered_at en la entrada del modelo es más
+      nuevo que el _audit_registered_at que el modelo ya tiene para esa misma partición.
+      La entrada es BRONZE.AUDIT_COVERAGE (ingest_data registra cada mes al terminar de
+      cargarlo) o, con `upstream`, el _audit_registered_at por partición del modelo del que
+      se lee. La comparación es por partición: un mes que termina de cargar después de otro
+      registrado más tarde no queda atrás de un watermark global.
+
+    upstream: relación con columna service_type, o {servicio: relación} para modelos de un
+    solo servicio (sin columna service_type, igual que este modelo si `services` tiene uno).
+
+    Retorna {'partitions': [(service, year, month), ...],
+             'registered': {'service:year:month': 'YYYY-MM-DD HH24:MI:SS.FF6'}}
+    El registered_at de cada partición se guarda en la columna _audit_registered_at del
+    modelo (partition_registered_at).
+#}
+{% macro incremental_partitions(services, upstream=none) %}
+    {% if not execute %}
+        {{ return({'partitions': [], 'registered': {}}) }}
+    {% endif %}
+
+    {% set touched = var('touched_months', none) %}
+    {% set use_watermark = is_incremental() and touched is none %}
+
+    {% set query %}
+        with input_partitions as (
+            {% if upstream is none %}
+            select service_type, _data_year, _data_month, max(registered_at) as registered_at
+            from {{ source('bronze', 'audit_coverage') }}
+            where coalesce(gap, false) = false
+              and service_type in ({% for s in services %}'{{ s }}'{% if not loop.last %}, {% endif %}{% endfor %})
+            group by 1, 2, 3
+            {% elif upstream is mapping %}
+            {% for service, relation in upstream.items() if service in services %}
+            select '{{ service }}' as service_type, _data_year, _data_month,
+                   max(_audit_registered_at) as registered_at
+            from {{ relation }}
+            group by 1, 2, 3
+            {% if not loop.last %}union all{% endif %}
+            {% endfor %}
+            {% else %}
+            select service_type, _data_year, _data_month, max(_audit_registered_at) as registered_at
+            from {{ upstream }}
+            where service_type in ({% for s in services %}'{{ s }}'{% if not loop.last %}, {% endif %}{% endfor %})
+            group by 1, 2, 3
+            {% endif %}
+        ){% if use_watermark %},
+        model_partitions as (
+            select {% if services | length == 1 %}'{{ services[0] }}'{% else %}service_type{% endif %} as service_type,
+                   _data_year, _data_month, max(_audit_registered_at) as registered_at
+            from {{ this }}
+            group by 1, 2, 3
+        ){% endif %}
+        select i.service_type, i._data_year, i._data_month,
+               to_varchar(i.registered_at, 'YYYY-MM-DD HH24:MI:SS.FF6') as registered_at
+        from input_partitions i
+        {% if use_watermark %}
+        left join model_partitions m
+            on m.service_type = i.service_type
+            and m._data_year = i._data_year
+            and m._data_month = i._data_month
+        where m.registered_at is null or i.registered_at > m.registered_at
+        {% endif %}
+    {% endset %}
+
+    {% set registered = {} %}
+    {% for row in run_query(query).rows %}
+        {% if row[3] %}
+            {% do registered.update({row[0] ~ ':' ~ row[1] ~ ':' ~ row[2]: row[3]}) %}
+        {% endif %}
+    {% endfor %}
+
+    {% set partitions = [] %}
+    {% if touched is not none %}
+        {% for item in touched %}
+            {% set service, period = item.split(':') %}
+            {% set year, month = period.split('-') %}
+            {% if service in services %}
+                {% do partitions.append((service, year | int, month | int)) %}
+            {% endif %}
+        {% endfor %}
+    {% else %}
+        {% for key in registered %}
+            {% set service, year, month = key.split(':') %}
+            {% do partitions.append((service, year | int, month | int)) %}
+        {% endfor %}
+    {% endif %}
+
+    {% if is_incremental() %}
+        {{ log(this.identifier ~ ': ' ~ partitions | length ~ ' particiones a reprocesar', info=true) }}
+    {% endif %}
+    {{ return({'partitions': partitions, 'registered': registered}) }}
+{% endmacro %}
+
+
+{#
+    Predicado SQL sobre _data_year/_data_month para las particiones dadas.
+    - service: solo las particiones de ese servicio (filtro al compilar)
+    - service_column: agrega "<columna> = '<servicio>'" a cada partición
+    Sin particiones retorna 1 = 0 (el run incremental no inserta nada).
+#}
+{% macro partition_predicate(partitions, service=none, service_column=none) %}
+    {%- set selected = [] -%}
+    {%- for p in partitions -%}
+        {%- if service is none or p[0] == service -%}
+            {%- do selected.append(p) -%}
+        {%- endif -%}
+    {%- endfor -%}
+    {%- if selected | length == 0 -%}
+        1 = 0
+    {%- else -%}
+        ({% for p in selected %}({% if service_column %}{{ service_column }} = '{{ p[0] }}' and {% endif %}_data_year = {{ p[1] }} and _data_month = {{ p[2] }}){% if not loop.last %} or {% endif %}{% endfor %})
+    {%- endif -%}
+{% endmacro %}
+
+
+{#
+    _audit_registered_at de cada fila: el registered_at de su partición en el batch
+    (incremental_partitions), así el modelo guarda el watermark por partición.
+    - service / service_column: igual que partition_predicate
+    - prefix: alias de la tabla de _data_year/_data_month (p.ej. 't.') si el select tiene joins
+#}
+{% macro partition_registered_at(batch, service=none, service_column=none, prefix='') %}
+    {%- set selected = [] -%}
+    {%- for p in batch.partitions -%}
+        {%- set registered_at = batch.registered.get(p[0] ~ ':' ~ p[1] ~ ':' ~ p[2]) -%}
+        {%- if registered_at and (service is none or p[0] == service) -%}
+            {%- do selected.append((p, registered_at)) -%}
+        {%- endif -%}
+    {%- endfor -%}
+    {%- if selected | length == 0 -%}
+        null::timestamp_ntz
+    {%- else -%}
+        case{% for p, registered_at in selected %} when {% if service_column %}{{ service_column }} = '{{ p[0] }}' and {% endif %}{{ prefix }}_data_year = {{ p[1] }} and {{ prefix }}_data_month = {{ p[2] }} then '{{ registered_at }}'::timestamp_ntz{% endfor %} end
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,46 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['service_type', '_data_year', '_data_month'],
+    on_schema_change='append_new_columns'
+) }}
+
+{#
+    Rollup a grano (borough de recogida, año, mes, servicio) construido sobre agg_zone_day:
+    suma los contadores y combina los sketches de duración sin volver a leer fct_trips.
+#}
+
+{% set batch = incremental_partitions(['yellow', 'green'], upstream=ref('agg_zone_day')) %}
+
+with zone_day as (
+    select *
+    from {{ ref('agg_zone_day') }}
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions, service_column='service_type') }}
+    {% endif %}
+)
+
+select
+    Z.Borough as borough,
+    D.year,
+    month(D.full_date) as month,
+    D.month_name,
+    A.service_type,
+    A._data_year,
+    A._data_month,
+    sum(A.pickup_trips) as pickup_trips,
+    sum(A.total_amount_sum) as total_amount_sum,
+    sum(A.tip_amount_sum) as tip_amount_sum,
+    sum(A.fare_amount_sum) as fare_amount_sum,
+    sum(A.trip_distance_sum) as trip_distance_sum,
+    sum(A.speed_mph_sum) as speed_mph_sum,
+    sum(A.speed_trips) as speed_trips,
+    sum(A.duration_trips) as duration_trips,
+    sum(A.duration_seconds_sum) as duration_seconds_sum,
+    approx_percentile_combine(A.duration_sketch) as duration_sketch,
+    {{ partition_registered_at(batch, service_column='A.service_type', prefix='A.') }} as _audit_registered_at
+from zone_day A
+left join {{ ref('dim_zone') }} Z on A.zone_sk = Z.zone_sk
+left join {{ ref('dim_date') }} D on A.date_sk = D.date_sk
+where A.pickup_trips > 0
+group by 1, 2, 3, 4, 5, 6, 7
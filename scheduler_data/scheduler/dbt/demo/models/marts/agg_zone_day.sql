@@ -0,0 +1,95 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['service_type', '_data_year', '_data_month'],
+    on_schema_change='append_new_columns',
+    cluster_by=['date_sk', 'zone_sk']
+) }}
+
+{#
+    Rollup de fct_trips a grano (zona, día, servicio) para las consultas estándar del notebook.
+    - Métricas de recogida (PU) por pickup_date_sk y conteo de llegadas (DO) por dropoff_date_sk.
+    - duration_sketch: estado t-digest de APPROX_PERCENTILE_ACCUMULATE, combinable con
+      APPROX_PERCENTILE_COMBINE a cualquier grano superior (borough, mes, total).
+    - Conserva la partición de ingesta (_data_year, _data_month) para el modo incremental.
+#}
+
+{% set batch = incremental_partitions(['yellow', 'green'], upstream=ref('fct_trips')) %}
+
+with trips as (
+    select *
+    from {{ ref('fct_trips') }}
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions, service_column='service_type') }}
+    {% endif %}
+),
+
+pickups as (
+    select
+        pu_zone_sk as zone_sk,
+        pickup_date_sk as date_sk,
+        service_type,
+        _data_year,
+        _data_month,
+        count(*) as pickup_trips,
+        sum(total_amount) as total_amount_sum,
+        sum(tip_amount) as tip_amount_sum,
+        sum(fare_amount) as fare_amount_sum,
+        sum(trip_distance) as trip_distance_sum,
+        -- Velocidad: suma de mph por viaje válido (promedio = speed_mph_sum / speed_trips)
+        sum(case when trip_duration_seconds > 0 and trip_distance > 0
+                 then trip_distance / trip_duration_seconds * 3600 end) as speed_mph_sum,
+        count_if(trip_duration_seconds > 0 and trip_distance > 0) as speed_trips,
+        -- Duración: solo viajes con duración positiva, igual que la consulta 4
+        count_if(trip_duration_seconds > 0) as duration_trips,
+        sum(case when trip_duration_seconds > 0 then trip_duration_seconds end) as duration_seconds_sum,
+        approx_percentile_accumulate(
+            case when trip_duration_seconds > 0 then trip_duration_seconds end
+        ) as duration_sketch
+    from trips
+    group by 1, 2, 3, 4, 5
+),
+
+dropoffs as (
+    select
+        do_zone_sk as zone_sk,
+        dropoff_date_sk as date_sk,
+        service_type,
+        _data_year,
+        _data_month,
+        count(*) as dropoff_trips
+    from trips
+    group by 1, 2, 3, 4, 5
+),
+
+zone_day as (
+    select
+        coalesce(p.zone_sk, d.zone_sk) as zone_sk,
+        coalesce(p.date_sk, d.date_sk) as date_sk,
+        coalesce(p.service_type, d.service_type) as service_type,
+        coalesce(p._data_year, d._data_year) as _data_year,
+        coalesce(p._data_month, d._data_month) as _data_month,
+        coalesce(p.pickup_trips, 0) as pickup_trips,
+        coalesce(d.dropoff_trips, 0) as dropoff_trips,
+        coalesce(p.total_amount_sum, 0) as total_amount_sum,
+        coalesce(p.tip_amount_sum, 0) as tip_amount_sum,
+        coalesce(p.fare_amount_sum, 0) as fare_amount_sum,
+        coalesce(p.trip_distance_sum, 0) as trip_distance_sum,
+        coalesce(p.speed_mph_sum, 0) as speed_mph_sum,
+        coalesce(p.speed_trips, 0) as speed_trips,
+        coalesce(p.duration_trips, 0) as duration_trips,
+        coalesce(p.duration_seconds_sum, 0) as duration_seconds_sum,
+        p.duration_sketch
+    from pickups p
+    full outer join dropoffs d
+        on p.zone_sk = d.zone_sk
+        and p.date_sk = d.date_sk
+        and p.service_type = d.service_type
+        and p._data_year = d._data_year
+        and p._data_month = d._data_month
+)
+
+select
+    *,
+    {{ partition_registered_at(batch, service_column='service_type') }} as _audit_registered_at
+from zone_day
@@ -1,11 +1,19 @@
 {{ config(
-    materialized='table',
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['service_type', '_data_year', '_data_month'],
+    on_schema_change='append_new_columns',
     cluster_by=['pickup_date_sk', 'pu_zone_sk'] 
 ) }}
 
+{% set batch = incremental_partitions(['yellow', 'green'], upstream=ref('stg_enriched')) %}
+
 with trips as (
     select *
     from {{ ref('stg_enriched') }} -- Consume el modelo final de Silver
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions, service_column='service_type') }}
+    {% endif %}
 ),
 
 final_fact as (
@@ -45,7 +53,13 @@ final_fact as (
         T1.cbd_congestion_fee,
 
         -- Metadatos para auditoría
-        T1.service_type
+        T1.service_type,
+        
+        -- Partición de ingesta (clave del modo incremental)
+        T1._data_year,
+        T1._data_month,
+        T1._batch_run_id,
+        {{ partition_registered_at(batch, service_column='T1.service_type', prefix='T1.') }} as _audit_registered_at
         
     from trips T1
     
@@ -1,23 +1,65 @@
 {{ config(
-    materialized='table'
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['service_type', '_data_year', '_data_month'],
+    on_schema_change='append_new_columns'
 ) }}
 
+{# Con ingest_silver la entrada es el Silver emitido: se publica antes de su fila en AUDIT_COVERAGE #}
+{% set batch = incremental_partitions(
+    ['yellow', 'green'], upstream=none if var('ingest_silver', false) else ref('stg_trips')
+) %}
+
+{% if var('ingest_silver', false) %}
+
+-- Silver emitido por ingest_data (emit_silver=True, utils/silver_transform.py): solo se
+-- copian las particiones tocadas, sin volver a leer Bronze. Correr con
+-- dbt run --select stg_enriched+ --vars '{"ingest_silver": true}'
+with enriched as (
+    select *
+    from {{ source('silver_ingest', 'trips_enriched') }}
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions, service_column='service_type') }}
+    {% endif %}
+)
+
+select
+    e.* exclude (_audit_registered_at, trip_duration_seconds, pickup_zone, pickup_borough,
+                 dropoff_zone, dropoff_borough),
+    {{ partition_registered_at(batch, service_column='e.service_type', prefix='e.') }} as _audit_registered_at,
+    e.trip_duration_seconds,
+    e.pickup_zone,
+    e.pickup_borough,
+    e.dropoff_zone,
+    e.dropoff_borough
+from enriched e
+
+{% else %}
+
 with trips as (
     select *
     from {{ ref('stg_trips') }} 
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions, service_column='service_type') }}
+    {% endif %}
 ),
 zones as (
+    -- Última carga de cada LocationID (taxi_zones puede tener recargas)
     select *
     from {{ source('bronze', 'taxi_zones') }}
+    qualify row_number() over (partition by locationid order by _ingest_ts desc) = 1
 )
 
 select
-    t.*,
+    t.* exclude (_audit_registered_at),
+    {{ partition_registered_at(batch, service_column='t.service_type', prefix='t.') }} as _audit_registered_at,
     DATEDIFF(second, t.pickup_datetime, t.dropoff_datetime) AS trip_duration_seconds,
     zp.zone as pickup_zone,
     zp.borough as pickup_borough,
     zd.zone as dropoff_zone,
     zd.borough as dropoff_borough
 from trips t
-left join zones zp on t.pu_location_id = zp.zone
-left join zones zd on t.do_location_id = zd.borough
\ No newline at end of file
+left join zones zp on t.pu_location_id = zp.locationid
+left join zones zd on t.do_location_id = zd.locationid
+
+{% endif %}
\ No newline at end of file
@@ -1,9 +1,20 @@
 -- Modelo Silver: Yellow Taxi Trip, limpieza y estandarización
-{{ config(materialized='table') }}
+-- Incremental por mes: solo se reprocesan las particiones que tocó la ingesta
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['_data_year', '_data_month'],
+    on_schema_change='append_new_columns'
+) }}
+
+{% set batch = incremental_partitions(['green']) %}
 
 with raw as (
     select *
     from {{ source('bronze', 'green_tripdata') }}
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions) }}
+    {% endif %}
 ),
 
 standardized as (
@@ -39,7 +50,12 @@ standardized as (
         RATECODEID as rate_code_id,
         STORE_AND_FWD_FLAG as store_and_fwd_flag,
         PULocationID as pu_location_id,
-        DOLocationID as do_location_id
+        DOLocationID as do_location_id,
+        -- Partición y linaje de ingesta
+        _data_year,
+        _data_month,
+        _batch_run_id,
+        {{ partition_registered_at(batch) }} as _audit_registered_at
     from raw
 ),
 
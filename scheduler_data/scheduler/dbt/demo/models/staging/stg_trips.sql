@@ -1,18 +1,31 @@
 {{ config(
-    materialized='table'
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['service_type', '_data_year', '_data_month'],
+    on_schema_change='append_new_columns'
 ) }}
 
+{% set batch = incremental_partitions(
+    ['yellow', 'green'], upstream={'yellow': ref('stg_yellow'), 'green': ref('stg_green')}
+) %}
+
 with yellow as (
-    select *, 'yellow' as service_type
+    select * exclude (_audit_registered_at), 'yellow' as service_type
     from {{ ref('stg_yellow') }}
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions, service='yellow') }}
+    {% endif %}
 ),
 green as (
-    select *, 'green' as service_type
+    select * exclude (_audit_registered_at), 'green' as service_type
     from {{ ref('stg_green') }}
+    {% if is_incremental() %}
+    where {{ partition_predicate(batch.partitions, service='green') }}
+    {% endif %}
 )
 
-select *
+select *, {{ partition_registered_at(batch, service='yellow') }} as _audit_registered_at
 from yellow
 union all
-select *
-from green
\ No newline at end of file
+select *, {{ partition_registered_at(batch, service='green') }} as _audit_registered_at
+from green
@@ -1,40 +1,111 @@
-from pandas import DataFrame
-import math
+from pandas import DataFrame, concat
+import numpy as np
+
+from scheduler.utils.quantile_sketch import DEFAULT_RELATIVE_ACCURACY, QuantileSketch
 
 if 'transformer' not in globals():
     from mage_ai.data_preparation.decorators import transformer
 if 'test' not in globals():
     from mage_ai.data_preparation.decorators import test
 
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
 def select_number_columns(df: DataFrame) -> DataFrame:
     return df[['Age', 'Fare', 'Parch', 'Pclass', 'SibSp', 'Survived']]
 
 
+def column_medians(df: DataFrame) -> dict:
+    """
+    Mediana de cada columna en una sola pasada vectorizada: el elemento values[n // 2]
+    de los valores no nulos, por selección (np.partition, O(n)) en vez de ordenar.
+    """
+    values = df.to_numpy(dtype='float64', copy=True)
+    non_null = (~np.isnan(values)).sum(axis=0)
+    # Los NaN se mandan al final para que la selección solo vea valores presentes
+    values[np.isnan(values)] = np.inf
+
+    medians = {}
+    # Columnas con el mismo conteo de no nulos comparten el k de la selección
+    for k in np.unique(non_null[non_null > 0] // 2):
+        columns = np.flatnonzero((non_null // 2 == k) & (non_null > 0))
+        selected = np.partition(values[:, columns], k, axis=0)[k]
+        for column, value in zip(columns, selected):
+            medians[df.columns[column]] = value
+    return medians
+
+
 def fill_missing_values_with_median(df: DataFrame) -> DataFrame:
-    for col in df.columns:
-        values = sorted(df[col].dropna().tolist())
-        median_value = values[math.floor(len(values) / 2)]
-        df[[col]] = df[[col]].fillna(median_value)
-    return df
+    return df.fillna(column_medians(df))
+
+
+def iter_chunks(df: DataFrame, chunk_size: int):
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def median_sketches(chunks, relative_accuracy=DEFAULT_RELATIVE_ACCURACY) -> dict:
+    """{columna: QuantileSketch} acumulado chunk a chunk (memoria constante)"""
+    sketches = {}
+    for chunk in chunks:
+        for col in chunk.columns:
+            sketch = sketches.setdefault(col, QuantileSketch(relative_accuracy))
+            sketch.update(chunk[col].to_numpy(dtype='float64', na_value=np.nan))
+    return sketches
+
+
+def sketch_medians(sketches: dict, dtypes=None) -> dict:
+    """Medianas aproximadas; las columnas enteras se redondean para no imputar fracciones"""
+    medians = {}
+    for col, sketch in sketches.items():
+        value = sketch.quantile(0.5)
+        if value is None:
+            continue
+        if dtypes is not None and np.issubdtype(dtypes[col], np.integer):
+            value = round(value)
+        medians[col] = value
+    return medians
+
+
+def fill_missing_values_streaming(make_chunks, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Imputación por mediana sobre un stream de DataFrames en dos pasadas:
+    1) sketches de cuantiles por columna, 2) fillna chunk a chunk.
+    `make_chunks()` debe retornar un iterador nuevo en cada llamada. La mediana tiene
+    error relativo <= relative_accuracy. Retorna un generador de chunks imputados.
+    """
+    sketches = median_sketches(make_chunks(), relative_accuracy)
+    medians = None
+    for chunk in make_chunks():
+        if medians is None:
+            medians = sketch_medians(sketches, chunk.dtypes)
+        yield chunk.fillna(medians)
 
 
 @transformer
 def transform_df(df: DataFrame, *args, **kwargs) -> DataFrame:
     """
-    Template code for a transformer block.
-
-    Add more parameters to this function if this block has multiple parent blocks.
-    There should be one parameter for each output variable from each parent block.
+    Imputa los nulos de las columnas numéricas con la mediana de cada columna.
 
-    Args:
-        df (DataFrame): Data frame from parent block.
+    kwargs:
+    - median_mode: 'exact' (selección vectorizada) o 'sketch' (chunks + sketch de
+      cuantiles combinable, memoria constante) (default: 'exact')
+    - chunk_size: Filas por chunk en modo 'sketch' (default: 1000000)
+    - relative_accuracy: Error relativo máximo de la mediana en modo 'sketch' (default: 0.01)
 
     Returns:
         DataFrame: Transformed data frame
     """
-    # Specify your transformation logic here
+    df = select_number_columns(df)
+    if kwargs.get('median_mode', 'exact') != 'sketch':
+        return fill_missing_values_with_median(df)
 
-    return fill_missing_values_with_median(select_number_columns(df))
+    chunk_size = int(kwargs.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    relative_accuracy = float(kwargs.get('relative_accuracy', DEFAULT_RELATIVE_ACCURACY))
+    if df.empty:
+        return df
+    chunks = fill_missing_values_streaming(lambda: iter_chunks(df, chunk_size), relative_accuracy)
+    return concat(chunks)
 
 
 @test
@@ -0,0 +1,165 @@
+import os
+import uuid
+from contextlib import contextmanager
+from os import path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+FETCH_ROWS = 100_000  # filas por lote cuando el cursor no entrega Arrow
+DEFAULT_MEMORY_LIMIT = 1024 ** 3  # bytes Arrow antes de volcar a Parquet
+
+
+def iter_arrow_batches(conn, sql, max_rows=None, cursor=None):
+    """
+    Ejecuta `sql` y entrega el resultado como tablas Arrow, lote a lote.
+
+    - Snowflake: fetch_arrow_batches() (los chunks del resultado llegan en Arrow, sin
+      pasar por tuplas de Python).
+    - DuckDB: fetch_record_batch().
+    - Otro cursor DB-API: fetchmany() convertido a Arrow por columnas.
+    max_rows corta el resultado (el último lote se recorta con slice, sin copia).
+    """
+    own_cursor = cursor is None
+    cursor = cursor or conn.cursor()
+    try:
+        cursor.execute(sql)
+        for table in iter_cursor_batches(cursor, max_rows=max_rows):
+            yield table
+    finally:
+        if own_cursor:
+            cursor.close()
+
+
+def iter_cursor_batches(cursor, max_rows=None):
+    """Como iter_arrow_batches para un cursor ya ejecutado"""
+    remaining = int(max_rows) if max_rows is not None else None
+    for table in _cursor_tables(cursor):
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            if table.num_rows > remaining:
+                table = table.slice(0, remaining)
+            remaining -= table.num_rows
+        if table.num_rows:
+            yield table
+
+
+def cursor_to_arrow(cursor, max_rows=None):
+    """Resultado de un cursor ya ejecutado como una pa.Table"""
+    return concat_or_empty(list(iter_cursor_batches(cursor, max_rows=max_rows)))
+
+
+def iter_dataframes(conn, sql, max_rows=None):
+    """Generador de DataFrames, uno por lote Arrow (memoria acotada al lote)"""
+    for table in iter_arrow_batches(conn, sql, max_rows=max_rows):
+        yield table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def fetch_arrow(conn, sql, max_rows=None):
+    """Resultado completo como una pa.Table (los lotes se concatenan sin copiar)"""
+    return concat_or_empty(list(iter_arrow_batches(conn, sql, max_rows=max_rows)))
+
+
+@contextmanager
+def fetch_arrow_spilled(conn, sql, spill_dir, max_rows=None, memory_limit_bytes=DEFAULT_MEMORY_LIMIT):
+    """
+    Como fetch_arrow, pero si el resultado supera memory_limit_bytes los lotes acumulados y
+    los siguientes se escriben a un Parquet en `spill_dir` y se entrega un
+    pyarrow.dataset.Dataset sobre ese archivo (lectura perezosa, con proyección y filtros).
+    El archivo se borra al salir del bloque:
+
+        with fetch_arrow_spilled(conn, sql, spill_dir) as result:
+            ...
+    """
+    tables = []
+    held_bytes = 0
+    writer = None
+    spill_path = None
+    try:
+        try:
+            for table in iter_arrow_batches(conn, sql, max_rows=max_rows):
+                if writer is None:
+                    tables.append(table)
+                    held_bytes += table.nbytes
+                    if held_bytes <= memory_limit_bytes:
+                        continue
+                    os.makedirs(spill_dir, exist_ok=True)
+                    spill_path = path.join(spill_dir, f"result_{uuid.uuid4().hex}.parquet")
+                    writer = pq.ParquetWriter(spill_path, table.schema)
+                    print(f"Resultado > {memory_limit_bytes / 1024 ** 2:.0f} MB, volcando a {spill_path}")
+                    for held in tables:
+                        writer.write_table(held.cast(table.schema))
+                    tables = []
+                else:
+                    writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if spill_path is None:
+            yield concat_or_empty(tables)
+        else:
+            yield ds.dataset(spill_path, format='parquet')
+    finally:
+        # También si la consulta falló a mitad del volcado
+        if spill_path is not None and path.exists(spill_path):
+            os.remove(spill_path)
+
+
+def fetch_dataframe(conn, sql, max_rows=None):
+    """Reemplazo de pd.read_sql vía Arrow (un solo to_pandas al final)"""
+    return fetch_arrow(conn, sql, max_rows=max_rows).to_pandas(self_destruct=True, split_blocks=True)
+
+
+def fetch_to_parquet(conn, sql, file_path, max_rows=None):
+    """Escribe el resultado a un Parquet lote a lote; retorna {path, rows, bytes}"""
+    os.makedirs(path.dirname(file_path) or '.', exist_ok=True)
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    writer = None
+    rows = 0
+    try:
+        for table in iter_arrow_batches(conn, sql, max_rows=max_rows):
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        # Sin filas no se escribe archivo
+        return {'path': None, 'rows': 0, 'bytes': 0}
+    os.replace(tmp_path, file_path)
+    return {'path': file_path, 'rows': rows, 'bytes': path.getsize(file_path)}
+
+
+def concat_or_empty(tables):
+    if not tables:
+        return pa.table({})
+    # El fallback DB-API infiere tipos por lote (p.ej. null vs int): unificar esquemas
+    return pa.concat_tables(tables, promote_options='default')
+
+
+def _cursor_tables(cursor):
+    if hasattr(cursor, 'fetch_arrow_batches'):
+        for table in cursor.fetch_arrow_batches():
+            yield table
+        return
+
+    if hasattr(cursor, 'fetch_record_batch'):
+        reader = cursor.fetch_record_batch(FETCH_ROWS)
+        for batch in reader:
+            yield pa.Table.from_batches([batch])
+        return
+
+    names = [d[0] for d in cursor.description or []]
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        columns = list(zip(*rows))
+        yield pa.table({name: pa.array(values) for name, values in zip(names, columns)})
@@ -0,0 +1,227 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+
+MONTHLY_SERVICES = ('yellow', 'green')
+STATIC_SERVICES = ('taxi_zones',)
+PRIORITIES = ('size', 'chronological', 'recent')
+DEFAULT_SERVICE_LIMIT = 1
+SIZE_PROBE_WORKERS = 8
+
+
+def expand_grid(services, years, months=None, today=None):
+    """
+    Items (service, year, month) del rango pedido. Los meses futuros se descartan
+    (TLC todavía no los publicó) y los servicios estáticos generan un solo item.
+    """
+    months = list(months or range(1, 13))
+    today = today or date.today()
+    items = []
+    for service in services:
+        if service in STATIC_SERVICES:
+            items.append({'service': service, 'year': None, 'month': None})
+            continue
+        if service not in MONTHLY_SERVICES:
+            raise ValueError(f"Servicio no soportado: {service}")
+        for year in years:
+            for month in months:
+                if (int(year), int(month)) <= (today.year, today.month):
+                    items.append({'service': service, 'year': int(year), 'month': int(month)})
+    return items
+
+
+def probe_sizes(items, size_fn, workers=SIZE_PROBE_WORKERS):
+    """Agrega est_bytes a cada item con size_fn(item) (p.ej. HEAD Content-Length), en paralelo"""
+    def _probe(item):
+        try:
+            return size_fn(item)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for item, size in zip(items, executor.map(_probe, items)):
+            item['est_bytes'] = size
+    return items
+
+
+def plan_work(items, coverage=None, gaps=None, retry_gaps=False, force_reload=False, interrupted=None):
+    """
+    Separa los items en pendientes y descartados.
+    - coverage: {(service, year, month): filas} ya cargadas (descarta si > 0)
+    - gaps: {(service, year, month)} registrados como brecha en AUDIT_COVERAGE
+    - interrupted: {(service, year, month)} con checkpoints abiertos (carga a medias): siguen
+      pendientes aunque tengan filas, para que ingest_data los reanude
+    Retorna (pendientes, {'done': [...], 'gap': [...]}).
+    """
+    coverage = coverage or {}
+    gaps = gaps or set()
+    interrupted = interrupted or set()
+    pending = []
+    dropped = {'done': [], 'gap': []}
+    for item in items:
+        key = (item['service'], item['year'], item['month'])
+        if item['service'] in STATIC_SERVICES or force_reload or key in interrupted:
+            pending.append(item)
+        elif coverage.get(key, 0) > 0:
+            dropped['done'].append(item)
+        elif key in gaps and not retry_gaps:
+            dropped['gap'].append(item)
+        else:
+            pending.append(item)
+    return pending, dropped
+
+
+def pack_units(items, priority='size', months_per_unit=12, service_order=None):
+    """
+    Agrupa los items en unidades de trabajo (service, year, [meses]) para ingest_data.
+
+    - months_per_unit parte cada (service, year) en unidades más chicas para repartir
+      mejor entre workers.
+    - priority: 'size' (mayor est_bytes primero: los meses grandes no quedan al final de
+      la cola), 'chronological' o 'recent' (años recientes primero).
+    - service_order: servicios que van primero sin importar la prioridad (p.ej. taxi_zones).
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority debe ser uno de {PRIORITIES}: {priority}")
+
+    groups = {}
+    for item in items:
+        groups.setdefault((item['service'], item['year']), []).append(item)
+
+    units = []
+    for (service, year), group in groups.items():
+        group = sorted(group, key=lambda i: i['month'] or 0)
+        step = max(int(months_per_unit), 1)
+        for start in range(0, len(group), step):
+            part = group[start:start + step]
+            sizes = [i.get('est_bytes') for i in part]
+            # Servicio estático: una sola carga (months=None en ingest_data son los 12 meses)
+            months = [1] if service in STATIC_SERVICES else [i['month'] for i in part]
+            units.append({
+                'service': service,
+                'year': year,
+                'months': months,
+                'est_bytes': sum(s for s in sizes if s) or None,
+            })
+
+    if priority == 'size':
+        units.sort(key=lambda u: (-(u['est_bytes'] or 0), u['service'], u['year'] or 0))
+    elif priority == 'chronological':
+        units.sort(key=lambda u: (u['year'] or 0, (u['months'] or [0])[0], u['service']))
+    else:
+        units.sort(key=lambda u: (-(u['year'] or 0), (u['months'] or [0])[0], u['service']))
+
+    if service_order:
+        rank = {s: i for i, s in enumerate(service_order)}
+        # sort estable: dentro de cada servicio se mantiene la prioridad
+        units.sort(key=lambda u: rank.get(u['service'], len(rank)))
+    return units
+
+
+def unit_id(unit):
+    if unit['year'] is None:
+        return unit['service']
+    months = unit['months'] or []
+    span = f"{months[0]:02d}-{months[-1]:02d}" if months else 'all'
+    return f"{unit['service']}_{unit['year']}_{span}"
+
+
+def run_work_queue(units, run_fn, max_workers=2, service_limits=None):
+    """
+    Ejecuta run_fn(unit) con una cola acotada: a lo más max_workers unidades en vuelo y,
+    por servicio, lo que indique service_limits ({'yellow': 2, ...}, default 1).
+    Un worker toma la primera unidad de la cola cuyo servicio tenga cupo, así un
+    servicio saturado no bloquea a los demás. Retorna [{unit, result | error, seconds}].
+    """
+    service_limits = dict(service_limits or {})
+    pending = list(units)
+    running = {}
+    results = []
+    cond = threading.Condition()
+
+    def _next_unit():
+        for i, unit in enumerate(pending):
+            limit = max(int(service_limits.get(unit['service'], DEFAULT_SERVICE_LIMIT)), 1)
+            if running.get(unit['service'], 0) < limit:
+                return pending.pop(i)
+        return None
+
+    def _worker():
+        while True:
+            with cond:
+                unit = _next_unit()
+                while unit is None and pending:
+                    cond.wait()
+                    unit = _next_unit()
+                if unit is None:
+                    return
+                running[unit['service']] = running.get(unit['service'], 0) + 1
+
+            start = time.time()
+            entry = {'unit': unit, 'id': unit_id(unit)}
+            try:
+                entry['result'] = run_fn(unit)
+            except Exception as e:
+                entry['error'] = str(e)
+            entry['seconds'] = round(time.time() - start, 2)
+
+            with cond:
+                running[unit['service']] -= 1
+                results.append(entry)
+                cond.notify_all()
+
+    threads = [threading.Thread(target=_worker, name=f"backfill-{i}", daemon=True)
+               for i in range(max(int(max_workers), 1))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def consolidate_report(entries, dropped=None, started_at=None):
+    """Reporte único del backfill: totales por servicio, unidades fallidas y meses descartados"""
+    report = {
+        'units': len(entries),
+        'units_failed': 0,
+        'months_successful': 0,
+        'months_skipped': 0,
+        'months_gap': 0,
+        'months_failed': 0,
+        'rows_loaded': 0,
+        'by_service': {},
+        'failures': [],
+        'touched_partitions': [],
+    }
+    for entry in entries:
+        result = entry.get('result') or {}
+        service = entry['unit']['service']
+        totals = report['by_service'].setdefault(
+            service, {'units': 0, 'months_successful': 0, 'months_failed': 0, 'rows_loaded': 0, 'seconds': 0.0}
+        )
+        totals['units'] += 1
+        totals['seconds'] = round(totals['seconds'] + entry.get('seconds', 0), 2)
+        if 'error' in entry:
+            report['units_failed'] += 1
+            report['failures'].append({'unit': entry['id'], 'error': entry['error']})
+            continue
+        for field in ('months_successful', 'months_skipped', 'months_gap', 'months_failed'):
+            report[field] += result.get(field, 0)
+        report['rows_loaded'] += result.get('total_rows_loaded', 0)
+        totals['months_successful'] += result.get('months_successful', 0)
+        totals['months_failed'] += result.get('months_failed', 0)
+        totals['rows_loaded'] += result.get('total_rows_loaded', 0)
+        report['touched_partitions'].extend(result.get('touched_partitions', []))
+        for month_result in result.get('monthly_results', []):
+            if not month_result.get('success') and not month_result.get('skipped') and not month_result.get('gap'):
+                report['failures'].append({
+                    'unit': entry['id'], 'month': month_result.get('month'), 'error': month_result.get('error')
+                })
+
+    if dropped:
+        report['planner_dropped'] = {reason: len(items) for reason, items in dropped.items()}
+    if started_at is not None:
+        report['wall_seconds'] = round(time.time() - started_at, 2)
+    return report
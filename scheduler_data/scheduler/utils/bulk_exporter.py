@@ -0,0 +1,251 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from snowflake.connector.pandas_tools import write_pandas
+
+from scheduler.utils.connection_pool import ConnectionPool
+
+
+EXPORT_MODE_APPEND = 'append'
+EXPORT_MODE_REPLACE = 'replace'
+EXPORT_MODE_UPSERT = 'upsert'
+EXPORT_MODES = (EXPORT_MODE_APPEND, EXPORT_MODE_REPLACE, EXPORT_MODE_UPSERT)
+
+DEFAULT_WORKERS = 4
+DEFAULT_PARTITION_ROWS = 250_000
+MAX_RETRIES = 3
+RETRY_DELAY = 2  # segundos, se duplica en cada reintento
+SEQ_COLUMN = '_EXPORT_SEQ'  # orden de llegada en modo upsert (la última fila de cada clave gana)
+PART_COLUMN = '_EXPORT_PART'  # partición de origen de cada fila en staging (reintentos idempotentes)
+
+
+class BulkExporter:
+    """
+    Exportador a Snowflake para cualquier bloque del pipeline.
+
+    - Acepta un DataFrame o un iterable/generador de DataFrames: cada uno se parte en
+      particiones de `partition_rows` filas que se suben en paralelo (write_pandas) con
+      `workers` conexiones del pool. Hay a lo más 2 * workers particiones en memoria.
+    - Todo se sube a una tabla staging transitoria y se publica al final en un paso:
+      append (INSERT ... SELECT), replace o upsert (MERGE por `keys`). Si algo falla la
+      tabla destino no cambia.
+    - replace usa INSERT OVERWRITE si la tabla destino tiene las mismas columnas (conserva
+      tipo, grants y clustering); si las columnas cambiaron la reconstruye con
+      CREATE OR REPLACE ... COPY GRANTS. En ambos casos no hay ventana con la tabla vacía.
+    - Cada fila lleva su partición en staging: un reintento borra lo que haya alcanzado a
+      cargar el intento anterior y no duplica filas.
+    - export() retorna el reporte de throughput del run.
+    """
+
+    def __init__(self, pool, database, schema, workers=DEFAULT_WORKERS,
+                 partition_rows=DEFAULT_PARTITION_ROWS, max_retries=MAX_RETRIES):
+        self.pool = pool
+        self.database = database.upper()
+        self.schema = schema.upper()
+        self.workers = max(int(workers), 1)
+        self.partition_rows = max(int(partition_rows), 1)
+        self.max_retries = max_retries
+
+    def export(self, frames, table_name, mode=EXPORT_MODE_APPEND, keys=None):
+        if mode not in EXPORT_MODES:
+            raise ValueError(f"mode debe ser uno de {EXPORT_MODES}: {mode}")
+        keys = [k.upper() for k in (keys or [])]
+        if mode == EXPORT_MODE_UPSERT and not keys:
+            raise ValueError("El modo upsert requiere keys")
+
+        table_name = table_name.upper()
+        target = f"{self.database}.{self.schema}.{table_name}"
+        staging = f"{table_name}__STG_{uuid.uuid4().hex[:8]}".upper()
+        stats = {
+            'table': target, 'mode': mode, 'rows': 0, 'partitions': 0, 'bytes': 0,
+            'workers': self.workers, 'upload_seconds': 0.0, 'publish_seconds': 0.0,
+        }
+        start = time.time()
+
+        try:
+            self._upload(frames, staging, mode == EXPORT_MODE_UPSERT, stats)
+            stats['upload_seconds'] = round(time.time() - start, 2)
+            if stats['partitions']:
+                publish_start = time.time()
+                self._publish(staging, target, mode, keys)
+                stats['publish_seconds'] = round(time.time() - publish_start, 2)
+            else:
+                print(f"Exportación a {target}: sin filas, la tabla no se modifica")
+        finally:
+            self._drop(staging)
+
+        stats['seconds'] = round(time.time() - start, 2)
+        stats['rows_per_sec'] = round(stats['rows'] / stats['seconds']) if stats['seconds'] else None
+        stats['mb_per_sec'] = round(stats['bytes'] / 1024 ** 2 / stats['seconds'], 2) if stats['seconds'] else None
+        print(f"Exportación {mode} a {target}: {stats['rows']:,} filas en {stats['partitions']} particiones, "
+              f"{stats['seconds']}s ({stats['rows_per_sec'] or 0:,} filas/s, {stats['mb_per_sec'] or 0} MB/s)")
+        return stats
+
+    # ------------------------------------------------------------------ #
+    def _upload(self, frames, staging, with_seq, stats):
+        """Sube las particiones a staging; la primera crea la tabla con el schema del DataFrame"""
+        in_flight = threading.BoundedSemaphore(2 * self.workers)
+        lock = threading.Lock()
+        futures = []
+
+        def _write(part, index, create):
+            try:
+                rows = self._write_partition(part, index, staging, create)
+                with lock:
+                    stats['rows'] += rows
+                    stats['bytes'] += int(part.memory_usage(index=False, deep=True).sum())
+            finally:
+                in_flight.release()
+
+        seq = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bulk-export') as executor:
+            for index, part in enumerate(iter_partitions(frames, self.partition_rows)):
+                part = part.assign(**{PART_COLUMN: index})
+                if with_seq:
+                    part = part.assign(**{SEQ_COLUMN: range(seq, seq + len(part))})
+                    seq += len(part)
+                stats['partitions'] += 1
+                in_flight.acquire()
+                if index == 0:
+                    # Sin paralelismo hasta que exista la tabla staging
+                    _write(part, index, create=True)
+                    continue
+                futures.append(executor.submit(_write, part, index, False))
+                # Un error en cualquier partición corta el stream sin esperar al final
+                for future in [f for f in futures if f.done()]:
+                    future.result()
+                    futures.remove(future)
+            for future in futures:
+                future.result()
+
+    def _write_partition(self, part, index, staging, create):
+        staging_fqn = f"{self.database}.{self.schema}.{staging}"
+        delay = RETRY_DELAY
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with self.pool.connection() as conn:
+                    if attempt > 1:
+                        # El COPY del intento anterior pudo confirmarse antes del error
+                        cursor = conn.cursor()
+                        try:
+                            if create:
+                                # Primera partición: nadie más escribe todavía en staging
+                                cursor.execute(f"DROP TABLE IF EXISTS {staging_fqn}")
+                            else:
+                                cursor.execute(f"DELETE FROM {staging_fqn} WHERE {PART_COLUMN} = {index}")
+                        finally:
+                            cursor.close()
+                    success, _, nrows, _ = write_pandas(
+                        conn=conn, df=part, table_name=staging,
+                        database=self.database, schema=self.schema,
+                        quote_identifiers=False, use_logical_type=True,
+                        auto_create_table=create, table_type='transient' if create else '',
+                    )
+                if not success:
+                    raise Exception(f"write_pandas falló en {staging}")
+                return nrows
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def _publish(self, staging, target, mode, keys):
+        staging_fqn = f"{self.database}.{self.schema}.{staging}"
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT * FROM {staging_fqn} LIMIT 0")
+                columns = [d[0].upper() for d in cursor.description if d[0].upper() not in (SEQ_COLUMN, PART_COLUMN)]
+                column_list = ", ".join(columns)
+
+                if mode == EXPORT_MODE_REPLACE:
+                    if set(self._target_columns(cursor, target)) == set(columns):
+                        # Truncado + carga en una sola sentencia: los lectores ven los datos
+                        # viejos o los nuevos, y la tabla destino sigue siendo la misma (tipo,
+                        # grants, clustering), solo cambian sus filas
+                        cursor.execute(f"INSERT OVERWRITE INTO {target} ({column_list}) SELECT {column_list} FROM {staging_fqn}")
+                    else:
+                        # Tabla nueva o columnas distintas: INSERT OVERWRITE fallaría. Se reemplaza
+                        # la tabla en una sentencia (permanente, con los grants de la anterior)
+                        cursor.execute(f"""
+                            CREATE OR REPLACE TABLE {target} COPY GRANTS AS
+                            SELECT {column_list} FROM {staging_fqn}
+                        """)
+                    return
+
+                # Tabla permanente (CTAS), nunca del tipo transitorio de la staging
+                cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {target} AS
+                    SELECT {column_list} FROM {staging_fqn} LIMIT 0
+                """)
+
+                if mode == EXPORT_MODE_APPEND:
+                    cursor.execute(f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging_fqn}")
+                    return
+
+                missing = [k for k in keys if k not in columns]
+                if missing:
+                    raise ValueError(f"keys sin columna en los datos: {missing}")
+                on = " AND ".join(f"t.{k} = s.{k}" for k in keys)
+                update_set = ", ".join(f"{c} = s.{c}" for c in columns if c not in keys)
+                cursor.execute(f"""
+                    MERGE INTO {target} t
+                    USING (
+                        SELECT * FROM {staging_fqn}
+                        QUALIFY ROW_NUMBER() OVER (PARTITION BY {", ".join(keys)} ORDER BY {SEQ_COLUMN} DESC) = 1
+                    ) s
+                    ON {on}
+                    {f"WHEN MATCHED THEN UPDATE SET {update_set}" if update_set else ""}
+                    WHEN NOT MATCHED THEN INSERT ({column_list})
+                    VALUES ({", ".join(f"s.{c}" for c in columns)})
+                """)
+            finally:
+                cursor.close()
+
+    def _target_columns(self, cursor, target):
+        """Columnas de la tabla destino (vacío si no existe)"""
+        table_name = target.rsplit('.', 1)[-1]
+        cursor.execute(f"""
+            SELECT COLUMN_NAME FROM {self.database}.INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = '{self.schema}' AND TABLE_NAME = '{table_name}'
+        """)
+        return [row[0].upper() for row in cursor.fetchall()]
+
+    def _drop(self, staging):
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f"DROP TABLE IF EXISTS {self.database}.{self.schema}.{staging}")
+                finally:
+                    cursor.close()
+        except Exception as e:
+            print(f"Aviso: no se pudo eliminar la tabla staging {staging}: {e}")
+
+
+def iter_partitions(frames, partition_rows):
+    """DataFrames de a lo más partition_rows filas a partir de un DataFrame o un iterable de ellos"""
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    for df in frames:
+        if df is None or df.empty:
+            continue
+        for start in range(0, len(df), partition_rows):
+            yield df.iloc[start:start + partition_rows]
+
+
+def export_frames(frames, table_name, database, schema, connect_fn, mode=EXPORT_MODE_APPEND, keys=None,
+                  workers=DEFAULT_WORKERS, partition_rows=DEFAULT_PARTITION_ROWS):
+    """Exportación completa con un pool propio (workers + 1 conexiones) que se cierra al final"""
+    pool = ConnectionPool(connect_fn, max_size=max(int(workers), 1) + 1)
+    try:
+        exporter = BulkExporter(pool, database, schema, workers=workers, partition_rows=partition_rows)
+        stats = exporter.export(frames, table_name, mode=mode, keys=keys)
+        stats['pool'] = pool.snapshot()
+        return stats
+    finally:
+        pool.close_all()
@@ -0,0 +1,187 @@
+import pyarrow as pa
+
+from scheduler.utils.compact_chunk import smallest_int
+
+
+MIN_CHUNK_ROWS = 50_000
+READ_BATCH_ROWS = 65_536  # granularidad de lectura; los chunks se arman juntando lotes
+MEMORY_SAFETY = 1.5  # copias transitorias (Arrow + pandas + buffer de write_pandas)
+PY_OBJECT_OVERHEAD = 49  # bytes de un str de CPython vacío
+METADATA_COLUMNS = 7  # columnas _run_id, _batch_run_id, ... (un puntero por fila)
+PLATEAU_TOLERANCE = 0.05  # variación de filas/s que se considera ruido
+ROUND_TO = 1000
+
+
+def estimate_bytes_per_row(parquet_metadata, arrow_schema, text_columns=(), compact=False):
+    """
+    Bytes en memoria por fila de un chunk a partir de la metadata del Parquet:
+    tamaño sin comprimir (≈ Arrow) + la representación pandas de cada columna.
+    `text_columns` son las columnas que viajan como texto (plan de conversión).
+    Con `compact` (utils/compact_chunk.py) los metadatos no ocupan memoria por fila y los
+    enteros se cuentan con el ancho que permite el min/max de las estadísticas del archivo;
+    floats y texto se estiman sin compactar (si se compactan o no depende de cada chunk).
+    """
+    num_rows = max(parquet_metadata.num_rows, 1)
+    # Solo las columnas del schema (con proyección no se leen las demás)
+    names = set(arrow_schema.names)
+    uncompressed = {}
+    bounds = {}
+    for rg in range(parquet_metadata.num_row_groups):
+        row_group = parquet_metadata.row_group(rg)
+        for c in range(row_group.num_columns):
+            column = row_group.column(c)
+            if column.path_in_schema not in names:
+                continue
+            uncompressed[column.path_in_schema] = (
+                uncompressed.get(column.path_in_schema, 0) + column.total_uncompressed_size
+            )
+            stats = column.statistics
+            if compact and stats is not None and stats.has_min_max and isinstance(stats.min, int):
+                low, high = bounds.get(column.path_in_schema, (stats.min, stats.max))
+                bounds[column.path_in_schema] = (min(low, stats.min), max(high, stats.max))
+
+    arrow_bytes = sum(uncompressed.values()) / num_rows
+    pandas_bytes = 0 if compact else METADATA_COLUMNS * 8
+    for field in arrow_schema:
+        if compact and pa.types.is_integer(field.type) and field.name in bounds:
+            # Entero reducido + máscara de nulos de los Int* de pandas
+            int_type = smallest_int(*bounds[field.name]) or pa.int64()
+            pandas_bytes += int_type.bit_width // 8 + 1
+        elif field.name in text_columns:
+            # 'YYYY-MM-DD HH:MM:SS' como str de Python
+            pandas_bytes += PY_OBJECT_OVERHEAD + 19 + 8
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            avg_len = uncompressed.get(field.name, 0) / num_rows
+            pandas_bytes += PY_OBJECT_OVERHEAD + avg_len + 8
+        else:
+            try:
+                pandas_bytes += max(field.type.bit_width // 8, 1)
+            except ValueError:
+                pandas_bytes += 8
+
+    return arrow_bytes + pandas_bytes
+
+
+class AdaptiveChunkSizer:
+    """
+    Decide el tamaño del siguiente chunk con un techo de memoria y la velocidad de subida medida.
+
+    - Techo: memory_budget_bytes / (bytes_per_row * MEMORY_SAFETY).
+    - Con target_seconds: filas = filas/s (EWMA) * target_seconds.
+    - Sin target_seconds: hill climbing sobre filas/s (EWMA), crece mientras mejore, retrocede
+      si empeora y se mantiene en meseta hasta que la tasa vuelva a cambiar más que
+      PLATEAU_TOLERANCE.
+    - Cada paso cambia el tamaño como mucho en un factor max_step.
+    """
+
+    def __init__(self, bytes_per_row, memory_budget_bytes, target_seconds=None,
+                 min_rows=MIN_CHUNK_ROWS, max_rows=None, initial_rows=None,
+                 smoothing=0.5, max_step=2.0):
+        self.bytes_per_row = max(float(bytes_per_row), 1.0)
+        self.memory_budget_bytes = int(memory_budget_bytes)
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.max_step = max_step
+
+        self.memory_ceiling = int(self.memory_budget_bytes / (self.bytes_per_row * MEMORY_SAFETY))
+        ceiling = min(self.memory_ceiling, int(max_rows)) if max_rows else self.memory_ceiling
+        # El presupuesto manda: si no alcanza para min_rows se baja el mínimo
+        self.min_rows = max(min(int(min_rows), ceiling), 1)
+        self.max_rows = max(ceiling, self.min_rows)
+
+        # Arranque conservador: un cuarto del techo, luego la medición decide
+        start = initial_rows or self.max_rows // 4
+        self.current = self.clamp(start)
+        self.rows_per_sec = None
+        self._last_rate = None
+        self._direction = 1
+        self.history = []
+
+    def clamp(self, rows):
+        rows = int(max(self.min_rows, min(rows, self.max_rows)))
+        if rows > ROUND_TO:
+            rows = max(rows // ROUND_TO * ROUND_TO, self.min_rows)
+        return rows
+
+    def next_size(self):
+        return self.current
+
+    def observe(self, rows, seconds):
+        """Registra la subida de un chunk y ajusta el tamaño del siguiente"""
+        if rows <= 0 or seconds <= 0:
+            return self.current
+        rate = rows / seconds
+        self.history.append({'rows': int(rows), 'seconds': round(seconds, 3), 'rows_per_sec': round(rate, 1)})
+        if self.rows_per_sec is None:
+            self.rows_per_sec = rate
+        else:
+            self.rows_per_sec = self.smoothing * rate + (1 - self.smoothing) * self.rows_per_sec
+
+        if self.target_seconds:
+            desired = self.rows_per_sec * self.target_seconds
+        else:
+            # Se compara la tasa suavizada: un chunk ruidoso no invierte la dirección
+            if self._last_rate is not None:
+                if self.rows_per_sec < self._last_rate * (1 - PLATEAU_TOLERANCE):
+                    self._direction = -1 if self._direction >= 0 else 1
+                elif self.rows_per_sec > self._last_rate * (1 + PLATEAU_TOLERANCE):
+                    # Mejora: se sigue en la misma dirección; desde la meseta se vuelve a crecer
+                    self._direction = self._direction or 1
+                else:
+                    self._direction = 0
+            self._last_rate = self.rows_per_sec
+            desired = self.current * (self.max_step ** self._direction)
+
+        desired = min(max(desired, self.current / self.max_step), self.current * self.max_step)
+        self.current = self.clamp(desired)
+        return self.current
+
+    def snapshot(self):
+        return {
+            'bytes_per_row': round(self.bytes_per_row, 1),
+            'memory_ceiling_rows': self.memory_ceiling,
+            'min_rows': self.min_rows,
+            'max_rows': self.max_rows,
+            'target_seconds': self.target_seconds,
+            'final_rows': self.current,
+            'rows_per_sec': round(self.rows_per_sec, 1) if self.rows_per_sec else None,
+            'chunks': len(self.history),
+            'sizes': [h['rows'] for h in self.history],
+        }
+
+
+def adaptive_batches(batches, sizer):
+    """
+    Re-agrupa lotes Arrow pequeños en chunks del tamaño que pida el sizer en cada paso.
+    Entrega pa.Table (sin copiar: los lotes se referencian o se cortan con slice).
+    """
+    pending = []
+    pending_rows = 0
+    for batch in batches:
+        while batch.num_rows:
+            need = sizer.next_size() - pending_rows
+            if batch.num_rows < need:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                break
+            pending.append(batch.slice(0, need))
+            batch = batch.slice(need)
+            yield pa.Table.from_batches(pending)
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending)
+
+
+def fixed_batches(batches, rows):
+    """Re-agrupa lotes Arrow en chunks de `rows` filas (el último puede ser menor)"""
+    return adaptive_batches(batches, FixedSize(rows))
+
+
+class FixedSize:
+    """Sizer de tamaño constante para adaptive_batches"""
+
+    def __init__(self, rows):
+        self.rows = max(int(rows), 1)
+
+    def next_size(self):
+        return self.rows
@@ -0,0 +1,182 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Enteros candidatos, del más chico al más grande (con nulos se usan los Int* de pandas)
+INT_TYPES = [pa.int8(), pa.int16(), pa.int32(), pa.int64()]
+NULLABLE_INTS = {
+    pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype(),
+}
+# Texto o montos con a lo más esta fracción de valores distintos se guardan como categoría
+CATEGORY_MAX_RATIO = 0.1
+# Tipos de columna destino donde un float entero puede viajar como entero sin cambiar el valor
+NUMERIC_TARGET_TYPES = ('NUMBER', 'FLOAT', 'DECIMAL', 'INT', 'DOUBLE', 'REAL')
+
+# Claves de chunk_df.attrs
+WIDE_DTYPES_ATTR = 'wide_dtypes'  # dtype que tendría cada columna compactada con to_pandas()
+CONSTANTS_ATTR = 'constant_columns'  # metadatos de ingesta, se expanden al serializar
+
+PY_POINTER = 8  # una columna object guarda un puntero por fila
+
+
+def build_compact_plan(arrow_schema, table_columns=None, conversion_plan=None):
+    """
+    {columna: 'int' | 'float' | 'string'} con las columnas que se pueden compactar.
+    Las que viajan como texto (plan de conversión) no se tocan, y un float solo pasa a
+    entero si la columna destino es numérica (en VARCHAR 1.0 y 1 no son el mismo texto).
+    """
+    table_columns = table_columns or {}
+    conversion_plan = conversion_plan or {}
+    plan = {}
+    for field in arrow_schema:
+        if field.name in conversion_plan:
+            continue
+        if pa.types.is_integer(field.type):
+            plan[field.name] = 'int'
+        elif pa.types.is_floating(field.type):
+            if table_columns.get(field.name.upper(), '').startswith(NUMERIC_TARGET_TYPES):
+                plan[field.name] = 'float'
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            plan[field.name] = 'string'
+    return plan
+
+
+def compact_to_pandas(batch, compact_plan):
+    """
+    RecordBatch/Table -> DataFrame compacto:
+    - enteros al tipo más chico que contiene el min/max del chunk
+    - floats con solo valores enteros (passenger_count, RatecodeID, ...) a entero
+    - floats con fracción y pocos valores distintos (mta_tax, extra, recargos) y texto de
+      baja cardinalidad (store_and_fwd_flag, ...) como categoría
+    El dtype que habría tenido cada columna queda en attrs[WIDE_DTYPES_ATTR] (wide_columns).
+    """
+    arrays = []
+    wide_dtypes = {}
+    for name, column in zip(batch.schema.names, batch.columns):
+        kind = compact_plan.get(name)
+        if kind is not None:
+            # También sin compactar: los enteros con nulos pasan a Int* en vez de float64
+            wide_dtypes[name] = _wide_dtype(column)
+            compacted = _compact_column(column, kind) if len(column) > column.null_count else None
+            if compacted is not None:
+                column = compacted
+        arrays.append(column)
+
+    table = pa.Table.from_arrays(arrays, names=batch.schema.names)
+    # split_blocks: una columna por bloque, sin el pico de consolidar todo en una matriz
+    chunk_df = table.to_pandas(types_mapper=NULLABLE_INTS.get, split_blocks=True)
+    chunk_df.attrs[WIDE_DTYPES_ATTR] = wide_dtypes
+    return chunk_df
+
+
+def _compact_column(column, kind):
+    if kind == 'string':
+        return _low_cardinality(column)
+
+    bounds = pc.min_max(column)
+    low, high = bounds['min'].as_py(), bounds['max'].as_py()
+    if kind == 'float':
+        # NaN no entra en las categorías de pandas: el float se queda como está
+        if pc.any(pc.is_nan(column)).as_py():
+            return None
+        if not pc.all(pc.equal(column, pc.floor(column))).as_py():
+            return _low_cardinality(column)
+    int_type = smallest_int(low, high)
+    if int_type is None or (kind == 'int' and int_type.bit_width >= column.type.bit_width):
+        return None
+    return column.cast(int_type)
+
+
+def _low_cardinality(column):
+    """Columna como diccionario (categoría en pandas) si tiene pocos valores distintos"""
+    distinct = pc.count_distinct(column).as_py()
+    if distinct > max(len(column) * CATEGORY_MAX_RATIO, 1):
+        return None
+    return column.dictionary_encode()
+
+
+def smallest_int(low, high):
+    """Entero Arrow más chico que contiene [low, high] (None si no cabe en int64)"""
+    for int_type in INT_TYPES:
+        info = np.iinfo(int_type.to_pandas_dtype())
+        if info.min <= low and high <= info.max:
+            return int_type
+    return None
+
+
+def _wide_dtype(column):
+    """dtype de to_pandas() sin compactar: un entero con nulos pasa a float64"""
+    if pa.types.is_integer(column.type):
+        return 'float64' if column.null_count else np.dtype(column.type.to_pandas_dtype()).name
+    if pa.types.is_floating(column.type):
+        return np.dtype(column.type.to_pandas_dtype()).name
+    return 'object'
+
+
+def wide_columns(chunk_df, columns):
+    """Las columnas pedidas con sus dtypes originales (p.ej. para hashes estables entre runs)"""
+    wide_dtypes = chunk_df.attrs.get(WIDE_DTYPES_ATTR, {})
+    return chunk_df[columns].astype({c: wide_dtypes[c] for c in columns if c in wide_dtypes})
+
+
+def set_constant_columns(chunk_df, constants):
+    """Registra columnas de valor constante sin repetirlas por fila"""
+    chunk_df.attrs.setdefault(CONSTANTS_ATTR, {}).update(constants)
+
+
+def expand_constant_columns(chunk_df):
+    """
+    Materializa las columnas constantes justo antes de serializar: texto como categoría
+    de un solo valor (1 byte por fila) y enteros con el tipo más chico. Idempotente.
+    Las attrs se vacían para que to_parquet no las copie a la metadata del archivo.
+    """
+    constants = chunk_df.attrs.pop(CONSTANTS_ATTR, {})
+    chunk_df.attrs.pop(WIDE_DTYPES_ATTR, None)
+    rows = len(chunk_df)
+    for name, value in constants.items():
+        if isinstance(value, str):
+            chunk_df[name] = pd.Categorical.from_codes(np.zeros(rows, dtype='int8'), categories=[value])
+        elif isinstance(value, (int, np.integer)) and smallest_int(value, value) is not None:
+            chunk_df[name] = np.full(rows, value, dtype=smallest_int(value, value).to_pandas_dtype())
+        else:
+            chunk_df[name] = value
+    return chunk_df
+
+
+def frame_bytes(df):
+    """
+    Bytes en memoria de un DataFrame. Las columnas object cuentan un puntero por fila más
+    cada objeto distinto una vez (to_pandas deduplica los str repetidos).
+    """
+    total = 0
+    for name in df.columns:
+        column = df[name]
+        if column.dtype == object:
+            total += PY_POINTER * len(column) + sum(sys.getsizeof(v) for v in pd.unique(column.values))
+        else:
+            total += int(column.memory_usage(index=False, deep=True))
+    return total
+
+
+def chunk_memory_report(batch, chunk_df, constant_columns=0):
+    """
+    Bytes por fila medidos sobre un chunk: `wide` es to_pandas() con los metadatos
+    repetidos por fila (columnas object), `compact` es el chunk compactado.
+    """
+    rows = max(len(chunk_df), 1)
+    wide_bytes = frame_bytes(batch.to_pandas()) + PY_POINTER * constant_columns * len(chunk_df)
+    compact_bytes = frame_bytes(chunk_df)
+    wide_dtypes = chunk_df.attrs.get(WIDE_DTYPES_ATTR, {})
+    return {
+        'rows': len(chunk_df),
+        'arrow_bytes_per_row': round(batch.nbytes / rows, 1),
+        'wide_bytes_per_row': round(wide_bytes / rows, 1),
+        'compact_bytes_per_row': round(compact_bytes / rows, 1),
+        'reduction': round(wide_bytes / compact_bytes, 2) if compact_bytes else None,
+        'columns_compacted': sum(str(chunk_df[c].dtype) != d for c, d in wide_dtypes.items()),
+    }
@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_POOL_SIZE = 4
+HEALTH_CHECK_SQL = 'SELECT 1'
+HEALTH_CHECK_AFTER_IDLE = 60  # segundos sin uso antes de revalidar
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones DB-API reutilizables y seguro entre threads.
+
+    `connect_fn` crea una conexión nueva (snowflake.connector.connect, sqlite3.connect, ...).
+    Las conexiones ociosas por más de `health_check_after` segundos se validan con
+    `health_check_sql` antes de entregarse; las que fallan se descartan y se reemplazan.
+    """
+
+    def __init__(self, connect_fn, max_size=DEFAULT_POOL_SIZE, health_check_sql=HEALTH_CHECK_SQL,
+                 health_check_after=HEALTH_CHECK_AFTER_IDLE, acquire_timeout=None):
+        self.connect_fn = connect_fn
+        self.max_size = max(int(max_size), 1)
+        self.health_check_sql = health_check_sql
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        self._idle = []  # [(conn, last_used)]
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.metrics = {
+            'created': 0,
+            'reused': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+            'acquires': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        }
+
+    def acquire(self):
+        """Entrega una conexión sana; bloquea si el pool está lleno"""
+        start = time.time()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("El pool de conexiones está cerrado")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    conn, last_used = None, None
+                    self._in_use += 1
+                    break
+                remaining = None
+                if self.acquire_timeout is not None:
+                    remaining = self.acquire_timeout - (time.time() - start)
+                    if remaining <= 0:
+                        raise Exception(f"Timeout esperando conexión ({self.acquire_timeout}s)")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self.connect_fn()
+                with self._cond:
+                    self.metrics['created'] += 1
+            else:
+                with self._cond:
+                    self.metrics['reused'] += 1
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.time() - start
+        with self._cond:
+            self.metrics['acquires'] += 1
+            self.metrics['wait_seconds'] += waited
+            self.metrics['max_wait_seconds'] = max(self.metrics['max_wait_seconds'], waited)
+        return conn
+
+    def release(self, conn, discard=False):
+        """Devuelve la conexión al pool (o la cierra si discard=True)"""
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed or self._is_closed(conn):
+                self._cond.notify()
+            else:
+                self._idle.append((conn, time.time()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... — descarta la conexión si quedó inutilizable"""
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = not self._ping(conn)
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def snapshot(self):
+        """Métricas actuales del pool"""
+        with self._cond:
+            return dict(self.metrics, in_use=self._in_use, idle=len(self._idle), max_size=self.max_size)
+
+    # ------------------------------------------------------------------ #
+    def _is_healthy(self, conn, last_used):
+        if self._is_closed(conn):
+            return False
+        if last_used is not None and time.time() - last_used < self.health_check_after:
+            return True
+        return self._ping(conn)
+
+    def _ping(self, conn):
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.health_check_sql)
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            with self._cond:
+                self.metrics['health_check_failures'] += 1
+            return False
+
+    @staticmethod
+    def _is_closed(conn):
+        # snowflake.connector expone is_closed(); otras conexiones DB-API no
+        is_closed = getattr(conn, 'is_closed', None)
+        try:
+            return bool(is_closed()) if callable(is_closed) else False
+        except Exception:
+            return True
+
+    def _discard(self, conn):
+        with self._cond:
+            self.metrics['discarded'] += 1
+        self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,327 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from os import path
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo el lock entre threads
+    fcntl = None
+
+
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3  # 20 GB de disco para archivos TLC
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+INDEX_FILE = 'index.json'
+LOCK_FILE = 'index.lock'
+OBJECTS_DIR = 'objects'
+
+
+class DownloadCache:
+    """
+    Cache local direccionado por contenido para archivos descargados por HTTP.
+
+    - La clave de una entrada es URL + ETag + Content-Length (vía HEAD), de modo
+      que si el origen publica una versión corregida se descarga de nuevo.
+    - Los archivos se guardan como objects/<sha256>. Antes de reutilizarlos se compara
+      tamaño y mtime con los del último hash; si el mtime cambió se vuelve a calcular el
+      sha256 (verify_on_hit) fuera del lock.
+    - Cuando el total supera max_bytes se eliminan las entradas menos usadas (LRU).
+    - fetch(url, holder=dir) fija el objeto mientras `holder` exista y el proceso siga
+      vivo: ningún proceso lo desaloja mientras se está leyendo.
+    - El índice se lee y reescribe bajo un flock sobre index.lock: los hijos dinámicos de
+      Mage corren en procesos separados y comparten el mismo directorio. Las estadísticas
+      se actualizan bajo el mismo lock.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, verify_on_hit=True,
+                 timeout=300, block_size=HASH_BLOCK_SIZE):
+        self.cache_dir = cache_dir
+        self.objects_dir = path.join(cache_dir, OBJECTS_DIR)
+        self.index_path = path.join(cache_dir, INDEX_FILE)
+        self.lock_path = path.join(cache_dir, LOCK_FILE)
+        self.max_bytes = int(max_bytes)
+        self.verify_on_hit = verify_on_hit
+        self.timeout = timeout
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'corrupt': 0, 'bytes_downloaded': 0}
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------ #
+    # API pública
+    # ------------------------------------------------------------------ #
+    def fetch(self, url, holder=None):
+        """
+        Retorna la ruta local del archivo de `url`, descargándolo solo si hace falta.
+        Con `holder` (un directorio del consumidor) el objeto queda fijado hasta que
+        ese directorio se borre.
+        """
+        try:
+            head = requests.head(url, allow_redirects=True, timeout=self.timeout)
+            head.raise_for_status()
+        except requests.exceptions.ConnectionError:
+            # Sin red: reutilizar la última versión conocida de la URL, si existe
+            cached = self._latest_entry_for_url(url, holder)
+            if cached:
+                print(f"    Cache: sin conexión, usando copia local de {path.basename(url)}")
+                return cached
+            raise
+
+        key = self._make_key(url, head.headers)
+        cached = self._lookup(key, holder)
+        if cached:
+            return cached
+
+        expected_size = head.headers.get('Content-Length')
+        digest, size = self._download(url, int(expected_size) if expected_size else None)
+        object_path = path.join(self.objects_dir, digest)
+
+        with self._index_lock():
+            index = self._load_index()
+            entry = index[key] = {
+                'url': url,
+                'etag': head.headers.get('ETag'),
+                'digest': digest,
+                'size': size,
+                'mtime_ns': os.stat(object_path).st_mtime_ns,
+                'last_access': time.time(),
+            }
+            if holder is not None:
+                self._pin(entry, holder)
+            self._evict(index, keep_key=key)
+            self._save_index(index)
+            self.stats['bytes_downloaded'] += size
+
+        return object_path
+
+    def invalidate(self, url):
+        """Elimina todas las entradas de una URL"""
+        with self._index_lock():
+            index = self._load_index()
+            for key in [k for k, e in index.items() if e['url'] == url]:
+                entry = index.pop(key)
+                # Un objeto fijado se deja en disco para quien lo está leyendo
+                if not self._live_pins(entry):
+                    self._remove_object(index, entry['digest'])
+            self._save_index(index)
+
+    def total_bytes(self):
+        with self._index_lock():
+            return self._total_bytes(self._load_index())
+
+    # ------------------------------------------------------------------ #
+    # Internos
+    # ------------------------------------------------------------------ #
+    @contextmanager
+    def _index_lock(self):
+        """Exclusión entre threads (self._lock) y entre procesos (flock) para leer-modificar-escribir el índice"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lookup(self, key, holder):
+        """Ruta del objeto de `key` si es válido (fijado para holder); None si hay que descargarlo"""
+        with self._index_lock():
+            index = self._load_index()
+            entry = index.get(key)
+            state = self._check(entry) if entry is not None else 'missing'
+            if state == 'valid':
+                return self._hit(index, entry, holder)
+            if state == 'verify':
+                # Fijado mientras se calcula el hash sin el lock: nadie lo desaloja
+                token = self._pin(entry)
+                self._save_index(index)
+            else:
+                self._discard(index, key, entry, state)
+                return None
+
+        object_path = path.join(self.objects_dir, entry['digest'])
+        try:
+            valid = self._hash_file(object_path) == entry['digest']
+        except OSError:
+            valid = False
+
+        with self._index_lock():
+            index = self._load_index()
+            current = index.get(key)
+            if current is not None:
+                current.get('pins', {}).pop(token, None)
+            if current is None or current['digest'] != entry['digest']:
+                # Otro proceso la descartó o la reemplazó mientras tanto
+                self._save_index(index)
+                self.stats['misses'] += 1
+                return None
+            if not valid:
+                self._discard(index, key, current, 'corrupt')
+                return None
+            current['mtime_ns'] = os.stat(object_path).st_mtime_ns
+            return self._hit(index, current, holder)
+
+    def _check(self, entry):
+        """'valid', 'verify' (el mtime cambió desde el último hash) o 'corrupt'"""
+        try:
+            stat = os.stat(path.join(self.objects_dir, entry['digest']))
+        except FileNotFoundError:
+            return 'corrupt'
+        if stat.st_size != entry['size']:
+            return 'corrupt'
+        if not self.verify_on_hit or stat.st_mtime_ns == entry.get('mtime_ns'):
+            return 'valid'
+        return 'verify'
+
+    def _hit(self, index, entry, holder):
+        entry['last_access'] = time.time()
+        if holder is not None:
+            self._pin(entry, holder)
+        self._save_index(index)
+        self.stats['hits'] += 1
+        return path.join(self.objects_dir, entry['digest'])
+
+    def _discard(self, index, key, entry, state):
+        """Miss; si la entrada está corrupta o incompleta se descarta para volver a descargar"""
+        self.stats['misses'] += 1
+        if state != 'corrupt':
+            return
+        self.stats['corrupt'] += 1
+        index.pop(key, None)
+        self._remove_object(index, entry['digest'])
+        self._save_index(index)
+
+    @staticmethod
+    def _pin(entry, holder=None):
+        """Fija el objeto de la entrada mientras este proceso siga vivo (y exista holder)"""
+        token = uuid.uuid4().hex
+        entry.setdefault('pins', {})[token] = {'pid': os.getpid(), 'holder': holder}
+        return token
+
+    @staticmethod
+    def _live_pins(entry):
+        """Quita de la entrada los pins de procesos terminados o con el holder borrado"""
+        pins = {token: pin for token, pin in entry.get('pins', {}).items() if _pin_alive(pin)}
+        entry['pins'] = pins
+        return pins
+
+    @staticmethod
+    def _make_key(url, headers):
+        etag = headers.get('ETag', '')
+        length = headers.get('Content-Length', '')
+        if not etag:
+            # Sin ETag, Last-Modified es el mejor validador disponible
+            etag = headers.get('Last-Modified', '')
+        return hashlib.sha256(f"{url}|{etag}|{length}".encode()).hexdigest()
+
+    def _download(self, url, expected_size):
+        tmp_path = path.join(self.objects_dir, f".tmp_{uuid.uuid4().hex}")
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with requests.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    for block in response.iter_content(chunk_size=self.block_size):
+                        f.write(block)
+                        hasher.update(block)
+                        size += len(block)
+
+            if expected_size is not None and size != expected_size:
+                raise Exception(
+                    f"Descarga incompleta de {url}: {size} de {expected_size} bytes"
+                )
+
+            digest = hasher.hexdigest()
+            os.replace(tmp_path, path.join(self.objects_dir, digest))
+            return digest, size
+        finally:
+            if path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _hash_file(self, file_path):
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(self.block_size), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def _latest_entry_for_url(self, url, holder=None):
+        with self._index_lock():
+            index = self._load_index()
+            entries = [e for e in index.values() if e['url'] == url]
+            for entry in sorted(entries, key=lambda e: e['last_access'], reverse=True):
+                object_path = path.join(self.objects_dir, entry['digest'])
+                if path.exists(object_path) and path.getsize(object_path) == entry['size']:
+                    if holder is not None:
+                        self._pin(entry, holder)
+                        self._save_index(index)
+                    return object_path
+        return None
+
+    def _evict(self, index, keep_key=None):
+        """Elimina entradas LRU hasta respetar max_bytes (nunca keep_key ni objetos fijados)"""
+        pinned = {e['digest'] for e in index.values() if self._live_pins(e)}
+        candidates = sorted(
+            (k for k in index if k != keep_key and index[k]['digest'] not in pinned),
+            key=lambda k: index[k]['last_access']
+        )
+        for key in candidates:
+            if self._total_bytes(index) <= self.max_bytes:
+                break
+            entry = index.pop(key)
+            self._remove_object(index, entry['digest'])
+            self.stats['evictions'] += 1
+
+    @staticmethod
+    def _total_bytes(index):
+        # Varias claves pueden apuntar al mismo objeto: contar cada digest una vez
+        return sum({e['digest']: e['size'] for e in index.values()}.values())
+
+    def _remove_object(self, index, digest):
+        # Solo borrar el archivo si ninguna otra clave lo referencia
+        if any(e['digest'] == digest for e in index.values()):
+            return
+        object_path = path.join(self.objects_dir, digest)
+        if path.exists(object_path):
+            os.remove(object_path)
+
+    def _load_index(self):
+        if not path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except ValueError:
+            # Índice dañado: se reconstruye vacío y los objetos huérfanos se sobrescriben
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def _pin_alive(pin):
+    if pin.get('holder') is not None and not path.exists(pin['holder']):
+        return False
+    if os.name == 'nt':
+        # En Windows os.kill(pid, 0) termina el proceso: el pin vive mientras exista el holder
+        return True
+    try:
+        os.kill(pin['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from os import path
+
+from scheduler.utils.arrow_fetch import fetch_to_parquet
+from scheduler.utils.gold_rollups import QUESTIONS, route_query
+
+
+FACT_TABLE = 'FCT_TRIPS'
+DIM_TABLES = ('DIM_DATE', 'DIM_ZONE', 'DIM_PAYMENT_TYPE', 'DIM_RATE_CODE', 'DIM_SERVICE_TYPE', 'DIM_VENDOR')
+PARTITION_COLUMNS = ('_data_year', '_data_month')
+MANIFEST_FILE = 'manifest.json'
+STAGING_DIR = '.staging'
+
+
+def sync_gold_mirror(conn, mirror_dir, database, schema='GOLD', years=None, prune=True):
+    """
+    Copia fct_trips y las dim_* de Gold a Parquet local.
+
+    - fct_trips queda particionado estilo Hive (_data_year=YYYY/_data_month=M); solo se
+      descargan las particiones nuevas o cuyo token (filas + _audit_registered_at +
+      _batch_run_id) cambió desde el último sync.
+    - Las dimensiones se copian completas cuando cambia su LAST_ALTERED.
+    - Con prune, las particiones que ya no existen en Gold se borran del espejo.
+    Retorna {particiones sincronizadas, omitidas, eliminadas, dimensiones, filas, bytes}.
+    """
+    os.makedirs(mirror_dir, exist_ok=True)
+    manifest = load_manifest(mirror_dir)
+    fqn = f"{database.upper()}.{schema.upper()}"
+    stats = {'partitions_synced': 0, 'partitions_skipped': 0, 'partitions_removed': 0,
+             'dims_synced': 0, 'rows': 0, 'bytes': 0, 'seconds': 0.0}
+    start = time.time()
+
+    year_filter = f"WHERE _data_year IN ({', '.join(str(int(y)) for y in years)})" if years else ""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT _data_year, _data_month, COUNT(*),
+                   MAX(_audit_registered_at), MAX(_batch_run_id)
+            FROM {fqn}.{FACT_TABLE}
+            {year_filter}
+            GROUP BY 1, 2
+        """)
+        remote = {
+            partition_key(y, m): f"{rows}|{registered_at}|{batch_run_id}"
+            for y, m, rows, registered_at, batch_run_id in cursor.fetchall()
+            if y is not None and m is not None
+        }
+    finally:
+        cursor.close()
+
+    local = manifest.setdefault('partitions', {})
+    for key, token in sorted(remote.items()):
+        if local.get(key, {}).get('token') == token and path.exists(partition_dir(mirror_dir, key)):
+            stats['partitions_skipped'] += 1
+            continue
+        year, month = split_key(key)
+        result = replace_partition(conn, mirror_dir, key, f"""
+            SELECT * EXCLUDE ({', '.join(PARTITION_COLUMNS)})
+            FROM {fqn}.{FACT_TABLE}
+            WHERE _data_year = {year} AND _data_month = {month}
+        """)
+        local[key] = {'token': token, 'rows': result['rows'], 'bytes': result['bytes'],
+                      'synced_at': time.time()}
+        stats['partitions_synced'] += 1
+        stats['rows'] += result['rows']
+        stats['bytes'] += result['bytes']
+        print(f"  Espejo {FACT_TABLE} {year}-{month:02d}: {result['rows']:,} filas")
+        # Manifest tras cada partición: un sync interrumpido retoma donde quedó
+        save_manifest(mirror_dir, manifest)
+
+    if prune:
+        wanted_years = {int(y) for y in years} if years else None
+        for key in [k for k in local if k not in remote]:
+            if wanted_years is not None and split_key(key)[0] not in wanted_years:
+                continue
+            shutil.rmtree(partition_dir(mirror_dir, key), ignore_errors=True)
+            local.pop(key)
+            stats['partitions_removed'] += 1
+
+    dims = manifest.setdefault('dims', {})
+    for table in DIM_TABLES:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT LAST_ALTERED FROM {database.upper()}.INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_SCHEMA = '{schema.upper()}' AND TABLE_NAME = '{table}'
+            """)
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if row is None:
+            continue
+        last_altered = str(row[0])
+        dim_path = path.join(mirror_dir, table.lower(), 'data.parquet')
+        if dims.get(table) == last_altered and path.exists(dim_path):
+            continue
+        result = fetch_to_parquet(conn, f"SELECT * FROM {fqn}.{table}", dim_path)
+        dims[table] = last_altered
+        stats['dims_synced'] += 1
+        stats['bytes'] += result['bytes']
+
+    save_manifest(mirror_dir, manifest)
+    stats['seconds'] = round(time.time() - start, 2)
+    print(f"Espejo Gold en {mirror_dir}: {stats}")
+    return stats
+
+
+def replace_partition(conn, mirror_dir, key, sql):
+    """Descarga una partición a staging y la reemplaza de forma atómica"""
+    staging = path.join(mirror_dir, STAGING_DIR, uuid.uuid4().hex)
+    target = partition_dir(mirror_dir, key)
+    try:
+        result = fetch_to_parquet(conn, sql, path.join(staging, 'part-0.parquet'))
+        old = None
+        if path.exists(target):
+            old = f"{staging}.old"
+            os.replace(target, old)
+        if result['path'] is not None:
+            os.makedirs(path.dirname(target), exist_ok=True)
+            os.replace(staging, target)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+        return result
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def partition_key(year, month):
+    return f"{int(year)}-{int(month)}"
+
+
+def split_key(key):
+    year, month = key.split('-')
+    return int(year), int(month)
+
+
+def partition_dir(mirror_dir, key):
+    year, month = split_key(key)
+    return path.join(mirror_dir, FACT_TABLE.lower(), f"_data_year={year}", f"_data_month={month}")
+
+
+def load_manifest(mirror_dir):
+    manifest_path = path.join(mirror_dir, MANIFEST_FILE)
+    if not path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def save_manifest(mirror_dir, manifest):
+    manifest_path = path.join(mirror_dir, MANIFEST_FILE)
+    tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+class GoldMirror:
+    """
+    Motor local (DuckDB) sobre el espejo Parquet de Gold.
+
+    Expone las tablas como vistas GOLD.<tabla>, así las consultas del notebook corren
+    sin cambios. fct_trips se lee con hive_partitioning: los filtros sobre
+    _data_year/_data_month descartan directorios completos y el resto de los
+    predicados se empujan a las estadísticas de row group de cada Parquet.
+    """
+
+    def __init__(self, mirror_dir, threads=None, schema='GOLD'):
+        import duckdb
+
+        self.mirror_dir = mirror_dir
+        self.schema = schema
+        self.conn = duckdb.connect()
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        self.conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        self.tables = []
+
+        fact_glob = path.join(mirror_dir, FACT_TABLE.lower(), '**', '*.parquet')
+        if path.isdir(path.join(mirror_dir, FACT_TABLE.lower())):
+            self.conn.execute(f"""
+                CREATE OR REPLACE VIEW {schema}.{FACT_TABLE} AS
+                SELECT * FROM read_parquet('{fact_glob}', hive_partitioning = true)
+            """)
+            self.tables.append(FACT_TABLE)
+        for table in DIM_TABLES:
+            dim_path = path.join(mirror_dir, table.lower(), 'data.parquet')
+            if path.exists(dim_path):
+                self.conn.execute(f"""
+                    CREATE OR REPLACE VIEW {schema}.{table} AS SELECT * FROM read_parquet('{dim_path}')
+                """)
+                self.tables.append(table)
+
+        if FACT_TABLE not in self.tables:
+            print(f"Aviso: {mirror_dir} no tiene {FACT_TABLE}, ejecuta sync_gold_mirror primero")
+
+    def sql(self, query):
+        """Ejecuta SQL arbitrario y retorna un DataFrame"""
+        return self.conn.execute(query).df()
+
+    def arrow(self, query):
+        return self.conn.execute(query).arrow()
+
+    def answer(self, question, years=None):
+        """Pregunta estándar del notebook (q1a...q5) sobre fct_trips local"""
+        sql, _ = route_query(question, schema=self.schema, years=years,
+                             use_rollups=False, partition_pruning=True)
+        start = time.time()
+        df = self.sql(sql)
+        print(f"{QUESTIONS[question.lower()]}: {len(df):,} filas en {time.time() - start:.2f}s (local)")
+        return df
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
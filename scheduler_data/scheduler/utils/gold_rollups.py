@@ -0,0 +1,222 @@
+from scheduler.utils.arrow_fetch import fetch_dataframe
+
+
+ROLLUP_TABLES = ('AGG_ZONE_DAY', 'AGG_BOROUGH_MONTH')
+
+# Consultas estándar del notebook (data_analysis.ipynb) respondidas desde los rollups.
+# {schema} y {year_filter} se completan en route_query.
+ROLLUP_QUERIES = {
+    'q1a': """
+        SELECT
+            D.year,
+            D.month_name,
+            Z.Borough AS pickup_borough,
+            Z.Zone AS pickup_zone,
+            SUM(A.pickup_trips) AS total_trips
+        FROM {schema}.agg_zone_day A
+        JOIN {schema}.dim_zone Z ON A.zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON A.date_sk = D.date_sk
+        WHERE A.pickup_trips > 0 {year_filter}
+        GROUP BY 1, 2, 3, 4
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY D.year, D.month_name ORDER BY total_trips DESC) <= 10
+        ORDER BY D.year, D.month_name, total_trips DESC
+    """,
+    'q1b': """
+        SELECT
+            D.year,
+            D.month_name,
+            Z.Borough AS dropoff_borough,
+            Z.Zone AS dropoff_zone,
+            SUM(A.dropoff_trips) AS total_trips
+        FROM {schema}.agg_zone_day A
+        JOIN {schema}.dim_zone Z ON A.zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON A.date_sk = D.date_sk
+        WHERE A.dropoff_trips > 0 {year_filter}
+        GROUP BY 1, 2, 3, 4
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY D.year, D.month_name ORDER BY total_trips DESC) <= 10
+        ORDER BY D.year, D.month_name, total_trips DESC
+    """,
+    'q2': """
+        SELECT
+            B.year,
+            B.month_name,
+            B.borough AS pickup_borough,
+            SUM(B.total_amount_sum) AS total_revenue,
+            SUM(B.tip_amount_sum) AS total_tips,
+            ROUND((SUM(B.tip_amount_sum) / NULLIF(SUM(B.total_amount_sum), 0)) * 100, 2) AS tip_percentage
+        FROM {schema}.agg_borough_month B
+        WHERE 1 = 1 {year_filter_b}
+        GROUP BY 1, 2, 3
+        ORDER BY 1, B.month_name, total_revenue DESC
+    """,
+    'q3': """
+        SELECT
+            Z.Borough AS pickup_borough,
+            D.day_name,
+            D.day_of_week,
+            SUM(A.speed_mph_sum) / NULLIF(SUM(A.speed_trips), 0) AS avg_speed_mph
+        FROM {schema}.agg_zone_day A
+        JOIN {schema}.dim_zone Z ON A.zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON A.date_sk = D.date_sk
+        WHERE A.speed_trips > 0 {year_filter}
+        GROUP BY 1, 2, 3
+        ORDER BY 3, avg_speed_mph DESC
+    """,
+    'q4': """
+        SELECT
+            Z.Zone AS pickup_zone,
+            Z.Borough AS pickup_borough,
+            APPROX_PERCENTILE_ESTIMATE(APPROX_PERCENTILE_COMBINE(A.duration_sketch), 0.50) AS duration_p50_seconds,
+            APPROX_PERCENTILE_ESTIMATE(APPROX_PERCENTILE_COMBINE(A.duration_sketch), 0.90) AS duration_p90_seconds
+        FROM {schema}.agg_zone_day A
+        JOIN {schema}.dim_zone Z ON A.zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON A.date_sk = D.date_sk
+        WHERE A.duration_trips > 0 {year_filter}
+        GROUP BY 1, 2
+        ORDER BY duration_p90_seconds DESC
+    """,
+    'q5': """
+        SELECT
+            D.day_name,
+            D.day_of_week,
+            SUM(A.pickup_trips) AS total_trips
+        FROM {schema}.agg_zone_day A
+        JOIN {schema}.dim_date D ON A.date_sk = D.date_sk
+        WHERE A.pickup_trips > 0 {year_filter}
+        GROUP BY 1, 2
+        ORDER BY D.day_of_week, total_trips DESC
+    """,
+}
+
+# Las mismas preguntas sobre fct_trips (respaldo si los rollups todavía no existen)
+FACT_QUERIES = {
+    'q1a': """
+        SELECT D.year, D.month_name, Z.Borough AS pickup_borough, Z.Zone AS pickup_zone,
+               COUNT(F.trip_id) AS total_trips
+        FROM {schema}.fct_trips F
+        JOIN {schema}.dim_zone Z ON F.pu_zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON F.pickup_date_sk = D.date_sk
+        WHERE 1 = 1 {year_filter}
+        GROUP BY 1, 2, 3, 4
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY D.year, D.month_name ORDER BY total_trips DESC) <= 10
+        ORDER BY D.year, D.month_name, total_trips DESC
+    """,
+    'q1b': """
+        SELECT D.year, D.month_name, Z.Borough AS dropoff_borough, Z.Zone AS dropoff_zone,
+               COUNT(F.trip_id) AS total_trips
+        FROM {schema}.fct_trips F
+        JOIN {schema}.dim_zone Z ON F.do_zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON F.dropoff_date_sk = D.date_sk
+        WHERE 1 = 1 {year_filter}
+        GROUP BY 1, 2, 3, 4
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY D.year, D.month_name ORDER BY total_trips DESC) <= 10
+        ORDER BY D.year, D.month_name, total_trips DESC
+    """,
+    'q2': """
+        SELECT D.year, D.month_name, Z.Borough AS pickup_borough,
+               SUM(F.total_amount) AS total_revenue, SUM(F.tip_amount) AS total_tips,
+               ROUND((SUM(F.tip_amount) / NULLIF(SUM(F.total_amount), 0)) * 100, 2) AS tip_percentage
+        FROM {schema}.fct_trips F
+        JOIN {schema}.dim_zone Z ON F.pu_zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON F.pickup_date_sk = D.date_sk
+        WHERE 1 = 1 {year_filter}
+        GROUP BY 1, 2, 3
+        ORDER BY 1, D.month_name, total_revenue DESC
+    """,
+    'q3': """
+        SELECT Z.Borough AS pickup_borough, D.day_name, D.day_of_week,
+               AVG((F.trip_distance / NULLIF(F.trip_duration_seconds, 0)) * 3600) AS avg_speed_mph
+        FROM {schema}.fct_trips F
+        JOIN {schema}.dim_zone Z ON F.pu_zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON F.pickup_date_sk = D.date_sk
+        WHERE F.trip_duration_seconds > 0 AND F.trip_distance > 0 {year_filter}
+        GROUP BY 1, 2, 3
+        ORDER BY 3, avg_speed_mph DESC
+    """,
+    'q4': """
+        SELECT Z.Zone AS pickup_zone, Z.Borough AS pickup_borough,
+               PERCENTILE_CONT(0.50) WITHIN GROUP (ORDER BY F.trip_duration_seconds) AS duration_p50_seconds,
+               PERCENTILE_CONT(0.90) WITHIN GROUP (ORDER BY F.trip_duration_seconds) AS duration_p90_seconds
+        FROM {schema}.fct_trips F
+        JOIN {schema}.dim_zone Z ON F.pu_zone_sk = Z.zone_sk
+        JOIN {schema}.dim_date D ON F.pickup_date_sk = D.date_sk
+        WHERE F.trip_duration_seconds > 0 {year_filter}
+        GROUP BY 1, 2
+        ORDER BY duration_p90_seconds DESC
+    """,
+    'q5': """
+        SELECT D.day_name, D.day_of_week, COUNT(F.trip_id) AS total_trips
+        FROM {schema}.fct_trips F
+        JOIN {schema}.dim_date D ON F.pickup_date_sk = D.date_sk
+        WHERE 1 = 1 {year_filter}
+        GROUP BY 1, 2
+        ORDER BY D.day_of_week, total_trips DESC
+    """,
+}
+
+QUESTIONS = {
+    'q1a': 'Top 10 zonas de recogida (PU) por mes',
+    'q1b': 'Top 10 zonas de llegada (DO) por mes',
+    'q2': 'Ingresos totales y porcentaje de propinas por borough y mes',
+    'q3': 'Velocidad promedio por borough y día de semana',
+    'q4': 'Percentiles p50/p90 de duración por zona de recogida',
+    'q5': 'Viajes por día de semana',
+}
+
+
+def rollups_available(conn, schema='GOLD'):
+    """True si agg_zone_day y agg_borough_month existen en el esquema"""
+    cursor = conn.cursor()
+    try:
+        tables = ", ".join(f"'{t}'" for t in ROLLUP_TABLES)
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = '{schema.upper()}' AND TABLE_NAME IN ({tables})
+        """)
+        return cursor.fetchone()[0] == len(ROLLUP_TABLES)
+    finally:
+        cursor.close()
+
+
+def route_query(question, schema='GOLD', years=None, use_rollups=True, partition_pruning=False):
+    """
+    SQL para una pregunta estándar ('q1a'...'q5') y la fuente elegida.
+    Con use_rollups usa el rollup más grueso que la responde (borough-mes para q2,
+    zona-día para el resto); los percentiles de q4 son aproximados (t-digest).
+    `years` filtra por año de la fecha del viaje; con partition_pruning (solo fct_trips)
+    filtra además por _data_year, lo que descarta particiones enteras pero también los
+    viajes con fecha fuera del año de su archivo.
+    """
+    question = question.lower()
+    if question not in QUESTIONS:
+        raise ValueError(f"Pregunta desconocida: {question}. Opciones: {sorted(QUESTIONS)}")
+
+    year_list = ", ".join(str(int(y)) for y in years) if years else None
+    year_filter = f"AND D.year IN ({year_list})" if year_list else ""
+    if year_list and partition_pruning and not use_rollups:
+        year_filter += f" AND F._data_year IN ({year_list})"
+    sql = (ROLLUP_QUERIES if use_rollups else FACT_QUERIES)[question].format(
+        schema=schema,
+        year_filter=year_filter,
+        year_filter_b=f"AND B.year IN ({year_list})" if year_list else "",
+    )
+    source = ('agg_borough_month' if question == 'q2' else 'agg_zone_day') if use_rollups else 'fct_trips'
+    return sql, source
+
+
+def answer(conn, question, schema='GOLD', years=None, use_rollups=None):
+    """
+    Ejecuta una pregunta estándar y retorna un DataFrame.
+    use_rollups=None detecta si los rollups existen y si no cae a fct_trips.
+    """
+    if use_rollups is None:
+        try:
+            use_rollups = rollups_available(conn, schema)
+        except Exception:
+            use_rollups = False
+
+    sql, source = route_query(question, schema=schema, years=years, use_rollups=use_rollups)
+    df = fetch_dataframe(conn, sql)
+    df.attrs['source'] = source
+    print(f"{QUESTIONS[question.lower()]}: {len(df):,} filas desde {schema}.{source}")
+    return df
@@ -0,0 +1,247 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from os import path
+
+
+PROMETHEUS_PREFIX = 'ingest'
+TRACEMALLOC_TOP = 25
+
+
+def peak_rss_bytes():
+    """RSS pico del proceso (Linux reporta KB, macOS bytes)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def empty_counters():
+    return {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'bytes': 0, 'errors': 0}
+
+
+class IngestMetrics:
+    """
+    Métricas por etapa de un run de ingesta (download, parse, convert, warehouse, retry...).
+
+    - Cada evento acumula count/seconds/rows/bytes por (stage, op), en total y por mes.
+    - El mes se toma del scope del thread (month_scope), así los workers paralelos y el
+      prefetch atribuyen sus eventos al mes correcto.
+    - Con `log_path` cada evento se escribe como una línea JSON.
+    """
+
+    def __init__(self, run_id, labels=None, log_path=None):
+        self.run_id = run_id
+        self.labels = dict(labels or {})
+        self.log_path = log_path
+        self.started_at = time.time()
+        self.totals = {}
+        self.months = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._log = None
+        if log_path:
+            os.makedirs(path.dirname(log_path) or '.', exist_ok=True)
+            self._log = open(log_path, 'a')
+
+    @contextmanager
+    def month_scope(self, month):
+        previous = getattr(self._local, 'month', None)
+        self._local.month = month
+        try:
+            yield
+        finally:
+            self._local.month = previous
+
+    def record(self, stage, seconds, rows=0, nbytes=0, op=None, error=None, **fields):
+        """Acumula un evento y lo escribe al log JSON"""
+        month = getattr(self._local, 'month', None)
+        key = (stage, op or '')
+        with self._lock:
+            buckets = [self.totals]
+            if month is not None:
+                buckets.append(self.months.setdefault(month, {}))
+            for bucket in buckets:
+                counters = bucket.setdefault(key, empty_counters())
+                counters['count'] += 1
+                counters['seconds'] += seconds
+                counters['max_seconds'] = max(counters['max_seconds'], seconds)
+                counters['rows'] += int(rows or 0)
+                counters['bytes'] += int(nbytes or 0)
+                if error:
+                    counters['errors'] += 1
+
+            if self._log is not None:
+                event = dict(self.labels, ts=round(time.time(), 3), run_id=self.run_id,
+                             month=month, stage=stage, op=op, seconds=round(seconds, 6),
+                             rows=int(rows or 0), bytes=int(nbytes or 0), **fields)
+                if error:
+                    event['error'] = error
+                self._log.write(json.dumps(event, default=str) + '\n')
+
+    @contextmanager
+    def stage(self, stage, op=None, **fields):
+        """with metrics.stage('download') as span: span['bytes'] = ..."""
+        span = {'rows': 0, 'bytes': 0}
+        start = time.perf_counter()
+        error = None
+        try:
+            yield span
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, span['rows'], span['bytes'],
+                        op=op, error=error, **fields)
+
+    def month_breakdown(self, month):
+        """{stage[.op]: contadores} del mes, para adjuntar a monthly_results"""
+        with self._lock:
+            counters = self.months.get(month, {})
+            return {self.stage_name(key): self.rounded(c) for key, c in sorted(counters.items())}
+
+    def summary(self):
+        with self._lock:
+            stages = {self.stage_name(key): self.rounded(c) for key, c in sorted(self.totals.items())}
+        return {
+            'wall_seconds': round(time.time() - self.started_at, 3),
+            # Pico de toda la vida del proceso (Mage reutiliza el proceso entre runs)
+            'process_peak_rss_mb': round(peak_rss_bytes() / 1024 ** 2, 1),
+            'stages': stages,
+        }
+
+    def write_prometheus(self, file_path, gauges=None):
+        """
+        Escribe las métricas en formato texto de Prometheus (textfile collector).
+        Reemplazo atómico para que el collector nunca lea un archivo a medias.
+        """
+        base_labels = dict(self.labels)
+        lines = []
+
+        def _labels(extra):
+            merged = dict(base_labels, **extra)
+            return ",".join(f'{k}="{v}"' for k, v in sorted(merged.items()))
+
+        series = [
+            ('stage_seconds_total', 'counter', 'Segundos acumulados por etapa', 'seconds'),
+            ('stage_events_total', 'counter', 'Eventos por etapa', 'count'),
+            ('stage_rows_total', 'counter', 'Filas procesadas por etapa', 'rows'),
+            ('stage_bytes_total', 'counter', 'Bytes procesados por etapa', 'bytes'),
+            ('stage_errors_total', 'counter', 'Eventos fallidos por etapa', 'errors'),
+            ('stage_max_seconds', 'gauge', 'Evento más lento por etapa', 'max_seconds'),
+        ]
+        with self._lock:
+            totals = dict(self.totals)
+        for name, metric_type, help_text, field in series:
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {metric_type}")
+            for (stage, op), counters in sorted(totals.items()):
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{_labels({'stage': stage, 'op': op})}}} {counters[field]}")
+
+        gauges = dict(gauges or {})
+        gauges.setdefault('process_peak_rss_bytes', peak_rss_bytes())
+        gauges.setdefault('run_wall_seconds', round(time.time() - self.started_at, 3))
+        gauges.setdefault('last_run_timestamp_seconds', int(time.time()))
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{_labels({})}}} {value}")
+
+        os.makedirs(path.dirname(file_path) or '.', exist_ok=True)
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, file_path)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    @staticmethod
+    def stage_name(key):
+        stage, op = key
+        return f"{stage}.{op}" if op else stage
+
+    @staticmethod
+    def rounded(counters):
+        return dict(counters, seconds=round(counters['seconds'], 4), max_seconds=round(counters['max_seconds'], 4))
+
+
+class NullMetrics:
+    """Misma interfaz que IngestMetrics sin registrar nada (métricas desactivadas)"""
+
+    run_id = None
+
+    @contextmanager
+    def month_scope(self, month):
+        yield
+
+    def record(self, *args, **kwargs):
+        pass
+
+    @contextmanager
+    def stage(self, stage, op=None, **fields):
+        yield {'rows': 0, 'bytes': 0}
+
+    def month_breakdown(self, month):
+        return {}
+
+    def summary(self):
+        return {}
+
+    def write_prometheus(self, file_path, gauges=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class RunProfiler:
+    """
+    Captura opcional de cProfile y/o tracemalloc de un run.
+    mode: 'cprofile', 'tracemalloc' o 'both'. cProfile solo ve el thread que llama a
+    start() (modo secuencial); tracemalloc cubre todos los threads.
+    """
+
+    MODES = ('cprofile', 'tracemalloc', 'both')
+
+    def __init__(self, mode, output_prefix):
+        if mode not in self.MODES:
+            raise ValueError(f"profile debe ser uno de {self.MODES}: {mode}")
+        self.mode = mode
+        self.output_prefix = output_prefix
+        self._profiler = None
+
+    def start(self):
+        os.makedirs(path.dirname(self.output_prefix) or '.', exist_ok=True)
+        if self.mode in ('tracemalloc', 'both'):
+            tracemalloc.start()
+        if self.mode in ('cprofile', 'both'):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def stop(self):
+        """Detiene la captura y escribe los archivos; retorna {rutas, pico tracemalloc}"""
+        outputs = {}
+        if self._profiler is not None:
+            self._profiler.disable()
+            outputs['cprofile'] = f"{self.output_prefix}.prof"
+            self._profiler.dump_stats(outputs['cprofile'])
+            self._profiler = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            outputs['tracemalloc'] = f"{self.output_prefix}_tracemalloc.txt"
+            outputs['tracemalloc_peak_mb'] = round(peak / 1024 ** 2, 1)
+            with open(outputs['tracemalloc'], 'w') as f:
+                f.write(f"Pico tracemalloc: {outputs['tracemalloc_peak_mb']} MB\n")
+                for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
+        return outputs
@@ -0,0 +1,125 @@
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from scheduler.utils.chunk_sizer import fixed_batches
+
+
+PROFILE_FULL = 'full'
+PROFILE_LEAN = 'lean'
+
+# Columnas que usan stg_yellow / stg_green (nombres del Parquet de TLC, sin distinguir
+# mayúsculas: 'airport_fee' aparece como 'Airport_fee' en algunos años)
+LEAN_COLUMNS = {
+    'yellow': [
+        'VendorID', 'tpep_pickup_datetime', 'tpep_dropoff_datetime', 'passenger_count',
+        'trip_distance', 'RatecodeID', 'store_and_fwd_flag', 'PULocationID', 'DOLocationID',
+        'payment_type', 'fare_amount', 'extra', 'mta_tax', 'tip_amount', 'tolls_amount',
+        'improvement_surcharge', 'total_amount', 'congestion_surcharge', 'airport_fee',
+        'cbd_congestion_fee',
+    ],
+    'green': [
+        'VendorID', 'lpep_pickup_datetime', 'lpep_dropoff_datetime', 'passenger_count',
+        'trip_distance', 'RatecodeID', 'store_and_fwd_flag', 'PULocationID', 'DOLocationID',
+        'payment_type', 'fare_amount', 'extra', 'mta_tax', 'tip_amount', 'tolls_amount',
+        'improvement_surcharge', 'total_amount', 'congestion_surcharge', 'cbd_congestion_fee',
+    ],
+}
+
+# Mismo filtro que el CTE `cleaned` de los modelos Silver: estas filas nunca llegan a Silver
+PICKUP_DROPOFF = {
+    'yellow': ('tpep_pickup_datetime', 'tpep_dropoff_datetime'),
+    'green': ('lpep_pickup_datetime', 'lpep_dropoff_datetime'),
+}
+MAX_TRIP_DISTANCE = 200
+
+
+def resolve_columns(arrow_schema, wanted):
+    """Nombres reales del schema para las columnas pedidas (sin distinguir mayúsculas)"""
+    by_lower = {name.lower(): name for name in arrow_schema.names}
+    return [by_lower[c.lower()] for c in wanted if c.lower() in by_lower]
+
+
+def lean_filter(service, arrow_schema):
+    """
+    Expresión Arrow equivalente al filtro de Silver. Los predicados sobre columnas que
+    el archivo no tiene se omiten (Silver los evaluaría como NULL y descartaría la fila,
+    pero eso solo pasa en archivos corruptos: mejor cargarlos y que Silver decida).
+    Retorna (expresión o None, [predicados aplicados]).
+    """
+    names = {name.lower(): name for name in arrow_schema.names}
+    pickup, dropoff = (names.get(c.lower()) for c in PICKUP_DROPOFF[service])
+    distance, fare = names.get('trip_distance'), names.get('fare_amount')
+
+    predicates = []
+    if distance:
+        predicates.append((f"{distance} >= 0 AND < {MAX_TRIP_DISTANCE}",
+                           (ds.field(distance) >= 0) & (ds.field(distance) < MAX_TRIP_DISTANCE)))
+    if fare:
+        predicates.append((f"{fare} >= 0", ds.field(fare) >= 0))
+    if pickup and dropoff:
+        predicates.append((f"{pickup} < {dropoff}",
+                           ds.field(pickup).is_valid() & ds.field(dropoff).is_valid()
+                           & (ds.field(pickup) < ds.field(dropoff))))
+
+    expression = None
+    for _, predicate in predicates:
+        expression = predicate if expression is None else expression & predicate
+    return expression, [text for text, _ in predicates]
+
+
+class LeanReader:
+    """
+    Lector del perfil 'lean bronze': proyección de columnas + filtro de Silver empujados
+    al escáner de Parquet. Los row groups cuyas estadísticas min/max no pueden cumplir el
+    filtro no se leen, y de los demás solo se decodifican las columnas proyectadas.
+    Las filas rechazadas se cuentan a medida que se consumen los lotes.
+    """
+
+    def __init__(self, local_path, service, chunk_size):
+        parquet_file = pq.ParquetFile(local_path)
+        self.total_rows = parquet_file.metadata.num_rows
+        self.row_groups = parquet_file.metadata.num_row_groups
+        full_schema = parquet_file.schema_arrow
+
+        self.columns = resolve_columns(full_schema, LEAN_COLUMNS[service])
+        self.filter, self.predicates = lean_filter(service, full_schema)
+        self.schema = pa.schema([full_schema.field(c) for c in self.columns])
+        self.dataset = ds.dataset(local_path, format='parquet')
+        self.chunk_size = chunk_size
+        self.rows_kept = 0
+        self.finished = False
+
+        # Solo estadísticas: cuántos row groups descarta el filtro sin leerlos
+        self.row_groups_read = self.row_groups
+        if self.filter is not None:
+            self.row_groups_read = sum(
+                len(fragment.split_by_row_group(self.filter))
+                for fragment in self.dataset.get_fragments()
+            )
+
+    def batches(self):
+        scanned = self.dataset.to_batches(
+            columns=self.columns, filter=self.filter, batch_size=self.chunk_size
+        )
+        # El filtro deja lotes de tamaño irregular: se re-agrupan en chunks de chunk_size
+        for chunk in fixed_batches(scanned, self.chunk_size):
+            self.rows_kept += chunk.num_rows
+            yield chunk
+        self.finished = True
+
+    @property
+    def rows_rejected(self):
+        return self.total_rows - self.rows_kept if self.finished else None
+
+    def stats(self):
+        return {
+            'profile': PROFILE_LEAN,
+            'columns_read': len(self.columns),
+            'row_groups': self.row_groups,
+            'row_groups_read': self.row_groups_read,
+            'rows_read': self.total_rows,
+            'rows_kept': self.rows_kept,
+            'rows_rejected': self.rows_rejected,
+            'predicates': self.predicates,
+        }
@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+
+
+class QuantileSketch:
+    """
+    Sketch de cuantiles combinable con error relativo acotado (estilo DDSketch).
+
+    - Cada valor cae en el bucket ceil(log_gamma |x|), gamma = (1 + a) / (1 - a): el
+      cuantil estimado está a menos de `relative_accuracy` (a) del valor real.
+    - Memoria constante: a lo más max_bins buckets por signo (si se excede se colapsan
+      los buckets de menor magnitud, que solo afecta a cuantiles cercanos a cero).
+    - merge() suma los conteos: sketches de chunks o workers distintos se combinan
+      sin perder la garantía.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_bins=DEFAULT_MAX_BINS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy debe estar entre 0 y 1: {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = int(max_bins)
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def update(self, values):
+        """Agrega un array de valores (NaN se ignoran), vectorizado"""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return self
+        self.count += int(values.size)
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self._add(self.positive, values[values > 0])
+        self._add(self.negative, -values[values < 0])
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Solo se combinan sketches con el mismo relative_accuracy")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+            self._collapse(store)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """
+        Valor en el rango min(int(q * count), count - 1) del orden ascendente
+        (para q=0.5 el mismo elemento que values[n // 2]); None si está vacío.
+        """
+        if self.count == 0:
+            return None
+        rank = min(int(q * self.count), self.count - 1)
+
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+    def _add(self, store, magnitudes):
+        if not magnitudes.size:
+            return
+        keys = np.ceil(np.log(magnitudes) / self.log_gamma).astype('int64')
+        unique_keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(unique_keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+        self._collapse(store)
+
+    def _collapse(self, store):
+        if len(store) <= self.max_bins:
+            return
+        keys = sorted(store)
+        overflow = keys[:len(keys) - self.max_bins + 1]
+        target = overflow[-1]
+        store[target] = sum(store.pop(k) for k in overflow[:-1]) + store[target]
+
+    def _bucket_value(self, key):
+        # Punto del bucket (gamma^(k-1), gamma^k] con error relativo <= relative_accuracy
+        return 2 * self.gamma ** key / (self.gamma + 1)
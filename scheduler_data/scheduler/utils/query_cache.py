@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from os import path
+
+import pandas as pd
+
+from scheduler.utils.arrow_fetch import fetch_dataframe
+
+
+DEFAULT_MAX_BYTES = 1024 ** 3  # 1 GB de resultados en Parquet
+INDEX_FILE = 'index.json'
+RESULTS_DIR = 'results'
+AUDIT_TABLE = 'BRONZE.AUDIT_COVERAGE'
+
+LINE_COMMENT = re.compile(r'--[^\n]*')
+BLOCK_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+WHITESPACE = re.compile(r'\s+')
+# Tablas referenciadas como ESQUEMA.TABLA o DB.ESQUEMA.TABLA después de FROM/JOIN
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+((?:\w+\.){1,2}\w+)', re.I)
+
+
+def normalize_sql(sql):
+    """SQL sin comentarios, espacios colapsados y sin ';' final (no toca literales)"""
+    sql = BLOCK_COMMENT.sub(' ', sql)
+    sql = LINE_COMMENT.sub(' ', sql)
+    return WHITESPACE.sub(' ', sql).strip().rstrip(';').strip()
+
+
+def referenced_tables(sql):
+    """{(ESQUEMA, TABLA)} que lee la consulta"""
+    tables = set()
+    for name in TABLE_REFERENCE.findall(normalize_sql(sql)):
+        parts = name.upper().split('.')
+        tables.add((parts[-2], parts[-1]))
+    return tables
+
+
+def data_version(conn, sql, audit_table=AUDIT_TABLE):
+    """
+    Token de versión de los datos que lee `sql`, con consultas de metadata:
+    - último registered_at / _batch_run_id de AUDIT_COVERAGE (cada mes que carga ingest_data)
+    - LAST_ALTERED de cada tabla referenciada (cambia cuando dbt la reconstruye)
+    """
+    parts = []
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute(f"""
+                SELECT MAX(registered_at), COUNT(*), MAX_BY(_batch_run_id, registered_at)
+                FROM {audit_table}
+            """)
+            parts.append(list(cursor.fetchone()))
+        except Exception:
+            # Sin AUDIT_COVERAGE (o sin _batch_run_id) la versión sale solo de las tablas
+            parts.append(None)
+
+        for schema, table in sorted(referenced_tables(sql)):
+            cursor.execute(f"""
+                SELECT LAST_ALTERED, ROW_COUNT FROM INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_SCHEMA = '{schema}' AND TABLE_NAME = '{table}'
+            """)
+            parts.append([schema, table, cursor.fetchone()])
+    finally:
+        cursor.close()
+
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:16]
+
+
+class QueryCache:
+    """
+    Cache local de resultados de consultas en Parquet.
+
+    - La clave es SQL normalizado + token de versión de datos (data_version), así un
+      resultado solo se reutiliza mientras no lleguen datos nuevos.
+    - Cuando el total supera max_bytes se eliminan los resultados menos usados (LRU).
+    - invalidate() borra entradas explícitamente (ingest_data lo llama al cerrar un mes).
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, audit_table=AUDIT_TABLE):
+        self.cache_dir = cache_dir
+        self.results_dir = path.join(cache_dir, RESULTS_DIR)
+        self.index_path = path.join(cache_dir, INDEX_FILE)
+        self.max_bytes = int(max_bytes)
+        self.audit_table = audit_table
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'uncacheable': 0}
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------ #
+    # API pública
+    # ------------------------------------------------------------------ #
+    def read_sql(self, sql, conn, version=None, read_fn=None):
+        """
+        Equivalente a pd.read_sql(sql, conn) con cache; los misses se leen vía Arrow
+        (fetch_dataframe). `version` fija el token (si no, se calcula con data_version);
+        `read_fn(conn, sql)` reemplaza la lectura en caso de miss.
+        """
+        if version is None:
+            version = data_version(conn, sql, self.audit_table)
+        key = self.make_key(sql, version)
+
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        self.stats['misses'] += 1
+        df = (read_fn or fetch_dataframe)(conn, sql)
+        self.put(key, df, sql, version)
+        return df
+
+    def get(self, key):
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            result_path = path.join(self.results_dir, entry['file'])
+            if not path.exists(result_path):
+                index.pop(key)
+                self._save_index(index)
+                return None
+            entry['last_access'] = time.time()
+            self._save_index(index)
+
+        self.stats['hits'] += 1
+        return pd.read_parquet(result_path)
+
+    def put(self, key, df, sql, version):
+        file_name = f"{key}.parquet"
+        tmp_path = path.join(self.results_dir, f".tmp_{uuid.uuid4().hex}")
+        try:
+            df.to_parquet(tmp_path, index=False)
+        except Exception as e:
+            # Tipos que Parquet no representa (objetos mixtos): se devuelve sin cachear
+            self.stats['uncacheable'] += 1
+            print(f"Aviso: resultado no cacheable ({e})")
+            if path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        os.replace(tmp_path, path.join(self.results_dir, file_name))
+
+        with self._lock:
+            index = self._load_index()
+            index[key] = {
+                'file': file_name,
+                'size': path.getsize(path.join(self.results_dir, file_name)),
+                'version': version,
+                'tables': sorted(".".join(t) for t in referenced_tables(sql)),
+                'rows': len(df),
+                'created_at': time.time(),
+                'last_access': time.time(),
+            }
+            self._evict(index, keep_key=key)
+            self._save_index(index)
+
+    def invalidate(self, tables=None):
+        """
+        Elimina entradas; con `tables` (['GOLD.FCT_TRIPS', ...]) solo las que leen
+        alguna de esas tablas. Retorna cuántas se eliminaron.
+        """
+        wanted = {t.upper() for t in tables} if tables else None
+        with self._lock:
+            index = self._load_index()
+            keys = [k for k, e in index.items() if wanted is None or wanted & set(e['tables'])]
+            for key in keys:
+                self._remove_entry(index, key)
+            self._save_index(index)
+        self.stats['invalidations'] += len(keys)
+        return len(keys)
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(e['size'] for e in self._load_index().values())
+
+    @staticmethod
+    def make_key(sql, version):
+        return hashlib.sha256(f"{normalize_sql(sql)}|{version}".encode()).hexdigest()
+
+    # ------------------------------------------------------------------ #
+    # Internos
+    # ------------------------------------------------------------------ #
+    def _evict(self, index, keep_key=None):
+        """Elimina resultados LRU hasta respetar max_bytes (nunca keep_key)"""
+        candidates = sorted(
+            (k for k in index if k != keep_key),
+            key=lambda k: index[k]['last_access']
+        )
+        for key in candidates:
+            if sum(e['size'] for e in index.values()) <= self.max_bytes:
+                break
+            self._remove_entry(index, key)
+            self.stats['evictions'] += 1
+
+    def _remove_entry(self, index, key):
+        entry = index.pop(key)
+        result_path = path.join(self.results_dir, entry['file'])
+        if path.exists(result_path):
+            os.remove(result_path)
+
+    def _load_index(self):
+        if not path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def invalidate_query_cache(cache_dir, tables=None):
+    """Invalida un cache existente sin crearlo (no-op si el directorio no existe)"""
+    if not cache_dir or not path.exists(path.join(cache_dir, INDEX_FILE)):
+        return 0
+    return QueryCache(cache_dir).invalidate(tables)
@@ -0,0 +1,230 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# convert_timezone(tz, <TIMESTAMP_NTZ>) de Snowflake interpreta el valor en la zona de la
+# sesión (parámetro TIMEZONE, default America/Los_Angeles)
+SESSION_TIMEZONE = os.getenv('SNOWFLAKE_SESSION_TIMEZONE', 'America/Los_Angeles')
+TARGET_TIMEZONE = 'America/New_York'
+MAX_TRIP_DISTANCE = 200
+
+# case PAYMENT_TYPE de stg_yellow / stg_green (el índice es el código TLC)
+PAYMENT_TYPE_LABELS = [
+    'Flex Fare trip', 'Credit card', 'Cash', 'No charge', 'Dispute', 'Unknown', 'Voided trip',
+]
+
+PICKUP_DROPOFF = {
+    'yellow': ('tpep_pickup_datetime', 'tpep_dropoff_datetime'),
+    'green': ('lpep_pickup_datetime', 'lpep_dropoff_datetime'),
+}
+
+# Columnas de stg_enriched en su orden, con el tipo Snowflake de la tabla emitida
+SILVER_COLUMNS = [
+    ('pickup_datetime', 'TIMESTAMP_TZ'),
+    ('dropoff_datetime', 'TIMESTAMP_TZ'),
+    ('trip_distance', 'FLOAT'),
+    ('fare_amount', 'FLOAT'),
+    ('total_amount', 'FLOAT'),
+    ('tip_amount', 'FLOAT'),
+    ('extra', 'FLOAT'),
+    ('mta_tax', 'FLOAT'),
+    ('tolls_amount', 'FLOAT'),
+    ('improvement_surcharge', 'FLOAT'),
+    ('congestion_surcharge', 'FLOAT'),
+    ('airport_fee', 'FLOAT'),
+    ('cbd_congestion_fee', 'FLOAT'),
+    ('payment_type', 'VARCHAR'),
+    ('vendor_id', 'NUMBER(38,0)'),
+    ('passenger_count', 'FLOAT'),
+    ('rate_code_id', 'FLOAT'),
+    ('store_and_fwd_flag', 'VARCHAR'),
+    ('pu_location_id', 'NUMBER(38,0)'),
+    ('do_location_id', 'NUMBER(38,0)'),
+    ('_data_year', 'NUMBER(38,0)'),
+    ('_data_month', 'NUMBER(38,0)'),
+    ('_batch_run_id', 'VARCHAR'),
+    ('service_type', 'VARCHAR'),
+    ('_audit_registered_at', 'TIMESTAMP_NTZ'),
+    ('trip_duration_seconds', 'NUMBER(38,0)'),
+    ('pickup_zone', 'VARCHAR'),
+    ('pickup_borough', 'VARCHAR'),
+    ('dropoff_zone', 'VARCHAR'),
+    ('dropoff_borough', 'VARCHAR'),
+]
+
+# Columnas float de stg_* (cast(X as float)) y pasadas tal cual (renombradas)
+FLOAT_COLUMNS = [
+    'trip_distance', 'fare_amount', 'total_amount', 'tip_amount', 'extra', 'mta_tax',
+    'tolls_amount', 'improvement_surcharge', 'congestion_surcharge', 'airport_fee', 'cbd_congestion_fee',
+]
+RENAMED_COLUMNS = {
+    'vendor_id': ('VendorID', pa.int64()),
+    'passenger_count': ('passenger_count', pa.float64()),
+    'rate_code_id': ('RatecodeID', pa.float64()),
+    'store_and_fwd_flag': ('store_and_fwd_flag', pa.string()),
+    'pu_location_id': ('PULocationID', pa.int64()),
+    'do_location_id': ('DOLocationID', pa.int64()),
+}
+
+
+class ZoneLookup:
+    """
+    Zonas de taxi_zones como arrays indexados por LocationID: el join de stg_enriched
+    pasa a ser un take() vectorizado. Se asume LocationID único (load_zone_lookup se
+    queda con la última carga de cada id, igual que el CTE zones de stg_enriched).
+    """
+
+    def __init__(self, location_ids, zones, boroughs):
+        ids = np.asarray(location_ids, dtype='int64')
+        self.index = np.full(int(ids.max()) + 1 if ids.size else 0, -1, dtype='int64')
+        self.index[ids] = np.arange(ids.size)
+        self.zones = pa.array(zones, type=pa.string())
+        self.boroughs = pa.array(boroughs, type=pa.string())
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Desde la tabla taxi_zones (columnas LocationID, Zone, Borough, sin distinguir mayúsculas)"""
+        columns = {name.lower(): _array(table.column(name)) for name in table.schema.names}
+        ids = columns['locationid'].cast(pa.float64()).to_numpy(zero_copy_only=False)
+        keep = ~np.isnan(ids) & (ids >= 0)
+        return cls(
+            ids[keep].astype('int64'),
+            np.asarray(columns['zone'].to_pylist(), dtype=object)[keep],
+            np.asarray(columns['borough'].to_pylist(), dtype=object)[keep],
+        )
+
+    def rows_for(self, location_ids):
+        """Fila de la zona para cada LocationID (None donde no hay zona)"""
+        values = _array(location_ids).cast(pa.float64()).to_numpy(zero_copy_only=False)
+        valid = ~np.isnan(values) & (values >= 0) & (values < self.index.size) & (values == np.floor(values))
+        rows = np.full(values.size, -1, dtype='int64')
+        rows[valid] = self.index[values[valid].astype('int64')]
+        missing = rows < 0
+        return pa.array(np.where(missing, 0, rows).astype('int32'), mask=missing)
+
+    def lookup(self, location_ids):
+        """(zone, borough) por LocationID, como un left join"""
+        rows = self.rows_for(location_ids)
+        if not len(self.zones):
+            return pa.nulls(len(rows), pa.string()), pa.nulls(len(rows), pa.string())
+        return (
+            pa.DictionaryArray.from_arrays(rows, self.zones).dictionary_decode(),
+            pa.DictionaryArray.from_arrays(rows, self.boroughs).dictionary_decode(),
+        )
+
+
+def to_silver(batch, service, year, month, batch_run_id=None, zones=None, registered_at=None,
+              session_timezone=SESSION_TIMEZONE):
+    """
+    Un chunk Bronze (RecordBatch o Table con las columnas del Parquet TLC) a filas de
+    stg_enriched: stg_yellow/stg_green (timestamps, casts, payment_type, filtro de
+    outliers) + service_type de stg_trips + duración y zonas de stg_enriched.
+    Retorna un pa.Table con SILVER_COLUMNS.
+    """
+    columns = {name.lower(): _array(batch.column(i)) for i, name in enumerate(batch.schema.names)}
+    num_rows = batch.num_rows
+
+    def source(name, arrow_type):
+        column = columns.get(name.lower())
+        if column is None:
+            return pa.nulls(num_rows, arrow_type)
+        return column.cast(arrow_type)
+
+    pickup_name, dropoff_name = PICKUP_DROPOFF[service]
+    data = {
+        'pickup_datetime': to_target_timezone(columns.get(pickup_name), num_rows, session_timezone),
+        'dropoff_datetime': to_target_timezone(columns.get(dropoff_name), num_rows, session_timezone),
+    }
+    for name in FLOAT_COLUMNS:
+        # stg_green no tiene airport_fee (null as airport_fee)
+        if name == 'airport_fee' and service == 'green':
+            data[name] = pa.nulls(num_rows, pa.float64())
+        else:
+            data[name] = source(name, pa.float64())
+    data['payment_type'] = decode_payment_type(source('payment_type', pa.float64()))
+    for name, (source_name, arrow_type) in RENAMED_COLUMNS.items():
+        data[name] = source(source_name, arrow_type)
+
+    # CTE cleaned: un predicado NULL descarta la fila, igual que en SQL
+    distance = data['trip_distance']
+    keep = pc.and_kleene(
+        pc.and_kleene(pc.greater_equal(distance, 0), pc.less(distance, MAX_TRIP_DISTANCE)),
+        pc.and_kleene(pc.greater_equal(data['fare_amount'], 0),
+                      pc.less(data['pickup_datetime'], data['dropoff_datetime'])),
+    )
+    silver = pa.table(data).filter(pc.fill_null(keep, False))
+    rows = silver.num_rows
+
+    silver = silver.append_column('_data_year', pa.array(np.full(rows, year, dtype='int64')))
+    silver = silver.append_column('_data_month', pa.array(np.full(rows, month, dtype='int64')))
+    silver = silver.append_column('_batch_run_id', pa.array([batch_run_id] * rows, type=pa.string()))
+    silver = silver.append_column('service_type', pa.array([service] * rows, type=pa.string()))
+    silver = silver.append_column('_audit_registered_at', pa.array([registered_at] * rows, type=pa.timestamp('us')))
+    silver = silver.append_column('trip_duration_seconds', trip_duration_seconds(
+        silver.column('pickup_datetime'), silver.column('dropoff_datetime')
+    ))
+
+    pu_location, do_location = silver.column('pu_location_id'), silver.column('do_location_id')
+    if zones is not None:
+        pickup_zone, pickup_borough = zones.lookup(pu_location)
+        dropoff_zone, dropoff_borough = zones.lookup(do_location)
+    else:
+        pickup_zone = pickup_borough = dropoff_zone = dropoff_borough = pa.nulls(rows, pa.string())
+    for name, array in (('pickup_zone', pickup_zone), ('pickup_borough', pickup_borough),
+                        ('dropoff_zone', dropoff_zone), ('dropoff_borough', dropoff_borough)):
+        silver = silver.append_column(name, array)
+    return silver
+
+
+def to_target_timezone(column, num_rows, session_timezone=SESSION_TIMEZONE):
+    """convert_timezone('America/New_York', ts): mismo instante, expresado en la zona de NY"""
+    target = pa.timestamp('us', tz=TARGET_TIMEZONE)
+    if column is None:
+        return pa.nulls(num_rows, target)
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        column = column.cast(pa.timestamp('us'))
+    if column.type.tz is None:
+        column = pc.assume_timezone(column.cast(pa.timestamp('us')), session_timezone,
+                                    ambiguous='earliest', nonexistent='earliest')
+    return column.cast(target)
+
+
+def decode_payment_type(codes):
+    """case PAYMENT_TYPE when 0 then ... end: código entero 0-6 -> texto, el resto NULL"""
+    values = _array(codes).cast(pa.float64()).to_numpy(zero_copy_only=False)
+    valid = (~np.isnan(values) & (values == np.floor(values))
+             & (values >= 0) & (values < len(PAYMENT_TYPE_LABELS)))
+    indices = pa.array(np.where(valid, values, 0).astype('int32'), mask=~valid)
+    return pa.DictionaryArray.from_arrays(indices, pa.array(PAYMENT_TYPE_LABELS)).dictionary_decode()
+
+
+def trip_duration_seconds(pickup, dropoff):
+    """DATEDIFF(second, pickup, dropoff): diferencia de los instantes truncados al segundo"""
+    start = _array(pickup).cast(pa.int64()).to_numpy(zero_copy_only=False)
+    end = _array(dropoff).cast(pa.int64()).to_numpy(zero_copy_only=False)
+    return pa.array(end // 1_000_000 - start // 1_000_000, type=pa.int64())
+
+
+def to_upload_frame(silver):
+    """
+    DataFrame para write_pandas: los TIMESTAMP_TZ viajan como texto con su offset
+    (la tabla de staging los recibe como VARCHAR y el INSERT los convierte).
+    Se truncan a segundos, igual que los timestamps de texto de Bronze.
+    """
+    arrays = []
+    for (name, snowflake_type), column in zip(SILVER_COLUMNS, silver.columns):
+        if snowflake_type == 'TIMESTAMP_TZ':
+            # safe=False: truncar fracciones de segundo (un cast seguro falla con ArrowInvalid)
+            column = column.cast(pa.timestamp('s', tz=TARGET_TIMEZONE), safe=False)
+            column = pc.strftime(column, format='%Y-%m-%d %H:%M:%S %z')
+        arrays.append(column)
+    return pa.Table.from_arrays(arrays, names=[name for name, _ in SILVER_COLUMNS]).to_pandas()
+
+
+def _array(column):
+    if isinstance(column, pa.ChunkedArray):
+        return column.combine_chunks()
+    return column
@@ -0,0 +1,22 @@
+from os import path
+
+import snowflake.connector
+from mage_ai.io.config import ConfigFileLoader
+from mage_ai.settings.repo import get_repo_path
+
+
+def get_snowflake_connection(database, schema):
+    """Conexión Snowflake con las credenciales del perfil 'default' de io_config.yaml"""
+    config_path = path.join(get_repo_path(), 'io_config.yaml')
+    config_loader = ConfigFileLoader(config_path, 'default')
+    config = config_loader.config
+
+    return snowflake.connector.connect(
+        account=config.get('SNOWFLAKE_ACCOUNT'),
+        user=config.get('SNOWFLAKE_USER'),
+        password=config.get('SNOWFLAKE_PASSWORD'),
+        warehouse=config.get('SNOWFLAKE_WAREHOUSE'),
+        database=database,
+        schema=schema,
+        insecure_mode=True
+    )
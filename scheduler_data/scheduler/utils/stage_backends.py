@@ -0,0 +1,98 @@
+import os
+import shutil
+from os import path
+
+import pandas as pd
+
+
+class SnowflakeStage:
+    """
+    Stage interno de Snowflake: PUT de archivos Parquet por mes y COPY INTO la tabla.
+    Los archivos se suben ya comprimidos (snappy), por eso AUTO_COMPRESS=FALSE.
+    """
+
+    def __init__(self, database, schema, stage_name='INGEST_STAGE', put_parallel=4):
+        self.stage = f"{database.upper()}.{schema.upper()}.{stage_name.upper()}"
+        self.put_parallel = put_parallel
+
+    def prepare(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"CREATE STAGE IF NOT EXISTS {self.stage} FILE_FORMAT = (TYPE = PARQUET)")
+        finally:
+            cursor.close()
+
+    def put(self, conn, local_file, prefix):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"PUT 'file://{local_file}' @{self.stage}/{prefix}/ "
+                f"AUTO_COMPRESS = FALSE OVERWRITE = TRUE PARALLEL = {self.put_parallel}"
+            )
+        finally:
+            cursor.close()
+
+    def copy_into(self, conn, table_fqn, prefix, files):
+        """COPY de los archivos indicados; retorna filas cargadas"""
+        file_list = ", ".join(f"'{f}'" for f in files)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                COPY INTO {table_fqn}
+                FROM @{self.stage}/{prefix}/
+                FILES = ({file_list})
+                FILE_FORMAT = (TYPE = PARQUET)
+                MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+                ON_ERROR = ABORT_STATEMENT
+            """)
+            columns = [d[0].lower() for d in cursor.description]
+            rows_loaded_idx = columns.index('rows_loaded')
+            return sum(int(row[rows_loaded_idx] or 0) for row in cursor.fetchall())
+        finally:
+            cursor.close()
+
+    def cleanup(self, conn, prefix):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"REMOVE @{self.stage}/{prefix}/")
+        finally:
+            cursor.close()
+
+
+class LocalStage:
+    """
+    Stage sobre el filesystem local con el mismo contrato que SnowflakeStage.
+    COPY se emula con INSERT parametrizado (qmark), útil con sqlite3/duckdb como
+    sustituto local del warehouse.
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+
+    def prepare(self, conn):
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def put(self, conn, local_file, prefix):
+        target_dir = path.join(self.base_dir, prefix)
+        os.makedirs(target_dir, exist_ok=True)
+        shutil.copy(local_file, path.join(target_dir, path.basename(local_file)))
+
+    def copy_into(self, conn, table_fqn, prefix, files):
+        rows_loaded = 0
+        cursor = conn.cursor()
+        try:
+            for file_name in files:
+                df = pd.read_parquet(path.join(self.base_dir, prefix, file_name))
+                columns = ", ".join(df.columns)
+                placeholders = ", ".join("?" for _ in df.columns)
+                cursor.executemany(
+                    f"INSERT INTO {table_fqn} ({columns}) VALUES ({placeholders})",
+                    df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+                )
+                rows_loaded += len(df)
+        finally:
+            cursor.close()
+        return rows_loaded
+
+    def cleanup(self, conn, prefix):
+        shutil.rmtree(path.join(self.base_dir, prefix), ignore_errors=True)